@@ -0,0 +1,37 @@
+# backend/alembic/env.py
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+from dream_engine.core.config import settings
+from dream_engine.db.session import Base
+from dream_engine.db.models import dream, user, interpretation_cache, job, bot_state, invoice  # Важно импортировать модели, чтобы Base их "увидел"
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    """Генерирует SQL без подключения к БД: alembic upgrade head --sql"""
+    context.configure(url=settings.DATABASE_URL, target_metadata=target_metadata, literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    # Миграции гоняем синхронным драйвером из DATABASE_URL (psycopg2), без пула
+    connectable = create_engine(settings.DATABASE_URL, poolclass=pool.NullPool)
+    with connectable.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
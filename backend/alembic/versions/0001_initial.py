@@ -0,0 +1,54 @@
+"""Исходная схема: users, dreams, interpretation_cache
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('first_name', sa.String(100), nullable=False),
+        sa.Column('last_name', sa.String(100), nullable=True),
+        sa.Column('dob', sa.Date(), nullable=False),
+        sa.Column('phone', sa.String(20), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('telegram_id', sa.Integer(), nullable=True),
+    )
+    op.create_index('ix_users_id', 'users', ['id'])
+    op.create_index('ix_users_phone', 'users', ['phone'], unique=True)
+    op.create_index('ix_users_telegram_id', 'users', ['telegram_id'], unique=True)
+
+    op.create_table(
+        'dreams',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('request_text', sa.Text(), nullable=False),
+        sa.Column('response_text', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id')),
+    )
+    op.create_index('ix_dreams_id', 'dreams', ['id'])
+
+    op.create_table(
+        'interpretation_cache',
+        sa.Column('key', sa.String(64), primary_key=True),
+        sa.Column('interpretation', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_interpretation_cache_created_at', 'interpretation_cache', ['created_at'])
+
+
+def downgrade() -> None:
+    op.drop_table('interpretation_cache')
+    op.drop_table('dreams')
+    op.drop_table('users')
@@ -0,0 +1,28 @@
+"""Составной индекс dreams(user_id, created_at) для истории и контекста
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY не блокирует запись в dreams, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_dreams_user_id_created_at', 'dreams', ['user_id', 'created_at'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_dreams_user_id_created_at', table_name='dreams',
+                      postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,26 @@
+"""Сводка прошлых снов пользователя (dream memory)
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('dream_memory', sa.Text(), nullable=True))
+    op.add_column('users', sa.Column('dream_memory_last_dream_id', sa.Integer(), nullable=True))
+    op.add_column('users', sa.Column('dream_memory_updated_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'dream_memory_updated_at')
+    op.drop_column('users', 'dream_memory_last_dream_id')
+    op.drop_column('users', 'dream_memory')
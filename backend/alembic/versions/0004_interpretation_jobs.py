@@ -0,0 +1,37 @@
+"""Очередь фоновых задач на толкование
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'interpretation_jobs',
+        sa.Column('id', sa.String(32), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('request_text', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(16), nullable=False),
+        sa.Column('interpretation', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('dream_id', sa.Integer(), sa.ForeignKey('dreams.id'), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index('ix_interpretation_jobs_user_id', 'interpretation_jobs', ['user_id'])
+    op.create_index('ix_interpretation_jobs_status_created_at', 'interpretation_jobs', ['status', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_table('interpretation_jobs')
@@ -0,0 +1,42 @@
+"""Полнотекстовый и триграммный поиск по снам
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return  # Поиск на других СУБД — простой поиск подстроки, индексы не нужны
+    # pg_trgm — нечеткий поиск, btree_gin — user_id в одном GIN-индексе с текстом,
+    # чтобы поиск шел только по снам пользователя. Оба расширения "trusted" с PG 13.
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+
+    # Генерируемая колонка: Postgres сам пересчитывает ее при INSERT/UPDATE строки,
+    # а ADD COLUMN заполняет ее для уже существующих снов (backfill за один проход).
+    # Сон весит больше толкования (A > B) при ранжировании.
+    op.execute("""
+        ALTER TABLE dreams ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('russian', coalesce(request_text, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(response_text, '')), 'B')
+        ) STORED
+    """)
+    op.execute("CREATE INDEX ix_dreams_user_id_search_vector ON dreams USING gin (user_id, search_vector)")
+    op.execute("CREATE INDEX ix_dreams_user_id_request_trgm ON dreams USING gin (user_id, request_text gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_dreams_user_id_request_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_dreams_user_id_search_vector")
+    op.execute("ALTER TABLE dreams DROP COLUMN IF EXISTS search_vector")
@@ -0,0 +1,24 @@
+"""Векторы снов для выбора похожих прошлых снов в контекст
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Новые сны получают вектор при INSERT (значение по умолчанию в модели), а уже
+    # сохраненным его досчитывает services/retrieval.py при первом обращении к снам пользователя
+    op.add_column('dreams', sa.Column('embedding', sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('dreams', 'embedding')
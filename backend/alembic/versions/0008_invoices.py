@@ -0,0 +1,34 @@
+"""Счета на оплату (Робокасса)
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'invoices',
+        sa.Column('id', sa.Integer(), primary_key=True),  # SERIAL: номер счета выдает последовательность
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('amount', sa.Numeric(12, 2), nullable=False),
+        sa.Column('description', sa.String(255), nullable=False),
+        sa.Column('status', sa.String(16), nullable=False),
+        sa.Column('idempotency_key', sa.String(64), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('paid_at', sa.DateTime(timezone=True), nullable=True),
+        # Индекс этого ключа нужен и для выборки счетов пользователя (user_id — первая колонка)
+        sa.UniqueConstraint('user_id', 'idempotency_key', name='uq_invoices_user_id_idempotency_key'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('invoices')
@@ -0,0 +1,20 @@
+# backend/app/api/health.py
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.services.lifecycle import readiness
+
+router = APIRouter()
+
+
+@router.get("/livez", include_in_schema=False)
+async def livez():
+    """Процесс жив и event loop отвечает. Ни БД, ни LLM не трогаем: их недоступность — не повод перезапускать под."""
+    return {"status": "ok"}
+
+
+@router.get("/readyz", include_in_schema=False)
+async def readyz():
+    """Можно ли слать трафик: прогрев закончен, БД отвечает. Плюс состояние пула и задержки LLM."""
+    ready, report = await readiness()
+    return JSONResponse(status_code=200 if ready else 503, content=report)
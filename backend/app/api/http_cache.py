@@ -0,0 +1,74 @@
+# backend/app/api/http_cache.py
+import gzip
+import hashlib
+
+from fastapi import Request, Response
+
+from dream_engine.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # Без пакета Brotli отдаем gzip
+    brotli = None
+
+# Условные GET и сжатие для ответов, которые фронтенд перезапрашивает на каждом экране
+# (история чата). ETag считается по дешевому валидатору (число снов, последний id и время),
+# а не по телу ответа: на совпавший If-None-Match отвечаем 304, не загружая ни одной строки.
+# ETag слабый (W/): одно и то же содержимое может уйти в gzip, brotli или без сжатия.
+
+# Поднять, если поменялся формат ответа: старые ETag в браузерах перестанут совпадать
+ETAG_VERSION = 1
+
+CACHE_HEADERS = {
+    "Cache-Control": "private, no-cache",  # Браузер хранит ответ, но каждый раз переспрашивает
+    "Vary": "Accept-Encoding",
+}
+
+
+def make_etag(*parts) -> str:
+    raw = ":".join(str(part) for part in (ETAG_VERSION, *parts))
+    return f'W/"{hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Слабое сравнение (RFC 9110): W/ не учитываем, "*" совпадает с чем угодно."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, **CACHE_HEADERS})
+
+
+def _accepted_encodings(request: Request) -> set[str]:
+    accepted = set()
+    for item in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = params.strip().removeprefix("q=")
+        try:
+            if params and float(quality) == 0:
+                continue  # gzip;q=0 — явный отказ
+        except ValueError:
+            continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def compressed_json(request: Request, body: bytes, etag: str) -> Response:
+    """Готовый JSON: сжатый brotli или gzip, если клиент их принимает и тело достаточно большое."""
+    headers = {"ETag": etag, **CACHE_HEADERS}
+    if len(body) >= settings.HTTP_COMPRESS_MIN_BYTES:
+        accepted = _accepted_encodings(request)
+        if brotli is not None and "br" in accepted:
+            body = brotli.compress(body, quality=settings.HTTP_BROTLI_QUALITY, mode=brotli.MODE_TEXT)
+            headers["Content-Encoding"] = "br"
+        elif "gzip" in accepted:
+            body = gzip.compress(body, compresslevel=settings.HTTP_GZIP_LEVEL, mtime=0)
+            headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,49 @@
+# backend/app/api/metrics.py
+import time
+
+from fastapi import APIRouter, Response
+
+from dream_engine.core.metrics import HTTP_REQUEST_DURATION, render_metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+class MetricsMiddleware:
+    """
+    Чистый ASGI-middleware: меряет запрос до отправки последнего куска тела,
+    поэтому потоковые ответы (SSE) учитываются целиком, а не до первого байта.
+    Метка route — шаблон пути (/api/v1/users/{user_id}/history), а не сам путь.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            # Несуществующие пути склеиваем в одну метку, иначе сканеры раздуют число рядов
+            route_path = getattr(route, "path", None) or "unmatched"
+            if route_path != "/metrics":
+                HTTP_REQUEST_DURATION.labels(method=scope["method"], route=route_path, status=status) \
+                    .observe(time.perf_counter() - started_at)
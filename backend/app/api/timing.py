@@ -0,0 +1,60 @@
+# backend/app/api/timing.py
+import json
+import re
+import uuid
+
+from dream_engine.core.timing import RequestTiming, current_timing
+
+# Допускаем только безопасный X-Request-ID от клиента/прокси, иначе генерируем свой
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+QUIET_PATHS = ("/metrics", "/livez", "/readyz")
+
+
+class TimingMiddleware:
+    """
+    Заводит RequestTiming на каждый HTTP-запрос, отдает разбивку в заголовке Server-Timing
+    (его показывает вкладка Network в браузере) и пишет строку лога в JSON с request_id.
+    У потоковых ответов заголовок уходит до конца генерации, поэтому в нем только этапы
+    до первого куска; полная разбивка — в строке лога.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming_id = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+        request_id = incoming_id if _REQUEST_ID.match(incoming_id) else uuid.uuid4().hex
+        timing = RequestTiming(request_id)
+        token = current_timing.set(timing)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"server-timing", timing.server_timing().encode("latin-1")),
+                    (b"x-request-id", request_id.encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_timing.reset(token)
+            # /metrics и пробы /livez, /readyz опрашиваются часто, не засоряем ими лог
+            if scope["path"] not in QUIET_PATHS:
+                print(json.dumps({
+                    "event": "request",
+                    "request_id": request_id,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status,
+                    "total_ms": round(timing.total() * 1000, 1),
+                    "spans_ms": timing.as_dict(),
+                }, ensure_ascii=False))
@@ -3,10 +3,12 @@ from fastapi import APIRouter
 from app.api.v1.endpoints import chat  # Импортируем модуль chat
 from app.api.v1.endpoints import user
 from app.api.v1.endpoints import payment # Импортируем модуль user
+from app.api.v1.endpoints import admin
 
 api_router = APIRouter()
 
 # Используем импортированные модули
 api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
 api_router.include_router(user.router, prefix="/users", tags=["users"])
-api_router.include_router(payment.router, prefix="/payment", tags=["payment"])
\ No newline at end of file
+api_router.include_router(payment.router, prefix="/payment", tags=["payment"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
\ No newline at end of file
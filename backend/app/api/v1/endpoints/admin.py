@@ -0,0 +1,36 @@
+# backend/app/api/v1/endpoints/admin.py
+import asyncio
+import secrets
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from dream_engine.core.config import settings
+from app.services.profiler import ProfilerBusy, sample_stacks
+
+router = APIRouter()
+
+
+def require_admin(x_admin_token: str = Header(default="")):
+    # Без ADMIN_TOKEN в настройках админских эндпоинтов как будто нет
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(x_admin_token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+@router.get("/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def profile(
+        seconds: float = Query(10.0, gt=0, le=120),
+        interval_ms: float = Query(5.0, ge=1, le=1000),
+):
+    """
+    Сэмплирует стеки этого процесса seconds секунд и возвращает collapsed stacks
+    для flamegraph.pl / speedscope:
+        curl -H "X-Admin-Token: ..." ".../api/v1/admin/profile?seconds=30" > profile.folded
+    """
+    try:
+        stacks, samples = await asyncio.to_thread(sample_stacks, seconds, interval_ms / 1000)
+    except ProfilerBusy:
+        raise HTTPException(status_code=409, detail="Профайлер уже запущен")
+    return PlainTextResponse(stacks, headers={"X-Profile-Samples": str(samples)})
@@ -1,75 +1,261 @@
 # backend/app/api/v1/endpoints/chat.py
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import json
+from typing import AsyncIterator, Awaitable, Callable
 
-from app.schemas.dream import DreamRequest, DreamResponse, GuestDreamRequest
-from app.db.session import get_db
-from app.db.models.dream import Dream
-from app.db.models.user import User  # <-- Импортируем User
-from app.services.llm_service import get_dream_interpretation, LLMError
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.schemas.dream import DreamRequest, DreamResponse, GuestDreamRequest, InterpretationJobResponse
+from dream_engine import Interpreter
+from dream_engine.db.session import get_db, SessionLocal
+from dream_engine.db.models.dream import Dream
+from dream_engine.db.models.user import User  # <-- Импортируем User
+from dream_engine.db.models.job import InterpretationJob, JOB_PENDING
+from app.services.job_queue import job_queue, new_job_id
+from dream_engine.services.cache_service import interpretation_cache, make_cache_key
+from dream_engine.services.memory_service import schedule_dream_memory_refresh
+from dream_engine.services.retrieval import select_context_dreams
+from dream_engine.services.user_cache import user_cache
+from dream_engine.services.llm_service import (
+    build_payload,
+    stream_dream_interpretation,
+    StreamingResponseCleaner,
+    LLMError,
+    LLMBusyError,
+)
+from dream_engine.services.admission import AdmissionRejected, RateLimiter, guest_rate_limiter, user_rate_limiter
+from dream_engine.core.config import settings
+from dream_engine.core.timing import span
 
 router = APIRouter()
 
 
+def _llm_http_error(e: LLMError) -> HTTPException:
+    """Ошибку LLM превращаем в ответ фронтенду: перегрузка — 429 с Retry-After, остальное — 503."""
+    if isinstance(e, LLMBusyError):
+        return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    return HTTPException(status_code=503, detail=str(e))
+
+
+def _client_ip(http_request: Request) -> str:
+    if settings.TRUST_PROXY_HEADERS:
+        forwarded_for = http_request.headers.get("X-Forwarded-For")
+        if forwarded_for:
+            return forwarded_for.split(",")[0].strip()
+    return http_request.client.host if http_request.client else "unknown"
+
+
+def _rate_limit_http_error(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(status_code=429, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+
+
+def _enforce_rate_limit(limiter: RateLimiter, key: str) -> None:
+    try:
+        limiter.check(key)
+    except AdmissionRejected as e:
+        raise _rate_limit_http_error(e)
+
+
+def _guest_cache_key(text: str, guest_user: User) -> str:
+    # Контекст гостя — это промпт без самого сна: у гостя нет истории
+    return make_cache_key(text, build_payload("", guest_user, []))
+
+
+# Обычные (не потоковые) толкования идут через общий движок — тот же код, что у бота
+guest_interpreter = Interpreter("api", cache=interpretation_cache, limiter=guest_rate_limiter)
+user_interpreter = Interpreter("api", limiter=user_rate_limiter)
+
+
 @router.post("/interpret_guest", response_model=DreamResponse)
-def interpret_guest_dream(request: GuestDreamRequest):
+async def interpret_guest_dream(request: GuestDreamRequest, http_request: Request):
     """
     Принимает сон от гостя, возвращает толкование, НЕ сохраняя в БД.
+    Одинаковые сны гостей (с точностью до регистра и пробелов) толкуются один раз.
     """
-    # 1. Создаем "виртуального" пользователя-гостя
+    # "Виртуальный" пользователь-гость: без истории
     guest_user = User(id=0, first_name="Гость", dob="2000-01-01", phone="")
-
     try:
-        # 2. Вызываем наш основной сервис LLM, передавая гостя и пустой список снов
-        interpretation_text = get_dream_interpretation(
-            current_dream=request.text,
-            user=guest_user,
-            past_dreams=[]  # У гостя нет истории
-        )
+        result = await guest_interpreter.interpret(guest_user, request.text, persist=False,
+                                                   rate_limit_key=f"ip:{_client_ip(http_request)}")
+    except AdmissionRejected as e:
+        raise _rate_limit_http_error(e)
     except LLMError as e:
-        raise HTTPException(status_code=503, detail=str(e))
-
-    # 3. Просто возвращаем результат, НИЧЕГО НЕ СОХРАНЯЯ
-    return DreamResponse(interpretation=interpretation_text)
-
+        raise _llm_http_error(e)
+    return DreamResponse(interpretation=result.text)
 
-# --- КОНЕЦ НОВОГО ЭНДПОИНТА --
 
 @router.post("/interpret", response_model=DreamResponse)
-def interpret_dream(request: DreamRequest, db: Session = Depends(get_db)):
-    # 1. Находим пользователя в БД
-    user = db.query(User).filter(User.id == request.user_id).first()
+async def interpret_dream(request: DreamRequest, db: AsyncSession = Depends(get_db)):
+    # Пользователь — из кэша в памяти процесса, при промахе — из БД
+    with span("user_lookup"):
+        user = await user_cache.get_user(db, request.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    # 2. Находим 3 последних сна этого пользователя для контекста
-    past_dreams = db.query(Dream).filter(Dream.user_id == user.id).order_by(Dream.created_at.desc()).limit(3).all()
+    # Похожие прошлые сны, LLM и сохранение нового сна — в движке
+    try:
+        result = await user_interpreter.interpret(user, request.text, db=db)
+    except AdmissionRejected as e:
+        raise _rate_limit_http_error(e)
+    except LLMError as e:
+        raise _llm_http_error(e)
+    return DreamResponse(interpretation=result.text)
+
+
+# --- ПОТОКОВЫЕ ЭНДПОИНТЫ (Server-Sent Events) ---
+# Фронтенд получает события:
+#   event: delta  data: {"text": "..."}           — очередной очищенный кусок толкования
+#   event: done   data: {"interpretation": "..."} — полный текст, сон уже сохранен
+#   event: error  data: {"detail": "..."}         — LLM отвалилась посреди ответа
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # Чтобы nginx не буферизовал поток
+}
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 
+async def _start_stream(current_dream: str, user: User, past_dreams: list[Dream]):
+    """
+    Открывает поток к LLM и дожидается первого куска ДО отправки заголовков ответа.
+    Так ошибки вида "модель недоступна" по-прежнему приходят фронтенду обычным 503.
+    """
+    cleaner = StreamingResponseCleaner()
+    chunks = stream_dream_interpretation(current_dream, user, past_dreams, cleaner)
     try:
-        interpretation_text = get_dream_interpretation(
-            current_dream=request.text,
-            user=user,
-            past_dreams=past_dreams
-        )
+        first_piece = await chunks.__anext__()
     except LLMError as e:
-        # Перехватываем ошибку из сервиса и возвращаем ее фронтенду
-        raise HTTPException(status_code=503, detail=str(e))
-
-    # 3. Получаем толкование от LLM с учетом контекста
-    interpretation_text = get_dream_interpretation(
-        current_dream=request.text,
-        user=user,
-        past_dreams=past_dreams
-    )
-
-    # 4. Сохраняем новый сон в БД, привязав его к пользователю
-    db_dream = Dream(
-        request_text=request.text,
-        response_text=interpretation_text,
-        user_id=user.id  # <-- Привязываем сон к пользователю
-    )
-    db.add(db_dream)
-    db.commit()
-    db.refresh(db_dream)
-
-    return DreamResponse(interpretation=interpretation_text)
\ No newline at end of file
+        raise _llm_http_error(e)
+    return first_piece, chunks, cleaner
+
+
+async def _sse_events(first_piece: str, chunks: AsyncIterator[str], cleaner: StreamingResponseCleaner,
+                      on_complete: Callable[[str], Awaitable[None]] | None = None) -> AsyncIterator[str]:
+    try:
+        yield _sse("delta", {"text": first_piece})
+        try:
+            async for piece in chunks:
+                yield _sse("delta", {"text": piece})
+        except LLMError as e:
+            yield _sse("error", {"detail": str(e)})
+            return
+
+        if on_complete is not None:
+            await on_complete(cleaner.text)
+        yield _sse("done", {"interpretation": cleaner.text})
+    finally:
+        # Клиент ушел или on_complete упал: сразу закрываем поток к LLM и отдаем слот,
+        # а не ждем сборщика мусора
+        await chunks.aclose()
+
+
+class _LLMStreamingResponse(StreamingResponse):
+    """SSE-ответ, который закрывает поток к LLM, даже если до тела дело так и не дошло."""
+
+    def __init__(self, content: AsyncIterator[str], chunks: AsyncIterator[str]):
+        super().__init__(content, media_type="text/event-stream", headers=SSE_HEADERS)
+        self.chunks = chunks
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.chunks.aclose()
+
+
+async def _cached_sse_events(interpretation_text: str) -> AsyncIterator[str]:
+    # Готовый ответ из кэша отдаем тем же протоколом, одним куском
+    yield _sse("delta", {"text": interpretation_text})
+    yield _sse("done", {"interpretation": interpretation_text})
+
+
+@router.post("/interpret_guest_stream")
+async def interpret_guest_dream_stream(request: GuestDreamRequest, http_request: Request):
+    """
+    Потоковый вариант /interpret_guest: толкование приходит по кусочкам (SSE), в БД ничего не сохраняется.
+    """
+    _enforce_rate_limit(guest_rate_limiter, f"ip:{_client_ip(http_request)}")
+    guest_user = User(id=0, first_name="Гость", dob="2000-01-01", phone="")
+
+    cache_key = _guest_cache_key(request.text, guest_user)
+    if interpretation_cache is not None:
+        with span("cache_get"):
+            cached_text = await interpretation_cache.get(cache_key)
+        if cached_text is not None:
+            return StreamingResponse(
+                _cached_sse_events(cached_text),
+                media_type="text/event-stream",
+                headers=SSE_HEADERS,
+            )
+
+    async def remember(interpretation_text: str) -> None:
+        if interpretation_cache is not None:
+            await interpretation_cache.set(cache_key, interpretation_text)
+
+    first_piece, chunks, cleaner = await _start_stream(request.text, guest_user, [])
+    return _LLMStreamingResponse(_sse_events(first_piece, chunks, cleaner, on_complete=remember), chunks)
+
+
+@router.post("/interpret_stream")
+async def interpret_dream_stream(request: DreamRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Потоковый вариант /interpret. Сон сохраняется в БД, когда модель закончила ответ.
+    """
+    _enforce_rate_limit(user_rate_limiter, f"user:{request.user_id}")
+    with span("user_lookup"):
+        user = await user_cache.get_user(db, request.user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    with span("past_dreams"):
+        past_dreams = await select_context_dreams(db, user, request.text)
+        # Отдаем соединение обратно в пул, пока модель думает (объекты не протухнут: expire_on_commit=False)
+        await db.commit()
+    first_piece, chunks, cleaner = await _start_stream(request.text, user, past_dreams)
+
+    user_id = user.id
+
+    async def save_dream(interpretation_text: str) -> None:
+        # Отдельная сессия: поток живет дольше, чем обработчик запроса
+        async with SessionLocal() as session:
+            session.add(Dream(request_text=request.text, response_text=interpretation_text, user_id=user_id))
+            with span("commit"):
+                await session.commit()
+        user_cache.invalidate_dreams(user_id)
+        schedule_dream_memory_refresh(user_id)
+
+    return _LLMStreamingResponse(_sse_events(first_piece, chunks, cleaner, on_complete=save_dream), chunks)
+
+
+# --- ФОНОВЫЕ ЗАДАЧИ: ответ сразу, толкование потом ---
+
+@router.post("/jobs", response_model=InterpretationJobResponse, status_code=202)
+async def create_interpretation_job(request: DreamRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Ставит сон в очередь и сразу возвращает id задачи. Результат — через GET /chat/jobs/{id}.
+    """
+    _enforce_rate_limit(user_rate_limiter, f"user:{request.user_id}")
+    user_exists = await db.scalar(select(User.id).where(User.id == request.user_id))
+    if not user_exists:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    job = InterpretationJob(id=new_job_id(), user_id=request.user_id, request_text=request.text,
+                            status=JOB_PENDING, attempts=0)
+    db.add(job)
+    await db.commit()
+    await job_queue.submit(job.id)
+
+    return InterpretationJobResponse(id=job.id, status=job.status)
+
+
+@router.get("/jobs/{job_id}", response_model=InterpretationJobResponse)
+async def get_interpretation_job(job_id: str, db: AsyncSession = Depends(get_db)):
+    job = await db.scalar(select(InterpretationJob).where(InterpretationJob.id == job_id))
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -1,50 +1,113 @@
 # backend/app/api/v1/endpoints/payment.py
-import hashlib
-from fastapi import APIRouter
-from pydantic import BaseModel
+from decimal import Decimal
+from urllib.parse import parse_qsl
 
-from app.core.config import settings
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+
+from app.services.robokassa import payment_url, to_amount, verify_result_signature
+from dream_engine.db.session import get_db
+from dream_engine.db.models.invoice import Invoice, INVOICE_PAID, INVOICE_PENDING
+from dream_engine.db.models.user import User
+from dream_engine.services.user_cache import user_cache
 
 router = APIRouter()
 
 
 class InvoiceRequest(BaseModel):
     user_id: int
-    amount: float = 100.0
-    description: str = "Расширенное толкование сна"
+    amount: float = Field(100.0, gt=0, le=1_000_000)
+    description: str = Field("Расширенное толкование сна", max_length=255)
+
+
+async def _find_by_idempotency_key(db: AsyncSession, user_id: int, key: str) -> Invoice | None:
+    return await db.scalar(select(Invoice).where(Invoice.user_id == user_id, Invoice.idempotency_key == key))
+
+
+def _invoice_response(invoice: Invoice, amount: Decimal, description: str) -> dict:
+    # Тот же ключ с другими параметрами — ошибка клиента, а не повтор
+    if invoice.amount != amount or invoice.description != description:
+        raise HTTPException(status_code=409, detail="Idempotency-Key уже использован для другого счета")
+    return {"invoice_id": invoice.id, "status": invoice.status, "payment_url": payment_url(invoice)}
 
 
 @router.post("/create_invoice", response_model=dict)
-def create_payment_link(request: InvoiceRequest):
+async def create_payment_link(
+        request: InvoiceRequest,
+        idempotency_key: str | None = Header(None, max_length=64),
+        db: AsyncSession = Depends(get_db)
+):
     """
-    Генерирует ссылку для перенаправления пользователя на страницу оплаты Робокассы.
-    Используются тестовые значения, реальный платеж не пройдет.
+    Создает счет и возвращает ссылку на страницу оплаты Робокассы.
+    Номер счета выдает последовательность БД. С заголовком Idempotency-Key повтор запроса
+    (ретрай фронтенда, двойной клик) возвращает тот же счет, а не создает новый.
     """
-    merchant_login = settings.ROBOKASSA_MERCHANT_LOGIN
-    password_1 = settings.ROBOKASSA_PASSWORD_1
-
-    # Уникальный номер счета в вашей системе. Для заглушки используем timestamp.
-    import time
-    invoice_id = int(time.time())
-
-    amount = request.amount
-    description = request.description
-
-    # Формируем подпись по алгоритму MD5
-    signature_string = f"{merchant_login}:{amount}:{invoice_id}:{password_1}"
-    signature_hash = hashlib.md5(signature_string.encode('utf-8')).hexdigest()
-
-    # Формируем URL. is_test=1 - важный параметр для тестового режима.
-    payment_url = (
-        f"https://auth.robokassa.ru/Merchant/Index.aspx?"
-        f"MerchantLogin={merchant_login}&"
-        f"OutSum={amount}&"
-        f"InvoiceID={invoice_id}&"
-        f"Description={description}&"
-        f"SignatureValue={signature_hash}&"
-        f"IsTest=1"  # <--- Указываем, что это тестовый платеж
-    )
+    amount = to_amount(request.amount)
+    if not await user_cache.get_user(db, request.user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+
+    invoice = Invoice(user_id=request.user_id, amount=amount, description=request.description,
+                      status=INVOICE_PENDING, idempotency_key=idempotency_key)
+    db.add(invoice)
+    try:
+        # Сразу INSERT, без предварительного SELECT: обычный запрос — одна запись, а повтор
+        # (в том числе одновременный) упирается в уникальный ключ и получает уже созданный счет
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        existing = await _find_by_idempotency_key(db, request.user_id, idempotency_key) if idempotency_key else None
+        if existing is not None:
+            return _invoice_response(existing, amount, request.description)
+        # Не повтор: чаще всего пользователя удалили после проверки (кэш еще помнил его) — внешний ключ
+        if await db.scalar(select(User.id).where(User.id == request.user_id)) is None:
+            user_cache.invalidate_user(request.user_id)
+            raise HTTPException(status_code=404, detail="User not found")
+        print(f"Счет для пользователя {request.user_id} не создан: конфликт в БД")
+        raise HTTPException(status_code=409, detail="Счет не создан: конфликт данных, повторите запрос")
 
-    print(f"Сгенерирована ссылка на оплату для пользователя {request.user_id}: {payment_url}")
+    print(f"Создан счет {invoice.id} на {amount} для пользователя {request.user_id}")
+    return _invoice_response(invoice, amount, request.description)
+
+
+@router.api_route("/result", methods=["GET", "POST"], response_class=PlainTextResponse)
+async def robokassa_result(http_request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Result URL Робокассы: уведомление об оплате (POST-форма или GET, как настроено в кабинете).
+    Подпись проверяется паролем #2; счет помечается оплаченным одним UPDATE по первичному ключу.
+    Повторное уведомление об уже оплаченном счете — тоже "OK", как того ждет Робокасса.
+    """
+    params = dict(http_request.query_params)
+    if http_request.method == "POST":
+        params.update(parse_qsl((await http_request.body()).decode("utf-8")))
+    out_sum, invoice_id, signature = params.get("OutSum"), params.get("InvId"), params.get("SignatureValue")
+    if not (out_sum and invoice_id and signature and invoice_id.isdigit()):
+        raise HTTPException(status_code=400, detail="Нужны OutSum, InvId и SignatureValue")
+    if not verify_result_signature(out_sum, invoice_id, signature):
+        raise HTTPException(status_code=400, detail="bad sign")
+    try:
+        amount = to_amount(out_sum)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    result = await db.execute(
+        update(Invoice)
+        .where(Invoice.id == int(invoice_id), Invoice.status == INVOICE_PENDING, Invoice.amount == amount)
+        .values(status=INVOICE_PAID, paid_at=func.now())
+    )
+    await db.commit()
+    if result.rowcount == 0:
+        # Редкий путь: разбираемся, почему не обновили
+        invoice = await db.scalar(select(Invoice).where(Invoice.id == int(invoice_id)))
+        if invoice is None:
+            raise HTTPException(status_code=404, detail="Invoice not found")
+        if invoice.status != INVOICE_PAID:
+            raise HTTPException(status_code=400, detail="Сумма не совпадает со счетом")
+    else:
+        print(f"Счет {invoice_id} оплачен: {amount}")
 
-    return {"payment_url": payment_url}
\ No newline at end of file
+    return f"OK{invoice_id}"
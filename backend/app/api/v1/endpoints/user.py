@@ -1,25 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import base64
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import TypeAdapter
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 from typing import List
 
+from app.api.http_cache import compressed_json, etag_matches, make_etag, not_modified
 from app.schemas.user import User, UserCreate
-from app.db.session import get_db
-from app.db.models.user import User as UserModel
-from app.schemas.dream import ChatHistoryMessage
-from app.db.models.dream import Dream as DreamModel
+from dream_engine.db.session import get_db
+from dream_engine.db.models.user import User as UserModel
+from app.schemas.dream import ChatHistoryMessage, ChatHistoryPage, DreamSearchPage, JournalImportResult
+from dream_engine.db.models.dream import Dream as DreamModel
+from app.services.journal_import import JournalFormatError, import_journal
+from dream_engine.services.memory_service import schedule_dream_memory_refresh
+from app.services.search_service import search_dreams
+from dream_engine.services.user_cache import user_cache
 
 router = APIRouter()
 
+# Для истории нужны только эти колонки — остальное из БД не тянем
+HISTORY_COLUMNS = load_only(
+    DreamModel.id, DreamModel.request_text, DreamModel.response_text, DreamModel.created_at
+)
+# Сериализация истории сразу в JSON-байты (pydantic-core), без промежуточных dict
+HISTORY_ADAPTER = TypeAdapter(List[ChatHistoryMessage])
+
 
 @router.post("/", response_model=User, status_code=200)  # Меняем статус на 200 OK, т.к. может быть и логин
-def smart_login_or_create_user(user_data: UserCreate, db: Session = Depends(get_db)):
+async def smart_login_or_create_user(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     """
     Ищет пользователя по номеру телефона.
     - Если не найден: создает нового и сохраняет его гостевую историю (если есть).
     - Если найден: проверяет остальные данные. Если они совпадают - логинит.
     - Если найден, но данные не совпадают - возвращает ошибку.
     """
-    existing_user = db.query(UserModel).filter(UserModel.phone == user_data.phone).first()
+    existing_user = await db.scalar(select(UserModel).where(UserModel.phone == user_data.phone))
 
     # Сценарий А: Пользователь НЕ найден -> Создаем нового
     if not existing_user:
@@ -36,21 +54,27 @@ def smart_login_or_create_user(user_data: UserCreate, db: Session = Depends(get_
         # --- ИНТЕГРАЦИЯ НОВОЙ ЛОГИКИ ЗДЕСЬ ---
         # Проверяем, передал ли фронтенд гостевые сообщения
         if user_data.guest_messages:
-            db.flush()  # Получаем ID для new_user, не завершая транзакцию
+            await db.flush()  # Получаем ID для new_user, не завершая транзакцию
             print(
                 f"Сохранение {len(user_data.guest_messages)} гостевых сообщений для нового пользователя ID: {new_user.id}")
 
-            for msg_pair in user_data.guest_messages:
-                db_dream = DreamModel(
-                    request_text=msg_pair.request_text,
-                    response_text=msg_pair.response_text,
-                    user_id=new_user.id
-                )
-                db.add(db_dream)
+            # Один INSERT на всю гостевую историю вместо объекта ORM на каждое сообщение
+            await db.execute(insert(DreamModel), [
+                {
+                    "request_text": msg_pair.request_text,
+                    "response_text": msg_pair.response_text,
+                    "user_id": new_user.id,
+                }
+                for msg_pair in user_data.guest_messages
+            ])
         # --- КОНЕЦ ИНТЕГРАЦИИ ---
 
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
+        user_cache.invalidate_user(new_user.id, new_user.telegram_id)
+        user_cache.invalidate_dreams(new_user.id)
+        if user_data.guest_messages:
+            schedule_dream_memory_refresh(new_user.id)
         # Устанавливаем статус 201 Created только при создании
         # Для этого нужно будет немного переделать ответ FastAPI, но для хакатона это не критично
         return new_user
@@ -73,17 +97,128 @@ def smart_login_or_create_user(user_data: UserCreate, db: Session = Depends(get_
             )
 
 
+async def _history_validator(db: AsyncSession, user_id: int) -> tuple | None:
+    """
+    Число снов, последний id и время последнего сна — одним запросом по индексу (user_id, created_at).
+    Любая запись или удаление сна меняет хотя бы одно из них. None — пользователя нет.
+    """
+    row = (await db.execute(
+        select(func.count(DreamModel.id), func.max(DreamModel.id), func.max(DreamModel.created_at))
+        .select_from(UserModel)
+        .outerjoin(DreamModel, DreamModel.user_id == UserModel.id)
+        .where(UserModel.id == user_id)
+        .group_by(UserModel.id)
+    )).first()
+    return None if row is None else tuple(row)
+
+
 @router.get("/{user_id}/history", response_model=List[ChatHistoryMessage])
-def get_user_chat_history(user_id: int, db: Session = Depends(get_db)):
+async def get_user_chat_history(user_id: int, http_request: Request, db: AsyncSession = Depends(get_db)):
     """
     Возвращает историю чата для указанного пользователя.
+    С If-None-Match от прошлого ответа и без новых снов — 304 без загрузки истории.
+    """
+    validator = await _history_validator(db, user_id)
+    if validator is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    etag = make_etag("history", user_id, *validator)
+    if etag_matches(http_request, etag):
+        return not_modified(etag)
+
+    dreams = (await db.scalars(
+        select(DreamModel)
+        .options(HISTORY_COLUMNS)
+        .where(DreamModel.user_id == user_id)
+        .order_by(DreamModel.created_at.asc())
+    )).all()
+
+    return compressed_json(http_request, HISTORY_ADAPTER.dump_json(_dreams_to_messages(dreams)), etag)
+
+
+@router.get("/{user_id}/history/page", response_model=ChatHistoryPage)
+async def get_user_chat_history_page(
+        user_id: int,
+        http_request: Request,
+        limit: int = Query(20, ge=1, le=100),
+        before: str | None = Query(None, description="next_cursor из предыдущей страницы"),
+        db: AsyncSession = Depends(get_db)
+):
+    """
+    Постраничная история для бесконечной прокрутки: сначала самые свежие сны,
+    затем (с before=next_cursor) всё более старые. Пагинация по ключу (created_at, id),
+    поэтому стоимость страницы не зависит от того, насколько далеко пролистали.
+    """
+    validator = await _history_validator(db, user_id)
+    if validator is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    etag = make_etag("history_page", user_id, limit, before, *validator)
+    if etag_matches(http_request, etag):
+        return not_modified(etag)
+
+    query = (
+        select(DreamModel)
+        .options(HISTORY_COLUMNS)
+        .where(DreamModel.user_id == user_id)
+        .order_by(DreamModel.created_at.desc(), DreamModel.id.desc())
+        .limit(limit + 1)  # Лишняя запись говорит, что есть страница дальше
+    )
+    if before:
+        created_at, dream_id = _decode_history_cursor(before)
+        query = query.where(tuple_(DreamModel.created_at, DreamModel.id) < tuple_(created_at, dream_id))
+
+    dreams = (await db.scalars(query)).all()
+    has_more = len(dreams) > limit
+    dreams = dreams[:limit]
+
+    next_cursor = _encode_history_cursor(dreams[-1]) if has_more else None
+    # Внутри страницы отдаем от старых к новым, как в обычной истории
+    page = ChatHistoryPage(messages=_dreams_to_messages(reversed(dreams)), next_cursor=next_cursor)
+    return compressed_json(http_request, page.model_dump_json().encode("utf-8"), etag)
+
+
+@router.get("/{user_id}/dreams/search", response_model=DreamSearchPage)
+async def search_user_dreams(
+        user_id: int,
+        q: str = Query(..., min_length=2, max_length=200, description="Слова для поиска, можно \"фразу\" и -исключение"),
+        limit: int = Query(20, ge=1, le=50),
+        offset: int = Query(0, ge=0, le=1000, description="next_offset из предыдущей страницы"),
+        db: AsyncSession = Depends(get_db)
+):
     """
-    user = db.query(UserModel).filter(UserModel.id == user_id).first()
-    if not user:
+    Поиск по снам и толкованиям пользователя: с учетом словоформ ("летала" найдет "летать"),
+    а если по словам ничего нет — нечетко, по похожему написанию (опечатки).
+    """
+    user_exists = await db.scalar(select(UserModel.id).where(UserModel.id == user_id))
+    if not user_exists:
+        raise HTTPException(status_code=404, detail="User not found")
+    return await search_dreams(db, user_id, q.strip(), limit, offset)
+
+
+@router.post("/{user_id}/dreams/import", response_model=JournalImportResult)
+async def import_dream_journal(user_id: int, http_request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Импорт дневника снов: JSON-массив записей или NDJSON (Content-Type: application/x-ndjson),
+    запись — {"request_text": "...", "response_text": "...", "created_at": "2024-05-01T08:00:00"}.
+    Тело читается потоком и пишется порциями; некорректные записи пропускаются и
+    перечисляются в ответе с номером строки/элемента.
+    """
+    user_exists = await db.scalar(select(UserModel.id).where(UserModel.id == user_id))
+    if not user_exists:
         raise HTTPException(status_code=404, detail="User not found")
+    await db.commit()
 
-    dreams = db.query(DreamModel).filter(DreamModel.user_id == user_id).order_by(DreamModel.created_at.asc()).all()
+    try:
+        result = await import_journal(db, user_id, http_request.stream(), http_request.headers.get("content-type"))
+    except JournalFormatError as e:
+        # Уже записанные порции остаются: повторный импорт можно начать с места ошибки
+        raise HTTPException(status_code=400, detail=str(e))
 
+    if result.inserted:
+        schedule_dream_memory_refresh(user_id)
+    return result
+
+
+def _dreams_to_messages(dreams) -> List[ChatHistoryMessage]:
     history: List[ChatHistoryMessage] = []
     for dream in dreams:
         history.append(
@@ -93,5 +228,18 @@ def get_user_chat_history(user_id: int, db: Session = Depends(get_db)):
             history.append(
                 ChatHistoryMessage(role='bot', text=dream.response_text, created_at=dream.created_at)
             )
+    return history
+
+
+def _encode_history_cursor(dream: DreamModel) -> str:
+    raw = f"{dream.created_at.isoformat()}|{dream.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
 
-    return history
\ No newline at end of file
+def _decode_history_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, dream_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(dream_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Некорректный курсор истории")
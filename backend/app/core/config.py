@@ -1,11 +0,0 @@
-# backend/app/core/config.py
-from pydantic_settings import BaseSettings
-
-class Settings(BaseSettings):
-    DATABASE_URL: str
-    OPENROUTER_API_KEY: str
-
-    class Config:
-        env_file = ".env"
-
-settings = Settings()
\ No newline at end of file
@@ -1,18 +1,44 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.api import api_router
-from app.db.models import dream, user
+from app.api.health import router as health_router
+from app.api.metrics import MetricsMiddleware, router as metrics_router
+from app.api.timing import TimingMiddleware
+from dream_engine.db.models import dream, user, interpretation_cache, job, bot_state, invoice
 # backend/app/main.py
 
 # ... (импорты FastAPI, CORSMiddleware, api_router) ...
-from app.db.session import engine, Base
-from app.db.models import dream # Важно импортировать модели, чтобы Base их "увидел"
+from dream_engine.db.session import engine
+from dream_engine.services.llm_service import close_http_client
+from app.services.job_queue import job_queue
+from app.services.lifecycle import prepare_schema, startup_state, warm_up
+
 
-# Создаем таблицы при запуске (для хакатона это ок, в проде используют миграции)
-Base.metadata.create_all(bind=engine)
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Схему создают миграции (alembic upgrade head); здесь только проверяем, что она актуальна
+    try:
+        await prepare_schema()
+        await warm_up()
+    except BaseException:
+        # Открытые при проверке соединения не дали бы процессу завершиться
+        await close_http_client()
+        await engine.dispose()
+        raise
+    await job_queue.start()
+    startup_state.ready = True
+    yield
+    # /readyz сразу начинает отвечать 503: балансировщик уводит трафик, пока мы останавливаемся
+    startup_state.ready = False
+    await job_queue.stop()
+    # Закрываем пул keep-alive соединений к LLM и пул соединений к БД при остановке сервера
+    await close_http_client()
+    await engine.dispose()
 
-app = FastAPI(title="AI Dream Interpreter")
+
+app = FastAPI(title="AI Dream Interpreter", lifespan=lifespan)
 
 # --- Настройка CORS ---
 # Это КРИТИЧЕСКИ ВАЖНО, чтобы ваш фронтенд (даже открытый как локальный файл)
@@ -34,7 +60,12 @@ app.add_middleware(
 )
 # --- Конец настройки CORS ---
 
+app.add_middleware(TimingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(api_router, prefix="/api/v1")
+app.include_router(metrics_router)
+app.include_router(health_router)
 
 @app.get("/")
 def read_root():
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
+from typing import List, Optional
 
 # --- НОВАЯ СХЕМА ДЛЯ ГОСТЯ ---
 class GuestDreamRequest(BaseModel):
@@ -19,4 +20,65 @@ class ChatHistoryMessage(BaseModel):
     created_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class ChatHistoryPage(BaseModel):
+    """Страница истории для бесконечной прокрутки: сообщения от старых к новым."""
+    messages: List[ChatHistoryMessage]
+    # Передайте в параметр before, чтобы получить страницу постарше. None — история закончилась.
+    next_cursor: Optional[str] = None
+
+
+class DreamSearchHit(BaseModel):
+    id: int
+    created_at: datetime
+    rank: float
+    match: str  # fulltext | trigram (нечеткий, когда по словам ничего нет) | substring (не Postgres)
+    # Фрагменты текста: HTML уже экранирован, совпадения обернуты в <mark>
+    request_highlight: str
+    response_highlight: str
+
+
+class DreamSearchPage(BaseModel):
+    """Страница результатов поиска, от более релевантных к менее."""
+    results: List[DreamSearchHit]
+    # Передайте в параметр offset, чтобы получить следующую страницу. None — результатов больше нет.
+    next_offset: Optional[int] = None
+
+
+class JournalEntry(BaseModel):
+    """Одна запись импортируемого дневника снов."""
+    request_text: str = Field(..., min_length=1, description="Текст сна")
+    response_text: Optional[str] = None
+    created_at: Optional[datetime] = None  # Дата сна; если нет — время импорта
+
+
+class JournalImportError(BaseModel):
+    position: int  # Номер строки (NDJSON) или элемента массива (JSON), с 1
+    error: str
+
+
+class JournalImportChunk(BaseModel):
+    chunk: int
+    inserted: int
+    errors: List[JournalImportError]
+
+
+class JournalImportResult(BaseModel):
+    inserted: int
+    invalid: int
+    chunks: List[JournalImportChunk]
+
+
+class InterpretationJobResponse(BaseModel):
+    """Состояние фоновой задачи на толкование (POST/GET /chat/jobs)."""
+    id: str
+    status: str  # pending | running | done | failed
+    interpretation: Optional[str] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,301 @@
+# backend/app/services/job_queue.py
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update, or_, and_
+
+from dream_engine.core.config import settings
+from dream_engine.db.session import SessionLocal
+from dream_engine.db.models.dream import Dream
+from dream_engine.db.models.job import InterpretationJob, JOB_PENDING, JOB_RUNNING, JOB_DONE, JOB_FAILED
+from dream_engine.services.llm_service import coalesced_dream_interpretation, LLMError, LLMBusyError
+from dream_engine.services.memory_service import schedule_dream_memory_refresh
+from dream_engine.services.retrieval import select_context_dreams
+from dream_engine.services.user_cache import user_cache
+
+# Режим задач: HTTP-обработчик только кладет сон в interpretation_jobs и сразу отвечает,
+# а толкование делает пул воркеров. Так HTTP-воркеры не ждут LLM по 60 секунд.
+
+RETRIES_EXHAUSTED = "Не удалось обработать сон. Пожалуйста, попробуйте еще раз."
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+async def process_job(job_id: str) -> None:
+    """Толкует сон из задачи, сохраняет Dream и результат задачи."""
+    async with SessionLocal() as db:
+        job = await db.scalar(select(InterpretationJob).where(InterpretationJob.id == job_id))
+        if job is None:
+            return
+        user = await user_cache.get_user(db, job.user_id)
+        if user is None:
+            # Пользователя удалили, пока задача ждала: повторять бесполезно
+            await _fail(db, job, "Пользователь не найден")
+            return
+        past_dreams = await select_context_dreams(db, user, job.request_text)
+        # Отдаем соединение обратно в пул, пока модель думает
+        await db.commit()
+
+        try:
+            interpretation_text = await coalesced_dream_interpretation(
+                current_dream=job.request_text,
+                user=user,
+                past_dreams=past_dreams
+            )
+        except LLMBusyError:
+            # Перегрузка временная: воркер вернет задачу в очередь, не тратя попытку (см. _requeue)
+            raise
+        except LLMError as e:
+            await _fail(db, job, str(e))
+            return
+
+        db_dream = Dream(request_text=job.request_text, response_text=interpretation_text, user_id=user.id)
+        db.add(db_dream)
+        await db.flush()
+
+        job.status = JOB_DONE
+        job.interpretation = interpretation_text
+        job.dream_id = db_dream.id
+        job.finished_at = datetime.now(timezone.utc)
+        await db.commit()
+
+    user_cache.invalidate_dreams(user.id)
+    schedule_dream_memory_refresh(user.id)
+
+
+async def _fail(db, job: InterpretationJob, error: str) -> None:
+    job.status = JOB_FAILED
+    job.error = error
+    job.finished_at = datetime.now(timezone.utc)
+    await db.commit()
+
+
+class JobQueue:
+    """Пул воркеров. Наследники решают, откуда воркер берет следующую задачу."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._tasks: list[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+
+    async def start(self) -> None:
+        self._stopping.clear()
+        await _fail_exhausted()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweep()))
+
+    async def _sweep(self) -> None:
+        # Брошенную задачу без попыток не заберет ни один воркер — закрываем ее сами
+        while not self._stopping.is_set():
+            await asyncio.sleep(settings.JOB_STALE_AFTER)
+            await _fail_exhausted()
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, job_id: str) -> None:
+        """Сообщает очереди о новой задаче (строка в БД уже записана)."""
+        raise NotImplementedError
+
+    async def _next_job(self) -> str | None:
+        raise NotImplementedError
+
+    async def _worker(self, number: int) -> None:
+        while not self._stopping.is_set():
+            job_id = None
+            try:
+                job_id = await self._next_job()
+                if job_id is not None:
+                    await process_job(job_id)
+            except asyncio.CancelledError:
+                # stop() посреди толкования: задача не виновата — возвращаем ее в pending,
+                # иначе она так и останется running (локальная очередь брошенные не ищет)
+                if job_id is not None:
+                    await _requeue(job_id)
+                raise
+            except LLMBusyError as e:
+                # LLM перегружена — это не ошибка задачи: попытку не засчитываем и пробуем
+                # снова через retry_after. Воркер тем временем ждет: апстриму и так тяжело
+                print(f"Воркер {number}: LLM перегружена, задача {job_id} вернется через {e.retry_after} с")
+                await _requeue(job_id)
+                await asyncio.sleep(e.retry_after)
+                await self.submit(job_id)
+            except Exception as e:
+                # Воркер не должен умирать из-за одной плохой задачи или моргнувшей БД
+                print(f"Воркер {number}: ошибка при обработке задачи {job_id}: {e}")
+                if job_id is not None and await _release(job_id):
+                    await self.submit(job_id)
+                await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+
+
+async def _claim(job_id: str | None = None) -> str | None:
+    """
+    Атомарно переводит задачу в running. Без job_id берет самую старую доступную:
+    pending или брошенную (running дольше JOB_STALE_AFTER) с неисчерпанными попытками.
+    """
+    now = datetime.now(timezone.utc)
+    claimable = and_(
+        InterpretationJob.attempts < settings.JOB_MAX_ATTEMPTS,
+        or_(
+            InterpretationJob.status == JOB_PENDING,
+            and_(
+                InterpretationJob.status == JOB_RUNNING,
+                InterpretationJob.started_at < now - timedelta(seconds=settings.JOB_STALE_AFTER),
+            ),
+        ),
+    )
+    async with SessionLocal() as db:
+        if job_id is None:
+            # SKIP LOCKED: параллельные воркеры (в т.ч. в других процессах) не ждут друг друга
+            job_id = await db.scalar(
+                select(InterpretationJob.id)
+                .where(claimable)
+                .order_by(InterpretationJob.created_at)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            if job_id is None:
+                return None
+
+        result = await db.execute(
+            update(InterpretationJob)
+            .where(InterpretationJob.id == job_id, claimable)
+            .values(status=JOB_RUNNING, started_at=now, attempts=InterpretationJob.attempts + 1)
+        )
+        await db.commit()
+    return job_id if result.rowcount == 1 else None
+
+
+async def _release(job_id: str) -> bool:
+    """
+    Возвращает упавшую задачу в pending или, если попытки кончились, помечает failed.
+    True — задачу нужно снова поставить в очередь.
+    """
+    try:
+        async with SessionLocal() as db:
+            job = await db.scalar(select(InterpretationJob).where(InterpretationJob.id == job_id))
+            if job is None or job.status != JOB_RUNNING:
+                return False
+            retry = job.attempts < settings.JOB_MAX_ATTEMPTS
+            if retry:
+                job.status = JOB_PENDING
+            else:
+                job.status = JOB_FAILED
+                job.error = RETRIES_EXHAUSTED
+                job.finished_at = datetime.now(timezone.utc)
+            await db.commit()
+            return retry
+    except Exception as e:
+        # Если и БД недоступна — задачу подберут как брошенную через JOB_STALE_AFTER
+        print(f"Не удалось вернуть задачу {job_id} в очередь: {e}")
+        return False
+
+
+async def _requeue(job_id: str) -> None:
+    """Возвращает задачу из running в pending и отменяет засчитанную _claim попытку."""
+    try:
+        async with SessionLocal() as db:
+            await db.execute(
+                update(InterpretationJob)
+                .where(InterpretationJob.id == job_id, InterpretationJob.status == JOB_RUNNING)
+                .values(status=JOB_PENDING, attempts=InterpretationJob.attempts - 1)
+            )
+            await db.commit()
+    except Exception as e:
+        print(f"Не удалось вернуть задачу {job_id} в очередь: {e}")
+
+
+async def _fail_exhausted() -> None:
+    """
+    Помечает failed брошенные задачи (running дольше JOB_STALE_AFTER), у которых кончились попытки:
+    _claim их уже не возьмет, и без этого клиенты опрашивали бы GET /chat/jobs/{id} вечно.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        async with SessionLocal() as db:
+            result = await db.execute(
+                update(InterpretationJob)
+                .where(
+                    InterpretationJob.status == JOB_RUNNING,
+                    InterpretationJob.started_at < now - timedelta(seconds=settings.JOB_STALE_AFTER),
+                    InterpretationJob.attempts >= settings.JOB_MAX_ATTEMPTS,
+                )
+                .values(status=JOB_FAILED, error=RETRIES_EXHAUSTED, finished_at=now)
+            )
+            await db.commit()
+        if result.rowcount:
+            print(f"Брошенных задач без попыток помечено failed: {result.rowcount}")
+    except Exception as e:
+        print(f"Не удалось закрыть брошенные задачи: {e}")
+
+
+class LocalJobQueue(JobQueue):
+    """
+    Очередь в памяти процесса. При старте подбирает задачи, оставшиеся pending после рестарта,
+    и брошенные (running дольше JOB_STALE_AFTER — процесс упал посреди толкования).
+    """
+
+    def __init__(self, workers: int):
+        super().__init__(workers)
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+
+    async def start(self) -> None:
+        # Сначала базовый start: он закроет брошенные задачи без попыток, остальные подберем здесь
+        await super().start()
+        stale_before = datetime.now(timezone.utc) - timedelta(seconds=settings.JOB_STALE_AFTER)
+        async with SessionLocal() as db:
+            pending = (await db.scalars(
+                select(InterpretationJob.id)
+                .where(or_(
+                    InterpretationJob.status == JOB_PENDING,
+                    and_(InterpretationJob.status == JOB_RUNNING, InterpretationJob.started_at < stale_before),
+                ))
+                .order_by(InterpretationJob.created_at)
+            )).all()
+        for job_id in pending:
+            self._queue.put_nowait(job_id)
+
+    async def submit(self, job_id: str) -> None:
+        self._queue.put_nowait(job_id)
+
+    async def _next_job(self) -> str | None:
+        job_id = await self._queue.get()
+        return await _claim(job_id)
+
+
+class PostgresJobQueue(JobQueue):
+    """Общая очередь для всех процессов: воркеры сами забирают задачи из таблицы."""
+
+    def __init__(self, workers: int):
+        super().__init__(workers)
+        self._wakeup = asyncio.Event()
+
+    async def submit(self, job_id: str) -> None:
+        # Будим воркеры этого процесса сразу, остальные заметят задачу при следующем опросе
+        self._wakeup.set()
+
+    async def _next_job(self) -> str | None:
+        job_id = await _claim()
+        if job_id is None:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+        return job_id
+
+
+def build_job_queue() -> JobQueue:
+    if settings.JOB_QUEUE_BACKEND == "postgres":
+        return PostgresJobQueue(settings.JOB_WORKERS)
+    return LocalJobQueue(settings.JOB_WORKERS)
+
+
+job_queue = build_job_queue()
@@ -0,0 +1,182 @@
+# backend/app/services/journal_import.py
+import codecs
+import json
+from datetime import datetime, timezone
+from typing import AsyncIterator
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dream_engine.core.config import settings
+from dream_engine.db.models.dream import Dream
+from app.schemas.dream import JournalEntry, JournalImportChunk, JournalImportError, JournalImportResult
+from dream_engine.services.user_cache import user_cache
+
+# Импорт дневника снов из большого JSON-массива или NDJSON (одна запись на строку).
+# Тело читается потоком и разбирается по записи: в памяти лежит только текущая
+# порция записей (IMPORT_CHUNK_SIZE), которая уходит в БД одним INSERT (executemany)
+# и фиксируется отдельным commit — прерванный импорт оставляет уже загруженные порции.
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines")
+
+
+class JournalFormatError(Exception):
+    """Тело сломано так, что дальше разбирать нельзя (в отличие от ошибки в одной записи)."""
+    pass
+
+
+def is_ndjson(content_type: str | None) -> bool:
+    return (content_type or "").split(";")[0].strip().lower() in NDJSON_CONTENT_TYPES
+
+
+def _parse_line(position: int, line: bytes) -> tuple[int, object, str | None]:
+    try:
+        return position, json.loads(line), None
+    except ValueError:
+        return position, None, "некорректный JSON"
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, object, str | None]]:
+    """(номер строки, разобранное значение, ошибка разбора) — по одной на каждую непустую строку."""
+    buffer = b""
+    line_no = 0
+    async for chunk in chunks:
+        lines = (buffer + chunk).split(b"\n")
+        buffer = lines.pop()  # Хвост без перевода строки дочитаем со следующим куском
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                yield _parse_line(line_no, line)
+        if len(buffer) > settings.IMPORT_MAX_ENTRY_BYTES:
+            raise JournalFormatError(f"Строка {line_no + 1} длиннее {settings.IMPORT_MAX_ENTRY_BYTES} байт")
+    if buffer.strip():
+        yield _parse_line(line_no + 1, buffer)
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, object, str | None]]:
+    """(номер элемента, значение, None) для JSON-массива верхнего уровня, без загрузки массива целиком."""
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    text = ""
+    index = 0
+    state = "start"  # start -> value_or_end -> comma_or_end <-> value -> done
+
+    async def more() -> bool:
+        nonlocal text
+        try:
+            async for chunk in chunks:
+                text += utf8.decode(chunk)
+                return True
+            text += utf8.decode(b"", final=True)
+        except UnicodeDecodeError:
+            raise JournalFormatError("некорректная кодировка UTF-8")
+        return False
+
+    has_more = True
+    while True:
+        text = text.lstrip()
+        if not text:
+            if not has_more:
+                break
+            has_more = await more()
+            continue
+
+        if state == "start":
+            if text[0] != "[":
+                raise JournalFormatError("Ожидался JSON-массив записей или NDJSON")
+            text, state = text[1:], "value_or_end"
+        elif state in ("value_or_end", "comma_or_end") and text[0] == "]":
+            text, state = text[1:], "done"
+        elif state == "comma_or_end":
+            if text[0] != ",":
+                raise JournalFormatError(f"Ожидалась запятая после элемента {index}")
+            text, state = text[1:], "value"
+        elif state == "done":
+            raise JournalFormatError("Лишние данные после конца массива")
+        else:
+            try:
+                value, end = decoder.raw_decode(text)
+            except json.JSONDecodeError:
+                # Скорее всего, элемент просто еще не дочитан
+                if len(text) > settings.IMPORT_MAX_ENTRY_BYTES:
+                    raise JournalFormatError(f"Элемент {index + 1} длиннее {settings.IMPORT_MAX_ENTRY_BYTES} байт "
+                                             f"или содержит некорректный JSON")
+                if not has_more:
+                    raise JournalFormatError(f"Элемент {index + 1}: некорректный JSON")
+                has_more = await more()
+                continue
+            if end == len(text) and has_more:
+                # Значение упирается в конец прочитанного: число могло оборваться на границе
+                # куска ("12" + "34"), поэтому дочитываем и разбираем элемент заново
+                has_more = await more()
+                continue
+            index += 1
+            text, state = text[end:], "comma_or_end"
+            yield index, value, None
+
+    if state != "done":
+        raise JournalFormatError("JSON-массив оборвался")
+
+
+def _validation_message(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'запись'}: {error['msg']}" for error in e.errors()
+    )
+
+
+async def import_journal(db: AsyncSession, user_id: int, chunks: AsyncIterator[bytes],
+                         content_type: str | None) -> JournalImportResult:
+    entries = iter_ndjson(chunks) if is_ndjson(content_type) else iter_json_array(chunks)
+    result = JournalImportResult(inserted=0, invalid=0, chunks=[])
+    rows: list[dict] = []
+    errors: list[JournalImportError] = []
+    reported_errors = 0
+
+    async def flush() -> None:
+        if rows:
+            # Один INSERT с пачкой параметров: asyncpg отправляет его как multi-VALUES/executemany
+            await db.execute(insert(Dream), rows)
+            await db.commit()
+            user_cache.invalidate_dreams(user_id)  # Записи с недавним created_at меняют "последние сны"
+        result.chunks.append(JournalImportChunk(chunk=len(result.chunks) + 1, inserted=len(rows), errors=list(errors)))
+        result.inserted += len(rows)
+        print(f"Импорт дневника пользователя {user_id}: порция {len(result.chunks)}, "
+              f"записано {len(rows)}, всего {result.inserted}, ошибок {result.invalid}")
+        rows.clear()
+        errors.clear()
+
+    imported_at = datetime.now(timezone.utc)
+    try:
+        async for position, item, error in entries:
+            if error is None:
+                try:
+                    entry = JournalEntry.model_validate(item)
+                except ValidationError as e:
+                    error = _validation_message(e)
+
+            if error is not None:
+                result.invalid += 1
+                if reported_errors < settings.IMPORT_MAX_ERRORS:
+                    errors.append(JournalImportError(position=position, error=error))
+                    reported_errors += 1
+                continue
+
+            created_at = entry.created_at or imported_at
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            rows.append({
+                "user_id": user_id,
+                "request_text": entry.request_text,
+                "response_text": entry.response_text,
+                # У всех строк одного executemany должен быть одинаковый набор колонок
+                "created_at": created_at,
+            })
+            if len(rows) >= settings.IMPORT_CHUNK_SIZE:
+                await flush()
+    except JournalFormatError as e:
+        raise JournalFormatError(f"{e}. Записано до ошибки: {result.inserted}")
+
+    if rows or errors:
+        await flush()
+    return result
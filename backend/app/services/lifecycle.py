@@ -0,0 +1,170 @@
+# backend/app/services/lifecycle.py
+import asyncio
+import time
+from pathlib import Path
+
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import text
+
+from dream_engine.core.config import settings
+from dream_engine.db.session import Base, engine
+from dream_engine.services.llm_router import CLOSED
+from dream_engine.services.llm_service import get_http_client, llm_router
+
+# Жизненный цикл процесса бэкенда: проверка схемы БД при старте (вместо create_all),
+# прогрев пула соединений к БД и keep-alive соединений к LLM, состояние для /readyz.
+# Пока прогрев не закончен, /readyz отвечает 503 — балансировщик не шлет трафик
+# в холодный под, и первые запросы не платят за TCP/TLS и авторизацию в Postgres.
+
+ALEMBIC_DIR = Path(__file__).resolve().parents[2] / "alembic"
+ALEMBIC_INI = ALEMBIC_DIR.parent / "alembic.ini"
+
+
+class SchemaOutdated(Exception):
+    """Ревизия БД не совпадает с последней миграцией: запускаться на такой схеме нельзя."""
+    pass
+
+
+class StartupState:
+    def __init__(self):
+        self.ready = False
+        self.schema_revision: str | None = None
+        self.db_connections_warmed = 0
+        self.upstream_warmup_ms: dict[str, float | None] = {}
+
+
+startup_state = StartupState()
+
+
+def _alembic_heads() -> set[str]:
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_DIR))
+    return set(ScriptDirectory.from_config(config).get_heads())
+
+
+async def prepare_schema() -> None:
+    if settings.DB_AUTO_CREATE:
+        # Локальная отладка и бенчмарки на SQLite: таблицы по моделям, без миграций
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        startup_state.schema_revision = "create_all"
+        return
+
+    heads = await asyncio.to_thread(_alembic_heads)
+    async with engine.connect() as conn:
+        current = set(await conn.run_sync(lambda sync_conn: MigrationContext.configure(sync_conn).get_current_heads()))
+    if current != heads:
+        raise SchemaOutdated(f"Ревизия БД {sorted(current) or 'не задана'}, последняя миграция {sorted(heads)}: "
+                             f"выполните alembic upgrade head")
+    startup_state.schema_revision = ",".join(sorted(current))
+
+
+async def prewarm_db_pool(connections: int) -> int:
+    """Открывает connections соединений одновременно (иначе пул отдал бы одно и то же) и возвращает их в пул."""
+    opened = await asyncio.gather(*(engine.connect() for _ in range(connections)), return_exceptions=True)
+    warmed = 0
+    for conn in opened:
+        if isinstance(conn, BaseException):
+            print(f"Прогрев пула БД: не удалось открыть соединение: {conn!r}")
+            continue
+        try:
+            await conn.execute(text("SELECT 1"))
+            warmed += 1
+        finally:
+            await conn.close()
+    return warmed
+
+
+async def _warm_provider(url: str, connections: int) -> float | None:
+    # Ответ не важен (HEAD на chat/completions обычно 404/405) — важно установленное
+    # TLS-соединение, которое останется в пуле keep-alive общего клиента
+    async def probe() -> float:
+        started_at = time.perf_counter()
+        await get_http_client().head(url, timeout=settings.LLM_PREWARM_TIMEOUT)
+        return time.perf_counter() - started_at
+
+    results = await asyncio.gather(*(probe() for _ in range(connections)), return_exceptions=True)
+    latencies = [result for result in results if not isinstance(result, BaseException)]
+    if not latencies:
+        print(f"Прогрев LLM {url}: недоступен ({results[0]!r})")
+        return None
+    return round(min(latencies) * 1000, 1)
+
+
+async def prewarm_upstream(connections: int) -> None:
+    if connections <= 0:
+        return  # Прогрев LLM выключен
+    names = [provider.name for provider in llm_router.providers]
+    results = await asyncio.gather(*(_warm_provider(provider.config.url, connections)
+                                     for provider in llm_router.providers))
+    startup_state.upstream_warmup_ms = dict(zip(names, results))
+
+
+async def warm_up() -> None:
+    pool_size = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+    warmed, _ = await asyncio.gather(
+        prewarm_db_pool(min(settings.DB_PREWARM_CONNECTIONS, pool_size)),
+        prewarm_upstream(settings.LLM_PREWARM_CONNECTIONS),
+    )
+    startup_state.db_connections_warmed = warmed
+    print(f"Прогрев: соединений с БД {warmed}, LLM {startup_state.upstream_warmup_ms}")
+
+
+def _pool_state() -> dict:
+    pool = engine.pool
+    state = {"class": type(pool).__name__}
+    # У QueuePool есть счетчики; у пулов SQLite их может не быть
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            state[name] = method()
+    return state
+
+
+def _upstream_state() -> dict:
+    upstream = {}
+    for provider in llm_router.providers:
+        p50 = provider.breaker.latency_percentile(0.5)
+        p95 = provider.breaker.latency_percentile(0.95)
+        upstream[provider.name] = {
+            "breaker": provider.breaker.state,
+            "latency_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "warmup_ms": startup_state.upstream_warmup_ms.get(provider.name),
+        }
+    return upstream
+
+
+async def _ping_db() -> None:
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def readiness() -> tuple[bool, dict]:
+    """
+    Готов = прогрев закончен и БД отвечает. Состояние LLM только показываем: если провайдер
+    лежит, он лежит для всех подов, а история и вход работают и без него.
+    """
+    db = {"ok": False}
+    started_at = time.perf_counter()
+    try:
+        # Таймаут и на выдачу соединения: при исчерпанном пуле она сама ждет до DB_POOL_TIMEOUT
+        await asyncio.wait_for(_ping_db(), timeout=settings.READINESS_DB_TIMEOUT)
+        db["ok"] = True
+    except Exception as e:
+        db["error"] = repr(e)
+    db["latency_ms"] = round((time.perf_counter() - started_at) * 1000, 1)
+
+    upstream = _upstream_state()
+    ready = startup_state.ready and db["ok"]
+    return ready, {
+        "status": "ready" if ready else "not_ready",
+        "started": startup_state.ready,
+        "schema_revision": startup_state.schema_revision,
+        "db": db,
+        "pool": {**_pool_state(), "warmed": startup_state.db_connections_warmed},
+        "upstream": upstream,
+        "upstream_degraded": bool(upstream) and all(state["breaker"] != CLOSED for state in upstream.values()),
+    }
@@ -0,0 +1,59 @@
+# backend/app/services/profiler.py
+import collections
+import sys
+import threading
+import time
+
+# Сэмплирующий профайлер для живого процесса: отдельный поток каждые interval секунд
+# снимает стеки всех потоков (sys._current_frames) и считает одинаковые стеки.
+# Результат — "collapsed stacks" (формат flamegraph.pl / speedscope / inferno):
+#   main;run;handle_request;select 42
+# Корутины asyncio видны в стеке потока event loop, пока выполняются; простой цикла
+# показывается как ожидание в selectors.select.
+# Профилируется только тот процесс (воркер uvicorn), в который пришел запрос.
+
+_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Профайлер уже запущен: два одновременных прогона мешали бы друг другу."""
+    pass
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{code.co_name}:{frame.f_lineno}"
+
+
+def _collapse(frame) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def sample_stacks(seconds: float, interval: float) -> tuple[str, int]:
+    """Снимает стеки в течение seconds. Возвращает (collapsed stacks, число снимков). Блокирует поток."""
+    if not _lock.acquire(blocking=False):
+        raise ProfilerBusy()
+    try:
+        own_thread = threading.get_ident()
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        counts: collections.Counter[str] = collections.Counter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                thread_name = thread_names.get(thread_id) or str(thread_id)
+                counts[f"{thread_name};{_collapse(frame)}"] += 1
+            samples += 1
+            time.sleep(interval)
+
+        return "\n".join(f"{stack} {count}" for stack, count in counts.most_common()) + "\n", samples
+    finally:
+        _lock.release()
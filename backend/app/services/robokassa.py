@@ -0,0 +1,58 @@
+# backend/app/services/robokassa.py
+import hashlib
+import hmac
+from decimal import Decimal, InvalidOperation
+from urllib.parse import urlencode
+
+from dream_engine.core.config import settings
+from dream_engine.db.models.invoice import Invoice
+
+# Подписи Робокассы (MD5):
+#   ссылка на оплату: MerchantLogin:OutSum:InvId:Пароль#1
+#   Result URL:       OutSum:InvId:Пароль#2 — Робокасса сообщает серверу об оплате, отвечать "OK<InvId>"
+# OutSum в подписи — ровно та строка, что пришла/ушла (Робокасса шлет "100.000000"), поэтому
+# подпись проверяем по исходной строке, а сумму со счетом сравниваем уже как Decimal.
+
+PAYMENT_URL = "https://auth.robokassa.ru/Merchant/Index.aspx"
+CENTS = Decimal("0.01")
+
+
+def _md5(*parts) -> str:
+    return hashlib.md5(":".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+
+def to_amount(value) -> Decimal:
+    """Сумма с копейками; ValueError — не число."""
+    try:
+        return Decimal(str(value)).quantize(CENTS)
+    except InvalidOperation:
+        raise ValueError(f"Некорректная сумма: {value!r}")
+
+
+def payment_signature(out_sum: str, invoice_id: int) -> str:
+    return _md5(settings.ROBOKASSA_MERCHANT_LOGIN, out_sum, invoice_id, settings.ROBOKASSA_PASSWORD_1)
+
+
+def result_signature(out_sum: str, invoice_id: int | str, password: str) -> str:
+    return _md5(out_sum, invoice_id, password)
+
+
+def verify_result_signature(out_sum: str, invoice_id: str, signature: str) -> bool:
+    if not settings.ROBOKASSA_PASSWORD_2:
+        return False  # Без пароля проверить нечем — не принимаем ничего
+    expected = result_signature(out_sum, invoice_id, settings.ROBOKASSA_PASSWORD_2)
+    return hmac.compare_digest(expected, signature.strip().lower())
+
+
+def payment_url(invoice: Invoice) -> str:
+    out_sum = f"{invoice.amount:.2f}"
+    params = {
+        "MerchantLogin": settings.ROBOKASSA_MERCHANT_LOGIN,
+        "OutSum": out_sum,
+        "InvId": invoice.id,
+        "Description": invoice.description,
+        "SignatureValue": payment_signature(out_sum, invoice.id),
+    }
+    if settings.ROBOKASSA_IS_TEST:
+        params["IsTest"] = 1
+    return f"{PAYMENT_URL}?{urlencode(params)}"
@@ -0,0 +1,116 @@
+# backend/app/services/search_service.py
+import html
+import re
+
+from sqlalchemy import or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dream_engine.db.models.dream import Dream
+from app.schemas.dream import DreamSearchHit, DreamSearchPage
+
+# Поиск по архиву снов пользователя.
+# Postgres: полнотекстовый поиск по search_vector (русская морфология, websearch-синтаксис:
+# "кот -собака", "летал над морем") с ранжированием ts_rank_cd и подсветкой ts_headline.
+# Если по словам ничего не нашлось (опечатка, обрывок слова) — нечеткий поиск по
+# триграммам текста сна. Оба запроса идут по GIN-индексам (user_id, ...) из миграции 0006,
+# поэтому стоимость зависит от числа совпадений у пользователя, а не от размера таблицы.
+# Другие СУБД (SQLite в локальной отладке) — простой поиск подстроки по свежести.
+
+# ts_headline не экранирует HTML: размечаем совпадения управляющими символами,
+# экранируем текст целиком и только потом превращаем метки в <mark>
+_START, _STOP = "\x02", "\x03"
+HEADLINE_OPTIONS = f'StartSel="{_START}", StopSel="{_STOP}", MaxFragments=2, MaxWords=25, MinWords=8'
+SNIPPET_CHARS = 200
+
+FULLTEXT_SQL = text("""
+    SELECT id, created_at, rank,
+           ts_headline('russian', request_text, query, :options) AS request_highlight,
+           ts_headline('russian', coalesce(response_text, ''), query, :options) AS response_highlight
+    FROM (
+        SELECT d.id, d.created_at, d.request_text, d.response_text, q.query,
+               ts_rank_cd(d.search_vector, q.query) AS rank
+        FROM dreams AS d, websearch_to_tsquery('russian', :q) AS q(query)
+        WHERE d.user_id = :user_id AND d.search_vector @@ q.query
+        ORDER BY rank DESC, d.id DESC
+        LIMIT :limit OFFSET :offset
+    ) AS page
+    ORDER BY rank DESC, id DESC
+""")  # ts_headline дорогой — считаем его только для строк страницы
+
+FULLTEXT_EXISTS_SQL = text("""
+    SELECT EXISTS (
+        SELECT 1 FROM dreams
+        WHERE user_id = :user_id AND search_vector @@ websearch_to_tsquery('russian', :q)
+    )
+""")
+
+TRIGRAM_SQL = text("""
+    SELECT id, created_at, request_text, response_text, word_similarity(:q, request_text) AS rank
+    FROM dreams
+    WHERE user_id = :user_id AND :q <% request_text
+    ORDER BY rank DESC, id DESC
+    LIMIT :limit OFFSET :offset
+""")
+
+
+def _highlight(marked: str) -> str:
+    return html.escape(marked).replace(_START, "<mark>").replace(_STOP, "</mark>")
+
+
+def _snippet(value: str | None, q: str = "") -> str:
+    """Начало текста (экранированное), совпадения с q — в <mark>."""
+    value = (value or "")[:SNIPPET_CHARS]
+    if q:
+        value = re.sub(re.escape(q), lambda m: f"{_START}{m.group(0)}{_STOP}", value, flags=re.IGNORECASE)
+    return _highlight(value)
+
+
+def _page(hits: list[DreamSearchHit], limit: int, offset: int) -> DreamSearchPage:
+    # Запрашиваем limit + 1 строку: лишняя говорит, что есть следующая страница
+    has_more = len(hits) > limit
+    return DreamSearchPage(results=hits[:limit], next_offset=offset + limit if has_more else None)
+
+
+async def _search_postgres(db: AsyncSession, user_id: int, q: str, limit: int, offset: int) -> DreamSearchPage:
+    params = {"user_id": user_id, "q": q, "limit": limit + 1, "offset": offset}
+    rows = (await db.execute(FULLTEXT_SQL, {**params, "options": HEADLINE_OPTIONS})).all()
+    if rows:
+        return _page([
+            DreamSearchHit(id=row.id, created_at=row.created_at, rank=row.rank, match="fulltext",
+                           request_highlight=_highlight(row.request_highlight),
+                           response_highlight=_highlight(row.response_highlight))
+            for row in rows
+        ], limit, offset)
+
+    # Пустая страница: либо полнотекстовые результаты кончились, либо их не было вовсе
+    if offset and await db.scalar(FULLTEXT_EXISTS_SQL, {"user_id": user_id, "q": q}):
+        return DreamSearchPage(results=[], next_offset=None)
+
+    rows = (await db.execute(TRIGRAM_SQL, params)).all()
+    return _page([
+        DreamSearchHit(id=row.id, created_at=row.created_at, rank=row.rank, match="trigram",
+                       request_highlight=_snippet(row.request_text), response_highlight=_snippet(row.response_text))
+        for row in rows
+    ], limit, offset)
+
+
+async def _search_substring(db: AsyncSession, user_id: int, q: str, limit: int, offset: int) -> DreamSearchPage:
+    pattern = f"%{q}%"
+    dreams = (await db.scalars(
+        select(Dream)
+        .where(Dream.user_id == user_id, or_(Dream.request_text.ilike(pattern), Dream.response_text.ilike(pattern)))
+        .order_by(Dream.created_at.desc(), Dream.id.desc())
+        .limit(limit + 1).offset(offset)
+    )).all()
+    return _page([
+        DreamSearchHit(id=dream.id, created_at=dream.created_at, rank=0.0, match="substring",
+                       request_highlight=_snippet(dream.request_text, q),
+                       response_highlight=_snippet(dream.response_text, q))
+        for dream in dreams
+    ], limit, offset)
+
+
+async def search_dreams(db: AsyncSession, user_id: int, q: str, limit: int, offset: int) -> DreamSearchPage:
+    if db.bind.dialect.name == "postgresql":
+        return await _search_postgres(db, user_id, q, limit, offset)
+    return await _search_substring(db, user_id, q, limit, offset)
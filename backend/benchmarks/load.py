@@ -0,0 +1,337 @@
+# backend/benchmarks/load.py
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+# Нагрузочный прогон: для каждого сценария и уровня параллельности держит N одновременных
+# клиентов (замкнутый цикл) и считает пропускную способность и p50/p95/p99 задержки.
+# Результат — JSON, который можно сравнить с прогоном на другом коммите (--baseline).
+#
+# Без --base-url сам поднимает мок LLM (benchmarks.mock_llm) и бэкенд (uvicorn) на свободных портах:
+#   pip install -r benchmarks/requirements.txt  # aiosqlite для SQLite
+#   DATABASE_URL=sqlite:///bench.db python -m benchmarks.seed --reset
+#   DATABASE_URL=sqlite:///bench.db python -m benchmarks.load --concurrency 1,8,32 --out bench.json
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BOT_DIR = BACKEND_DIR.parent / "bot"
+
+SCENARIOS = ("interpret", "interpret_guest", "interpret_stream", "history", "history_page", "bot")
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Перцентиль методом ближайшего ранга по уже отсортированному списку."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), round(q * len(sorted_values) + 0.5)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: list[float]) -> dict:
+    values = sorted(latencies)
+    return {
+        "mean": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+        "p50": round(percentile(values, 0.50) * 1000, 2),
+        "p95": round(percentile(values, 0.95) * 1000, 2),
+        "p99": round(percentile(values, 0.99) * 1000, 2),
+        "max": round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+def dream_text(n: int) -> str:
+    # Уникальный текст на каждый запрос, чтобы не мерить кэш толкований и склейку запросов
+    return f"Мне снилось, что я плыву по реке мимо старого дома, и это сон номер {n}."
+
+
+class Scenario:
+    """Один запрос сценария. Возвращает (HTTP-статус, время до первого байта тела или None)."""
+
+    def __init__(self, client: httpx.AsyncClient, user_ids: list[int]):
+        self.client = client
+        self.user_ids = user_ids
+        self._counter = itertools.count()
+
+    def _next(self) -> tuple[int, int]:
+        n = next(self._counter)
+        return n, self.user_ids[n % len(self.user_ids)] if self.user_ids else 0
+
+    async def interpret(self) -> tuple[int, float | None]:
+        n, user_id = self._next()
+        response = await self.client.post("/api/v1/chat/interpret", json={"user_id": user_id, "text": dream_text(n)})
+        return response.status_code, None
+
+    async def interpret_guest(self) -> tuple[int, float | None]:
+        n, _ = self._next()
+        response = await self.client.post("/api/v1/chat/interpret_guest", json={"text": dream_text(n)})
+        return response.status_code, None
+
+    async def interpret_stream(self) -> tuple[int, float | None]:
+        n, user_id = self._next()
+        started_at = time.perf_counter()
+        ttfb = None
+        async with self.client.stream("POST", "/api/v1/chat/interpret_stream",
+                                      json={"user_id": user_id, "text": dream_text(n)}) as response:
+            async for _ in response.aiter_bytes():
+                if ttfb is None:
+                    ttfb = time.perf_counter() - started_at
+        return response.status_code, ttfb
+
+    async def history(self) -> tuple[int, float | None]:
+        _, user_id = self._next()
+        response = await self.client.get(f"/api/v1/users/{user_id}/history")
+        return response.status_code, None
+
+    async def history_page(self) -> tuple[int, float | None]:
+        _, user_id = self._next()
+        response = await self.client.get(f"/api/v1/users/{user_id}/history/page", params={"limit": 20})
+        return response.status_code, None
+
+
+async def run_level(request_fn, concurrency: int, total: int, warmup: int) -> dict:
+    latencies: list[float] = []
+    ttfbs: list[float] = []
+    statuses: dict[str, int] = {}
+    remaining = itertools.count()
+
+    async def worker(record: bool, limit: int):
+        while next(remaining) < limit:
+            started_at = time.perf_counter()
+            try:
+                status, ttfb = await request_fn()
+                status = str(status)
+            except httpx.HTTPError as e:
+                status, ttfb = type(e).__name__, None
+            if not record:
+                continue
+            latencies.append(time.perf_counter() - started_at)
+            statuses[status] = statuses.get(status, 0) + 1
+            if ttfb is not None:
+                ttfbs.append(ttfb)
+
+    if warmup:
+        await asyncio.gather(*(worker(False, warmup) for _ in range(concurrency)))
+        remaining = itertools.count()
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker(True, total) for _ in range(concurrency)))
+    duration = time.perf_counter() - started_at
+
+    ok = sum(count for status, count in statuses.items() if status.startswith("2"))
+    result = {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "ok": ok,
+        "errors": len(latencies) - ok,
+        "status_counts": statuses,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 2) if duration else 0.0,
+        "latency_ms": summarize(latencies),
+    }
+    if ttfbs:
+        result["ttfb_ms"] = summarize(ttfbs)
+    return result
+
+
+async def load_user_ids(limit: int) -> list[int]:
+    from sqlalchemy import select
+    from dream_engine.db.session import SessionLocal, engine
+    from dream_engine.db.models.user import User
+    from benchmarks.seed import BENCH_PHONE_PREFIX
+
+    async with SessionLocal() as db:
+        user_ids = (await db.scalars(
+            select(User.id).where(User.phone.startswith(BENCH_PHONE_PREFIX)).order_by(User.id).limit(limit)
+        )).all()
+    await engine.dispose()
+    return list(user_ids)
+
+
+def run_bot_level(args, mock_url: str, concurrency: int) -> dict:
+    """Бот — отдельный процесс со своим пакетом app (тот же dream_engine, что у бэкенда), поэтому бенчмарк — подпроцесс."""
+    output = subprocess.run(
+        [sys.executable, "benchmarks/bot_load.py", "--concurrency", str(concurrency),
+         "--requests", str(args.requests), "--warmup", str(args.warmup), "--users", str(args.users),
+         "--telegram-url", mock_url],
+        cwd=BOT_DIR, env=bench_env(mock_url), stdout=subprocess.PIPE, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def bench_env(mock_url: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "LLM_API_URL": f"{mock_url}/v1/chat/completions",
+        "LLM_PROVIDERS": "[]",
+        "OPENROUTER_API_KEY": env.get("OPENROUTER_API_KEY", "bench"),
+        # БД бенчмарка создает seed.py по моделям, без миграций
+        "DB_AUTO_CREATE": "true",
+        # Лимиты на пользователя мешают мерить сам сервис — отключаем их
+        "RATE_LIMIT_GUEST_PER_MINUTE": "1000000000",
+        "RATE_LIMIT_GUEST_BURST": "1000000000",
+        "RATE_LIMIT_USER_PER_MINUTE": "1000000000",
+        "RATE_LIMIT_USER_BURST": "1000000000",
+    })
+    return env
+
+
+def free_port() -> int:
+    import socket
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                # 503 — сервис поднялся, но еще не готов (бэкенд: /readyz до конца прогрева)
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} не поднялся за {timeout} секунд")
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: dict, baseline: dict) -> None:
+    """Печатает изменение ключевых метрик относительно прошлого прогона."""
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline["results"]}
+    for result in report["results"]:
+        old = previous.get((result["scenario"], result["concurrency"]))
+        if old is None:
+            continue
+        changes = []
+        for name in ("p50", "p95", "p99"):
+            before, after = old["latency_ms"][name], result["latency_ms"][name]
+            if before:
+                changes.append(f"{name} {(after - before) / before * 100:+.1f}%")
+        if old["throughput_rps"]:
+            changes.append(f"rps {(result['throughput_rps'] - old['throughput_rps']) / old['throughput_rps'] * 100:+.1f}%")
+        print(f"{result['scenario']:>16} c={result['concurrency']:<4} " + ", ".join(changes))
+
+
+async def run(args) -> dict:
+    processes: list[subprocess.Popen] = []
+    mock_url = args.mock_url
+    base_url = args.base_url
+    try:
+        if mock_url is None:
+            port = free_port()
+            mock_url = f"http://127.0.0.1:{port}"
+            processes.append(subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.mock_llm", "--port", str(port),
+                 "--latency", str(args.llm_latency), "--error-rate", str(args.llm_error_rate),
+                 "--response-chars", str(args.llm_response_chars), "--seed", "42"],
+                cwd=BACKEND_DIR,
+            ))
+            await wait_ready(mock_url)
+
+        if base_url is None:
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            processes.append(subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+                 "--workers", str(args.workers), "--log-level", "warning"],
+                cwd=BACKEND_DIR, env=bench_env(mock_url),
+            ))
+            await wait_ready(f"{base_url}/readyz")
+
+        user_ids = await load_user_ids(args.users) if set(args.scenarios) - {"interpret_guest", "bot"} else []
+        results = []
+        limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+            scenario = Scenario(client, user_ids)
+            for name in args.scenarios:
+                for concurrency in args.concurrency:
+                    if name == "bot":
+                        result = await asyncio.to_thread(run_bot_level, args, mock_url, concurrency)
+                    else:
+                        result = await run_level(getattr(scenario, name), concurrency, args.requests, args.warmup)
+                    result = {"scenario": name, **result}
+                    results.append(result)
+                    print(f"{name:>16} c={concurrency:<4} {result['throughput_rps']:>8} rps  "
+                          f"p50={result['latency_ms']['p50']}ms p95={result['latency_ms']['p95']}ms "
+                          f"p99={result['latency_ms']['p99']}ms errors={result['errors']}", file=sys.stderr)
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait(timeout=10)
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "base_url": args.base_url,
+            "requests_per_level": args.requests,
+            "warmup": args.warmup,
+            "backend_workers": args.workers,
+            "users": len(user_ids),
+            "llm": {
+                "latency": args.llm_latency,
+                "error_rate": args.llm_error_rate,
+                "response_chars": args.llm_response_chars,
+            },
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон бэкенда и бота")
+    parser.add_argument("--base-url", default=None, help="Уже запущенный бэкенд; по умолчанию поднимаем свой")
+    parser.add_argument("--mock-url", default=None, help="Уже запущенный мок LLM; по умолчанию поднимаем свой")
+    parser.add_argument("--scenarios", default="interpret,interpret_guest,history,history_page",
+                        help=f"Через запятую, из: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,8,32", help="Уровни параллельности через запятую")
+    parser.add_argument("--requests", type=int, default=200, help="Запросов на каждый уровень")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--users", type=int, default=1000, help="Сколько засеянных пользователей использовать")
+    parser.add_argument("--workers", type=int, default=1, help="Воркеров uvicorn у поднимаемого бэкенда")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-response-chars", type=int, default=800)
+    parser.add_argument("--out", default=None, help="Куда записать JSON (по умолчанию stdout)")
+    parser.add_argument("--baseline", default=None, help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Неизвестные сценарии: {', '.join(sorted(unknown))}")
+    args.concurrency = [int(level) for level in args.concurrency.split(",")]
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+    if args.baseline:
+        compare(report, json.loads(Path(args.baseline).read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# backend/benchmarks/mock_llm.py
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Локальная замена OpenRouter для бенчмарков: отвечает в формате chat/completions
+# (обычном и stream: true) с настраиваемой задержкой, долей ошибок и размером ответа.
+# Заодно отвечает "ok" на любые методы Telegram Bot API — для бенчмарка бота
+# и для отладки webhook-режима (BOT_API_SERVER=http://127.0.0.1:9100).
+#
+#   python -m benchmarks.mock_llm --port 9100 --latency 0.8 --error-rate 0.02
+
+WORDS = (
+    "сон символизирует скрытое желание перемен вода отражает эмоции дом означает "
+    "внутренний мир полет говорит о стремлении к свободе лестница показывает путь "
+    "к цели тревога уходит когда человек принимает свои чувства"
+).split()
+
+
+class MockConfig:
+    latency: float = 0.5        # Время до первого токена (или до всего ответа), секунды
+    jitter: float = 0.2         # Разброс задержки: latency * (1 ± jitter)
+    error_rate: float = 0.0     # Доля ответов 503
+    empty_rate: float = 0.0     # Доля "пустых" ответов (только служебные теги)
+    response_chars: int = 800   # Длина ответа
+    chunk_chars: int = 20       # Размер чанка в потоковом режиме
+    chunk_delay: float = 0.02   # Пауза между чанками
+    telegram_retry_rate: float = 0.0  # Доля отправок сообщений, на которые Bot API отвечает 429
+    telegram_retry_after: int = 1     # retry_after в этих ответах, секунды
+    seed: int | None = None
+
+
+config = MockConfig()
+rng = random.Random()
+message_ids = {"next": 0}
+app = FastAPI()
+
+
+def _answer_text() -> str:
+    words: list[str] = []
+    length = 0
+    while length < config.response_chars:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:config.response_chars]
+
+
+async def _sleep_latency() -> None:
+    delay = config.latency * (1 + rng.uniform(-config.jitter, config.jitter))
+    await asyncio.sleep(max(delay, 0))
+
+
+def _completion(content: str, model: str) -> dict:
+    return {
+        "id": f"mock-{time.time_ns()}",
+        "object": "chat.completion",
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(content) // 4, "total_tokens": len(content) // 4},
+    }
+
+
+async def _stream(content: str, model: str):
+    yield ": OPENROUTER PROCESSING\n\n"
+    for start in range(0, len(content), config.chunk_chars):
+        chunk = {"model": model, "choices": [{"index": 0, "delta": {"content": content[start:start + config.chunk_chars]}}]}
+        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+        await asyncio.sleep(config.chunk_delay)
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/bot{token}/{method}")
+async def telegram_method(token: str, method: str):
+    if method.lower().startswith("send") and method.lower() != "sendchataction":
+        if rng.random() < config.telegram_retry_rate:
+            # Как флуд-контроль Telegram: aiogram превратит это в TelegramRetryAfter
+            return JSONResponse(status_code=429, content={
+                "ok": False, "error_code": 429,
+                "description": f"Too Many Requests: retry after {config.telegram_retry_after}",
+                "parameters": {"retry_after": config.telegram_retry_after},
+            })
+        # sendMessage и т.п. должны вернуть Message, иначе aiogram не разберет ответ
+        message_ids["next"] += 1
+        message = {"message_id": message_ids["next"], "date": int(time.time()), "chat": {"id": 0, "type": "private"}}
+        return {"ok": True, "result": message}
+    return {"ok": True, "result": True}
+
+
+@app.post("/{path:path}")
+async def chat_completions(path: str, request: Request):
+    payload = await request.json()
+    model = payload.get("model", "mock")
+    await _sleep_latency()
+
+    if rng.random() < config.error_rate:
+        return JSONResponse(status_code=503, content={"error": {"message": "mock overload"}})
+
+    content = "<s></s>" if rng.random() < config.empty_rate else _answer_text()
+    if payload.get("stream"):
+        return StreamingResponse(_stream(content, model), media_type="text/event-stream")
+    return _completion(content, model)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Мок OpenRouter chat/completions для бенчмарков")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=MockConfig.latency)
+    parser.add_argument("--jitter", type=float, default=MockConfig.jitter)
+    parser.add_argument("--error-rate", type=float, default=MockConfig.error_rate)
+    parser.add_argument("--empty-rate", type=float, default=MockConfig.empty_rate)
+    parser.add_argument("--response-chars", type=int, default=MockConfig.response_chars)
+    parser.add_argument("--chunk-chars", type=int, default=MockConfig.chunk_chars)
+    parser.add_argument("--chunk-delay", type=float, default=MockConfig.chunk_delay)
+    parser.add_argument("--telegram-retry-rate", type=float, default=MockConfig.telegram_retry_rate)
+    parser.add_argument("--telegram-retry-after", type=int, default=MockConfig.telegram_retry_after)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    for name in ("latency", "jitter", "error_rate", "empty_rate", "response_chars", "chunk_chars", "chunk_delay",
+                 "telegram_retry_rate", "telegram_retry_after", "seed"):
+        setattr(config, name, getattr(args, name))
+    rng.seed(args.seed)
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
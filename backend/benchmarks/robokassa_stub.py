@@ -0,0 +1,88 @@
+# backend/benchmarks/robokassa_stub.py
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+
+from app.services.robokassa import result_signature
+
+# Локальная замена Робокассы для проверки счетов под нагрузкой: параллельно создает счета
+# (часть запросов — повторы с тем же Idempotency-Key), затем шлет на Result URL подписанные
+# паролем #2 уведомления об оплате (каждое дважды, как при ретраях Робокассы) и проверяет,
+# что номера счетов не совпали, дубли не размножились, а каждое уведомление принято.
+# Бэкенд должен быть запущен с тем же ROBOKASSA_PASSWORD_2.
+#
+#   ROBOKASSA_PASSWORD_2=test python -m benchmarks.robokassa_stub --base-url http://127.0.0.1:8000 \
+#       --user-id 1 --invoices 500 --concurrency 50
+
+
+async def run(args) -> int:
+    slots = asyncio.Semaphore(args.concurrency)
+    # Каждый ключ уходит args.retries раз: все повторы должны получить один и тот же счет
+    keys = [uuid.uuid4().hex for _ in range(args.invoices)]
+    jobs = [key for key in keys for _ in range(args.retries)]
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30) as client:
+        async def create(key: str) -> tuple[str, int]:
+            async with slots:
+                response = await client.post("/api/v1/payment/create_invoice",
+                                             json={"user_id": args.user_id, "amount": args.amount},
+                                             headers={"Idempotency-Key": key})
+                response.raise_for_status()
+                return key, response.json()["invoice_id"]
+
+        started_at = time.perf_counter()
+        created = await asyncio.gather(*(create(key) for key in jobs))
+        create_seconds = time.perf_counter() - started_at
+
+        by_key: dict[str, set[int]] = {}
+        for key, invoice_id in created:
+            by_key.setdefault(key, set()).add(invoice_id)
+        split_keys = [key for key, ids in by_key.items() if len(ids) > 1]
+        invoice_ids = [ids.pop() for ids in by_key.values() if len(ids) == 1]
+
+        out_sum = f"{args.amount:.6f}"  # Робокасса присылает сумму с шестью знаками
+
+        async def notify(invoice_id: int) -> bool:
+            form = {"OutSum": out_sum, "InvId": str(invoice_id),
+                    "SignatureValue": result_signature(out_sum, invoice_id, args.password).upper()}
+            async with slots:
+                response = await client.post("/api/v1/payment/result", data=form)
+            return response.status_code == 200 and response.text == f"OK{invoice_id}"
+
+        started_at = time.perf_counter()
+        accepted = await asyncio.gather(*(notify(invoice_id) for invoice_id in invoice_ids for _ in range(2)))
+        notify_seconds = time.perf_counter() - started_at
+
+        # Чужая подпись должна отклоняться
+        forged = await client.post("/api/v1/payment/result",
+                                   data={"OutSum": out_sum, "InvId": str(invoice_ids[0]), "SignatureValue": "0" * 32})
+
+    unique = len(set(invoice_ids)) == len(invoice_ids) == args.invoices
+    print(f"Создано счетов: {len(invoice_ids)} из {args.invoices} ключей за {create_seconds:.2f} с "
+          f"({len(jobs) / create_seconds:.0f} запросов/с), ключей с разными счетами: {len(split_keys)}")
+    print(f"Уведомлений принято: {sum(accepted)} из {len(accepted)} за {notify_seconds:.2f} с "
+          f"({len(accepted) / notify_seconds:.0f} запросов/с); поддельная подпись -> {forged.status_code}")
+    ok = unique and not split_keys and all(accepted) and forged.status_code == 400
+    print("OK" if ok else "FAILED")
+    return 0 if ok else 1
+
+
+def main():
+    from dream_engine.core.config import settings
+
+    parser = argparse.ArgumentParser(description="Заглушка Робокассы: создание счетов и подписанные Result URL")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--invoices", type=int, default=200)
+    parser.add_argument("--retries", type=int, default=2, help="Сколько раз отправлять каждый Idempotency-Key")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--amount", type=float, default=100.0)
+    parser.add_argument("--password", default=settings.ROBOKASSA_PASSWORD_2, help="Пароль #2 (как у бэкенда)")
+    raise SystemExit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# backend/benchmarks/seed.py
+import argparse
+import asyncio
+import random
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import insert, select
+
+from dream_engine.db.session import Base, SessionLocal, engine
+from dream_engine.db.models.user import User
+from dream_engine.db.models.dream import Dream
+from dream_engine.db.models import interpretation_cache, job, bot_state, invoice  # noqa: F401 — чтобы create_all знал все таблицы
+
+# Заполняет БД для бенчмарков пользователями и снами "как в жизни":
+# у большинства пара десятков снов, у немногих — сотни, тексты от пары фраз до абзацев.
+# БД берется из DATABASE_URL (Postgres или sqlite:///bench.db; для SQLite — pip install -r benchmarks/requirements.txt).
+#
+#   DATABASE_URL=sqlite:///bench.db python -m benchmarks.seed --users 1000 --dreams-per-user 30
+
+BENCH_PHONE_PREFIX = "+7999"
+BENCH_TELEGRAM_ID_BASE = 900_000_000
+
+DREAM_PHRASES = [
+    "Мне снилось, что я иду по бесконечному коридору старой школы",
+    "вокруг была темная вода, и я никак не мог доплыть до берега",
+    "я летал над городом детства и видел свой дом сверху",
+    "за мной кто-то гнался, но я не видел лица",
+    "я опоздал на поезд, а на перроне стояла бабушка",
+    "в комнате были двери, которые открывались в лес",
+    "я сдавал экзамен и не знал ни одного ответа",
+    "выпали все зубы, и я держал их в ладони",
+    "шел снег, хотя было лето, и все вокруг молчали",
+    "я нашел в шкафу письмо от самого себя",
+]
+ANSWER_PHRASES = [
+    "Этот сон говорит о внутреннем поиске и желании перемен.",
+    "Вода во сне отражает эмоции, которые пока не нашли выхода.",
+    "Полет символизирует стремление к свободе и новой перспективе.",
+    "Преследование часто связано с тревогой, от которой хочется убежать.",
+    "Дом детства напоминает о чувстве защищенности и корнях.",
+]
+
+
+def _dream_text(rng: random.Random) -> str:
+    # Длинный хвост: большинство снов короткие, но встречаются целые рассказы
+    phrases = min(int(rng.paretovariate(1.5)) + 1, 40)
+    return ", ".join(rng.choice(DREAM_PHRASES) for _ in range(phrases)) + "."
+
+
+def _answer_text(rng: random.Random) -> str:
+    return " ".join(rng.choice(ANSWER_PHRASES) for _ in range(rng.randint(3, 8)))
+
+
+def _dreams_count(rng: random.Random, mean: int) -> int:
+    return min(int(rng.expovariate(1 / mean)) + 1, mean * 20) if mean > 0 else 0
+
+
+async def seed(users: int, dreams_per_user: int, batch_size: int, reset: bool, seed_value: int) -> None:
+    rng = random.Random(seed_value)
+    now = datetime.now(timezone.utc)
+
+    async with engine.begin() as conn:
+        if reset:
+            await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    total_dreams = 0
+    async with SessionLocal() as db:
+        for start in range(0, users, batch_size):
+            rows = [
+                {
+                    "first_name": f"Bench{i}",
+                    "dob": date(1970, 1, 1) + timedelta(days=rng.randint(0, 365 * 35)),
+                    "phone": f"{BENCH_PHONE_PREFIX}{i:07d}",
+                    "telegram_id": BENCH_TELEGRAM_ID_BASE + i,
+                }
+                for i in range(start, min(start + batch_size, users))
+            ]
+            await db.execute(insert(User), rows)
+        await db.commit()
+
+        user_ids = (await db.scalars(
+            select(User.id).where(User.phone.startswith(BENCH_PHONE_PREFIX)).order_by(User.id)
+        )).all()
+
+        batch: list[dict] = []
+        for user_id in user_ids:
+            for _ in range(_dreams_count(rng, dreams_per_user)):
+                batch.append({
+                    "user_id": user_id,
+                    "request_text": _dream_text(rng),
+                    "response_text": _answer_text(rng),
+                    "created_at": now - timedelta(seconds=rng.randint(0, 365 * 86400)),
+                })
+                if len(batch) >= batch_size:
+                    await db.execute(insert(Dream), batch)
+                    total_dreams += len(batch)
+                    batch = []
+        if batch:
+            await db.execute(insert(Dream), batch)
+            total_dreams += len(batch)
+        await db.commit()
+
+    await engine.dispose()
+    print(f"Создано пользователей: {len(user_ids)}, снов: {total_dreams}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заполнение БД данными для бенчмарков")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--dreams-per-user", type=int, default=30, help="Среднее число снов на пользователя")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--reset", action="store_true", help="Удалить и создать таблицы заново (только для тестовой БД!)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(seed(args.users, args.dreams_per_user, args.batch_size, args.reset, args.seed))
+
+
+if __name__ == "__main__":
+    main()
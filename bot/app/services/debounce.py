@@ -0,0 +1,71 @@
+# bot/app/services/debounce.py
+import asyncio
+import time
+
+from dream_engine.core.config import settings
+
+# Один сон в Telegram часто приходит 3–5 сообщениями подряд. Первое сообщение чата
+# открывает "окно": его хэндлер ждет, пока сообщения перестанут приходить (тишина
+# quiet секунд), пока не наберется max_messages/max_chars или не пройдет max_wait,
+# и забирает весь накопленный текст. Остальные сообщения окна только дописываются
+# в буфер, и их хэндлеры сразу завершаются. Итог — один вызов LLM и один Dream.
+# Буфер живет в процессе: при нескольких репликах за webhook'ом склеиваются только
+# сообщения, попавшие на одну реплику.
+
+
+class _Batch:
+    def __init__(self, text: str):
+        self.texts = [text]
+        self.chars = len(text)
+        self.arrived = asyncio.Event()
+
+    def add(self, text: str) -> None:
+        self.texts.append(text)
+        self.chars += len(text)
+        self.arrived.set()
+
+
+class MessageDebouncer:
+    def __init__(self, quiet: float, max_messages: int, max_chars: int, max_wait: float):
+        self.quiet = quiet
+        self.max_messages = max_messages
+        self.max_chars = max_chars
+        self.max_wait = max_wait
+        self._pending: dict[int, _Batch] = {}
+
+    def _full(self, batch: _Batch) -> bool:
+        return len(batch.texts) >= self.max_messages or batch.chars >= self.max_chars
+
+    async def collect(self, chat_id: int, text: str) -> list[str] | None:
+        """
+        Тексты окна по порядку — для сообщения, открывшего окно; None — сообщение
+        дописано в чужое окно и отвечать на него отдельно не нужно.
+        """
+        batch = self._pending.get(chat_id)
+        if batch is not None:
+            batch.add(text)
+            return None
+        if self.quiet <= 0:
+            return [text]
+
+        batch = _Batch(text)
+        self._pending[chat_id] = batch
+        try:
+            deadline = time.monotonic() + self.max_wait
+            while not self._full(batch):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                batch.arrived.clear()
+                try:
+                    await asyncio.wait_for(batch.arrived.wait(), timeout=min(self.quiet, remaining))
+                except asyncio.TimeoutError:
+                    break  # Тишина: пользователь дописал сон
+        finally:
+            # Между выходом из ожидания и этим местом await'ов нет — сообщение не потеряется
+            self._pending.pop(chat_id, None)
+        return batch.texts
+
+
+message_debouncer = MessageDebouncer(settings.BOT_DEBOUNCE_SECONDS, settings.BOT_DEBOUNCE_MAX_MESSAGES,
+                                     settings.BOT_DEBOUNCE_MAX_CHARS, settings.BOT_DEBOUNCE_MAX_WAIT)
@@ -0,0 +1,76 @@
+# bot/app/services/fsm_storage.py
+import json
+from typing import Any, Mapping
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.sql import func
+
+from dream_engine.db.models.bot_state import BotFSMState
+
+# Хранилище FSM aiogram в той же БД, что и пользователи: состояние регистрации
+# видят все реплики бота (за webhook'ом апдейты одного чата могут попасть на разные).
+# Таблицу создает миграция бэкенда 0005 по общей модели BotFSMState.
+
+bot_fsm_states = BotFSMState.__table__
+
+
+class PostgresStorage(BaseStorage):
+    """
+    Одна строка на ключ (чат + пользователь): state и data пишутся upsert'ом
+    независимо друг от друга, пустая строка удаляется. Данные — JSON, поэтому
+    в state.update_data() кладем только то, что сериализуется (даты — строкой).
+    Работает и на SQLite (для локальной отладки) — там тот же ON CONFLICT.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, key_builder: KeyBuilder | None = None):
+        self.session_factory = session_factory
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+
+    def _insert(self, dialect: str):
+        return pg_insert(bot_fsm_states) if dialect == "postgresql" else sqlite_insert(bot_fsm_states)
+
+    async def _upsert(self, key: StorageKey, column: str, value: str | None) -> None:
+        row_key = self.key_builder.build(key)
+        async with self.session_factory() as db:
+            statement = self._insert(db.bind.dialect.name).values(key=row_key, **{column: value})
+            statement = statement.on_conflict_do_update(
+                index_elements=[bot_fsm_states.c.key],
+                set_={column: value, "updated_at": func.now()},
+            )
+            await db.execute(statement)
+            if value is None:
+                # Ни состояния, ни данных — строка больше не нужна
+                await db.execute(delete(bot_fsm_states).where(
+                    bot_fsm_states.c.key == row_key,
+                    bot_fsm_states.c.state.is_(None),
+                    bot_fsm_states.c.data.is_(None),
+                ))
+            await db.commit()
+
+    async def _get(self, key: StorageKey, column: str) -> str | None:
+        async with self.session_factory() as db:
+            return await db.scalar(
+                select(bot_fsm_states.c[column]).where(bot_fsm_states.c.key == self.key_builder.build(key))
+            )
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._upsert(key, "state", state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return await self._get(key, "state")
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        await self._upsert(key, "data", json.dumps(dict(data), ensure_ascii=False) if data else None)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        value = await self._get(key, "data")
+        return json.loads(value) if value else {}
+
+    async def close(self) -> None:
+        # Сессии берутся из общего пула бота, его закрывает engine.dispose() в main()
+        pass
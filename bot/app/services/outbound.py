@@ -0,0 +1,206 @@
+# bot/app/services/outbound.py
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import Message
+
+from dream_engine.core.config import settings
+from dream_engine.core.metrics import BOT_OUTBOUND_RETRY_AFTER, BOT_OUTBOUND_WAIT
+
+# Очередь исходящих сообщений бота. Telegram ограничивает частоту отправки: около 30 сообщений
+# в секунду на бота и примерно одно в секунду в один чат; сверх этого отвечает 429 с retry_after,
+# и ответ, уже сохраненный в БД, терялся. Здесь у каждого чата своя очередь (порядок частей
+# ответа сохраняется, в полете не больше одного сообщения чата), а общий диспетчер берет чаты
+# по мере готовности и отправляет не чаще BOT_SEND_PER_SECOND. Медленный чат не держит
+# остальные: пока он выжидает свой интервал, уходят сообщения других чатов.
+# Лимиты считаются в процессе: при нескольких репликах делите BOT_SEND_PER_SECOND между ними.
+
+# Telegram считает длину сообщения в UTF-16 (эмодзи — две единицы)
+MESSAGE_LIMIT = 4096
+SEPARATORS = ("\n\n", "\n", " ")  # Сначала режем по абзацам, потом по строкам, потом по словам
+
+
+def _utf16_len(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _hard_split(text: str, limit: int) -> list[str]:
+    chunks, current, size = [], [], 0
+    for char in text:
+        width = _utf16_len(char)
+        if size + width > limit:
+            chunks.append("".join(current))
+            current, size = [], 0
+        current.append(char)
+        size += width
+    chunks.append("".join(current))
+    return chunks
+
+
+def _pack(text: str, limit: int, separators: tuple[str, ...]) -> list[str]:
+    if not separators:
+        return _hard_split(text, limit)
+    separator, finer = separators[0], separators[1:]
+    chunks, current = [], ""
+    for part in text.split(separator):
+        candidate = f"{current}{separator}{part}" if current else part
+        if _utf16_len(candidate) <= limit:
+            current = candidate
+            continue
+        if current:
+            chunks.append(current)
+        if _utf16_len(part) <= limit:
+            current = part
+        else:
+            # Абзац сам длиннее лимита — режем его по более мелким границам
+            *full, current = _pack(part, limit, finer)
+            chunks.extend(full)
+    chunks.append(current)
+    return chunks
+
+
+def split_message(text: str, limit: int = MESSAGE_LIMIT) -> list[str]:
+    """Части не длиннее limit, по возможности по границам абзацев; пустые части выброшены."""
+    if _utf16_len(text) <= limit:
+        return [text]
+    return [chunk.strip() for chunk in _pack(text, limit, SEPARATORS) if chunk.strip()]
+
+
+class _Outgoing:
+    def __init__(self, call: Callable[[], Awaitable[Any]], future: asyncio.Future):
+        self.call = call
+        self.future = future
+        self.queued_at = time.perf_counter()
+        self.retries = 0
+
+
+class OutboundQueue:
+    """
+    per_second    — общий лимит отправки бота (0 — без лимита).
+    chat_interval — пауза между сообщениями одного чата.
+    max_retries   — сколько раз повторять сообщение после 429, прежде чем сдаться.
+    """
+
+    def __init__(self, per_second: float, chat_interval: float, max_retries: int):
+        self.interval = 1 / per_second if per_second > 0 else 0.0
+        self.chat_interval = chat_interval
+        self.max_retries = max_retries
+        self._chats: dict[int, deque[_Outgoing]] = {}
+        self._scheduled: set[int] = set()  # Чат в очереди готовых, в полете или выжидает интервал
+        self._ready: asyncio.Queue[int] | None = None
+        self._dispatcher: asyncio.Task | None = None
+        self._deliveries: set[asyncio.Task] = set()
+        self._next_slot = 0.0
+
+    def submit(self, chat_id: int, call: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """Ставит отправку в очередь чата; future завершится результатом call() или его ошибкой."""
+        loop = asyncio.get_running_loop()
+        if self._dispatcher is None or self._dispatcher.done():
+            # Очередь и диспетчер создаются в цикле событий, где бот реально работает
+            self._ready = asyncio.Queue()
+            self._dispatcher = loop.create_task(self._dispatch())
+            self._chats.clear()
+            self._scheduled.clear()
+        item = _Outgoing(call, loop.create_future())
+        self._chats.setdefault(chat_id, deque()).append(item)
+        if chat_id not in self._scheduled:
+            self._scheduled.add(chat_id)
+            self._ready.put_nowait(chat_id)
+        return item.future
+
+    async def send_text(self, message: Message, text: str, reply: bool = True) -> None:
+        """Ответ на сообщение, при необходимости несколькими частями; первая часть — reply."""
+        chunks = split_message(text)
+        futures = []
+        for index, chunk in enumerate(chunks):
+            send = message.reply if reply and index == 0 else message.answer
+            futures.append(self.submit(message.chat.id, lambda send=send, chunk=chunk: send(chunk)))
+        await asyncio.gather(*futures)
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            chat_id = await self._ready.get()
+            delay = self._next_slot - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_slot = max(self._next_slot, loop.time()) + self.interval
+            item = self._chats[chat_id].popleft()
+            BOT_OUTBOUND_WAIT.observe(time.perf_counter() - item.queued_at)
+            # Сам HTTP-запрос не ждем: диспетчер сразу берет следующий чат
+            task = loop.create_task(self._deliver(chat_id, item))
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+
+    async def _deliver(self, chat_id: int, item: _Outgoing):
+        loop = asyncio.get_running_loop()
+        pause = self.chat_interval
+        try:
+            result = await item.call()
+        except TelegramRetryAfter as e:
+            BOT_OUTBOUND_RETRY_AFTER.inc()
+            # Свой интервал для чата мы и так выдерживаем, значит 429 — превышен общий лимит
+            # бота (например, другими репликами): притормаживаем всю отправку, а не только этот чат
+            self._next_slot = max(self._next_slot, loop.time() + e.retry_after)
+            pause = max(pause, e.retry_after)
+            item.retries += 1
+            if item.retries > self.max_retries:
+                print(f"Сообщение в чат {chat_id} не отправлено: {item.retries} раз подряд 429")
+                self._resolve(item, error=e)
+            else:
+                print(f"Telegram просит подождать {e.retry_after} сек., сообщение в чат {chat_id} повторим")
+                self._chats[chat_id].appendleft(item)
+        except Exception as e:
+            self._resolve(item, error=e)
+        else:
+            self._resolve(item, result=result)
+        loop.call_later(pause, self._release, chat_id)
+
+    @staticmethod
+    def _resolve(item: _Outgoing, result: Any = None, error: BaseException | None = None):
+        if item.future.done():
+            return  # Ждавший отправку хэндлер отменен — сообщение все равно ушло
+        if error is None:
+            item.future.set_result(result)
+        else:
+            item.future.set_exception(error)
+
+    def _release(self, chat_id: int):
+        if self._chats.get(chat_id):
+            self._ready.put_nowait(chat_id)
+        else:
+            self._chats.pop(chat_id, None)
+            self._scheduled.discard(chat_id)
+
+
+@asynccontextmanager
+async def keep_typing(bot: Bot, chat_id: int, interval: float):
+    """
+    "Печатает..." на все время толкования: Telegram гасит статус через 5 секунд, поэтому
+    повторяем его каждые interval секунд. Ошибки (в том числе 429) не прерывают толкование.
+    """
+    async def refresh():
+        while True:
+            try:
+                await bot.send_chat_action(chat_id=chat_id, action="typing")
+            except TelegramRetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+                continue
+            except Exception as e:
+                print(f"Не удалось отправить typing в чат {chat_id}: {e}")
+            await asyncio.sleep(interval)
+
+    task = asyncio.create_task(refresh())
+    try:
+        yield
+    finally:
+        task.cancel()
+
+
+outbound = OutboundQueue(settings.BOT_SEND_PER_SECOND, settings.BOT_SEND_CHAT_INTERVAL,
+                         settings.BOT_SEND_MAX_RETRIES)
@@ -0,0 +1,135 @@
+# bot/benchmarks/bot_load.py
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+# Бенчмарк handle_text_message без Telegram: сообщения подаются напрямую в хэндлер,
+# а вызовы Bot API (send_chat_action) уходят в мок (backend/benchmarks/mock_llm.py).
+# Обычно запускается из backend/benchmarks/load.py (сценарий bot), печатает одну строку JSON.
+#
+#   python benchmarks/bot_load.py --concurrency 8 --requests 200 --telegram-url http://127.0.0.1:9100
+
+BOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BOT_DIR))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:BENCH")
+# Меряем сам хэндлер: без окна склейки сообщений каждое сообщение толкуется сразу
+os.environ.setdefault("BOT_DEBOUNCE_SECONDS", "0")
+# ...и без лимитов Telegram на отправку: меряем хэндлер, а не очередь исходящих сообщений
+os.environ.setdefault("BOT_SEND_PER_SECOND", "0")
+os.environ.setdefault("BOT_SEND_CHAT_INTERVAL", "0")
+
+BENCH_TELEGRAM_ID_BASE = 900_000_000  # Как в backend/benchmarks/seed.py
+
+
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+
+
+class FakeChat:
+    def __init__(self, chat_id: int):
+        self.id = chat_id
+
+
+class FakeMessage:
+    """Ровно то, чем пользуется хэндлер: from_user, chat, text, answer() и reply()."""
+
+    def __init__(self, telegram_id: int, text: str):
+        self.from_user = FakeUser(telegram_id)
+        self.chat = FakeChat(telegram_id)
+        self.text = text
+        self.replies: list[str] = []
+
+    async def answer(self, text: str, **kwargs):
+        self.replies.append(text)
+
+    async def reply(self, text: str, **kwargs):
+        self.replies.append(text)
+
+
+class FakeState:
+    async def get_state(self):
+        return None
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), round(q * len(sorted_values) + 0.5)))
+    return sorted_values[rank - 1]
+
+
+async def run(args) -> dict:
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    import bot as bot_module
+
+    bot_module.bot = Bot(token=os.environ["TELEGRAM_BOT_TOKEN"],
+                         session=AiohttpSession(api=TelegramAPIServer.from_base(args.telegram_url)))
+
+    counter = itertools.count()
+    latencies: list[float] = []
+    outcomes = {"ok": 0, "error": 0}
+
+    async def worker(record: bool, limit: int):
+        while (n := next(counter)) < limit:
+            message = FakeMessage(BENCH_TELEGRAM_ID_BASE + n % args.users,
+                                  f"Мне снилось, что я плыву по реке мимо старого дома, и это сон номер {n}.")
+            started_at = time.perf_counter()
+            await bot_module.handle_text_message(message, FakeState())
+            if record:
+                latencies.append(time.perf_counter() - started_at)
+                # Ошибки хэндлер не бросает, а отвечает текстом — отличаем их по ответу
+                failed = not message.replies or message.replies[-1].startswith(("Произошла ошибка", "Кажется"))
+                outcomes["error" if failed else "ok"] += 1
+
+    try:
+        if args.warmup:
+            await asyncio.gather(*(worker(False, args.warmup) for _ in range(args.concurrency)))
+            counter = itertools.count()
+        started_at = time.perf_counter()
+        await asyncio.gather(*(worker(True, args.requests) for _ in range(args.concurrency)))
+        duration = time.perf_counter() - started_at
+    finally:
+        await bot_module.bot.session.close()
+        await bot_module.close_http_client()
+        await bot_module.engine.dispose()
+
+    values = sorted(latencies)
+    return {
+        "concurrency": args.concurrency,
+        "requests": len(values),
+        "ok": outcomes["ok"],
+        "errors": outcomes["error"],
+        "status_counts": outcomes,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(values) / duration, 2) if duration else 0.0,
+        "latency_ms": {
+            "mean": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+            "p50": round(percentile(values, 0.50) * 1000, 2),
+            "p95": round(percentile(values, 0.95) * 1000, 2),
+            "p99": round(percentile(values, 0.99) * 1000, 2),
+            "max": round(values[-1] * 1000, 2) if values else 0.0,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон хэндлера снов бота")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--users", type=int, default=1000, help="Сколько засеянных пользователей использовать")
+    parser.add_argument("--telegram-url", required=True, help="Мок Bot API, например http://127.0.0.1:9100")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,31 +2,72 @@
 import asyncio
 import logging
 import os
-from datetime import datetime
+import time
+from datetime import date, datetime
 from dotenv import load_dotenv
 
+from aiohttp import web
 from aiogram import Bot, Dispatcher, F, types
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.filters import CommandStart
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import Message
-
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.core.config import settings
-from app.db.models.user import User
-from app.db.models.dream import Dream
-from app.services.llm_service import get_dream_interpretation, LLMError
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from prometheus_client import start_http_server
+from sqlalchemy import select
+from dream_engine.core.config import settings
+from dream_engine.core.metrics import BOT_HANDLER_DURATION
+from dream_engine.db.session import SessionLocal, engine
+from dream_engine import AdmissionRejected, Interpreter, LLMBusyError, LLMError
+from dream_engine.db.models.user import User
+from dream_engine.services.admission import user_rate_limiter
+from dream_engine.services.llm_service import close_http_client
+from dream_engine.services.user_cache import user_cache
+from app.services.debounce import message_debouncer
+from app.services.fsm_storage import PostgresStorage
+from app.services.outbound import keep_typing, outbound
 
 load_dotenv()
 TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 if not TOKEN: raise ValueError("Не найден TELEGRAM_BOT_TOKEN")
 
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# BOT_API_SERVER — локальный Bot API сервер или мок (benchmarks/mock_llm.py) для отладки без Telegram
+session = AiohttpSession(api=TelegramAPIServer.from_base(settings.BOT_API_SERVER)) if settings.BOT_API_SERVER else None
+bot = Bot(token=TOKEN, session=session)
+# Несколько реплик бота должны видеть одно и то же состояние регистрации
+storage = PostgresStorage(SessionLocal) if settings.BOT_FSM_STORAGE == "postgres" else MemoryStorage()
+dp = Dispatcher(storage=storage)
+dream_interpreter = Interpreter("bot", limiter=user_rate_limiter)
+
+
+# --- ОГРАНИЧЕНИЕ ПАРАЛЛЕЛЬНОСТИ ---
+# И polling, и webhook запускают каждый апдейт отдельной задачей без ограничений;
+# лишние ждут здесь, а не толпятся за соединениями к БД и слотами LLM
+handler_slots = asyncio.Semaphore(settings.BOT_HANDLER_CONCURRENCY)
+
 
-bot = Bot(token=TOKEN)
-dp = Dispatcher()
+@dp.update.outer_middleware()
+async def limit_concurrency(handler, event: types.Update, data: dict):
+    async with handler_slots:
+        return await handler(event, data)
+
+
+# --- МЕТРИКИ ХЭНДЛЕРОВ ---
+@dp.message.middleware()
+async def measure_handler(handler, event: Message, data: dict):
+    started_at = time.perf_counter()
+    outcome = "error"
+    try:
+        result = await handler(event, data)
+        outcome = "ok"
+        return result
+    finally:
+        BOT_HANDLER_DURATION.labels(handler=data["handler"].callback.__name__, outcome=outcome) \
+            .observe(time.perf_counter() - started_at)
 
 
 # --- 1. ОПРЕДЕЛЯЕМ СОСТОЯНИЯ ДЛЯ РЕГИСТРАЦИИ ---
@@ -39,18 +80,16 @@ class Registration(StatesGroup):
 # --- ХЭНДЛЕР КОМАНДЫ /start ---
 @dp.message(CommandStart())
 async def handle_start(message: Message, state: FSMContext):
-    db = SessionLocal()
-    try:
-        user = db.query(User).filter(User.telegram_id == message.from_user.id).first()
-        if user:
-            await message.answer(f"С возвращением, {user.first_name}! Жду ваш новый сон.")
-            await state.clear()  # Сбрасываем состояние, если оно было
-        else:
-            # Начинаем диалог регистрации
-            await message.answer("Добро пожаловать в ИИ Сонник! Давайте познакомимся. Как вас зовут? (только имя)")
-            await state.set_state(Registration.waiting_for_first_name)
-    finally:
-        db.close()
+    async with SessionLocal() as db:
+        user = await user_cache.get_user_by_telegram_id(db, message.from_user.id)
+
+    if user:
+        await message.answer(f"С возвращением, {user.first_name}! Жду ваш новый сон.")
+        await state.clear()  # Сбрасываем состояние, если оно было
+    else:
+        # Начинаем диалог регистрации
+        await message.answer("Добро пожаловать в ИИ Сонник! Давайте познакомимся. Как вас зовут? (только имя)")
+        await state.set_state(Registration.waiting_for_first_name)
 
 
 # --- ХЭНДЛЕРЫ ДИАЛОГА РЕГИСТРАЦИИ ---
@@ -66,7 +105,7 @@ async def process_dob(message: Message, state: FSMContext):
     try:
         # Проверяем формат даты
         dob = datetime.strptime(message.text, "%d.%m.%Y").date()
-        await state.update_data(dob=dob)
+        await state.update_data(dob=dob.isoformat())  # Данные FSM хранятся в JSON
         await message.answer(
             "Спасибо! И последний шаг: ваш номер телефона. Я буду использовать его для входа на сайте.")
         await state.set_state(Registration.waiting_for_phone)
@@ -78,10 +117,9 @@ async def process_dob(message: Message, state: FSMContext):
 async def process_phone(message: Message, state: FSMContext):
     phone = message.text
     user_data = await state.get_data()
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         # Проверяем, нет ли уже пользователя с таким телефоном
-        existing_user = db.query(User).filter(User.phone == phone).first()
+        existing_user = await db.scalar(select(User).where(User.phone == phone))
         if existing_user:
             await message.answer(
                 "Пользователь с таким номером телефона уже зарегистрирован. Попробуйте другой номер или отправьте /start, чтобы начать заново.")
@@ -90,17 +128,17 @@ async def process_phone(message: Message, state: FSMContext):
         # Создаем нового пользователя
         new_user = User(
             first_name=user_data['first_name'],
-            dob=user_data['dob'],
+            dob=date.fromisoformat(user_data['dob']),
             phone=phone,
             telegram_id=message.from_user.id
         )
         db.add(new_user)
-        db.commit()
-        await message.answer(
-            f"Регистрация завершена! Рад знакомству, {new_user.first_name}. Теперь вы можете присылать мне свои сны.")
-        await state.clear()  # Завершаем регистрацию
-    finally:
-        db.close()
+        await db.commit()
+        user_cache.invalidate_user(new_user.id, new_user.telegram_id)
+
+    await message.answer(
+        f"Регистрация завершена! Рад знакомству, {new_user.first_name}. Теперь вы можете присылать мне свои сны.")
+    await state.clear()  # Завершаем регистрацию
 
 
 # --- ОСНОВНОЙ ХЭНДЛЕР СНОВ ---
@@ -112,34 +150,78 @@ async def handle_text_message(message: Message, state: FSMContext):
         await message.answer("Пожалуйста, сначала завершите регистрацию.")
         return
 
-    db = SessionLocal()
-    try:
-        user = db.query(User).filter(User.telegram_id == message.from_user.id).first()
-        if not user:
-            await message.answer("Кажется, мы еще не знакомы. Пожалуйста, отправьте команду /start")
-            return
+    # Фрагменты одного сна, присланные подряд, склеиваем: толкует их хэндлер первого сообщения
+    texts = await message_debouncer.collect(message.chat.id, message.text)
+    if texts is None:
+        return
+    dream_text = "\n".join(texts)
 
-        await bot.send_chat_action(chat_id=message.chat.id, action="typing")
-        past_dreams = db.query(Dream).filter(Dream.user_id == user.id).order_by(Dream.created_at.desc()).limit(3).all()
+    async with SessionLocal() as db:
+        user = await user_cache.get_user_by_telegram_id(db, message.from_user.id)
+    if not user:
+        await message.answer("Кажется, мы еще не знакомы. Пожалуйста, отправьте команду /start")
+        return
 
-        try:
-            interpretation_text = get_dream_interpretation(current_dream=message.text, user=user,
-                                                           past_dreams=past_dreams)
-        except LLMError as e:
-            await message.reply(f"Произошла ошибка при толковании: {e}")
-            return
+    # Похожие прошлые сны, LLM и сохранение — тот же движок, что у эндпоинта /chat/interpret
+    try:
+        async with keep_typing(bot, message.chat.id, settings.BOT_TYPING_INTERVAL):
+            result = await dream_interpreter.interpret(user, dream_text, rate_limit_key=f"tg:{message.from_user.id}")
+    except AdmissionRejected as e:
+        await outbound.send_text(message, f"{e.detail} (через {e.retry_after} сек.)", reply=False)
+        return
+    except LLMBusyError as e:
+        await outbound.send_text(message, f"{e} Повторите, пожалуйста, через {e.retry_after} сек.")
+        return
+    except LLMError as e:
+        await outbound.send_text(message, f"Произошла ошибка при толковании: {e}")
+        return
 
-        new_dream = Dream(request_text=message.text, response_text=interpretation_text, user_id=user.id)
-        db.add(new_dream)
-        db.commit()
-        await message.reply(interpretation_text)
+    # Толкование уже в БД: через очередь отправки ответ переживет 429 и не упрется в лимит 4096 символов
+    await outbound.send_text(message, result.text)
+
+
+async def run_webhook():
+    """
+    Принимает апдейты POST-запросами на BOT_WEBHOOK_PATH. Telegram сразу получает 200,
+    апдейт обрабатывается в фоне. Без BOT_WEBHOOK_URL setWebhook не вызывается —
+    можно слать синтетические апдейты curl'ом (см. README).
+    """
+    app = web.Application()
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=settings.BOT_WEBHOOK_SECRET or None) \
+        .register(app, path=settings.BOT_WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+    if settings.BOT_WEBHOOK_URL:
+        await bot.set_webhook(settings.BOT_WEBHOOK_URL.rstrip("/") + settings.BOT_WEBHOOK_PATH,
+                              secret_token=settings.BOT_WEBHOOK_SECRET or None,
+                              allowed_updates=dp.resolve_used_update_types())
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, settings.BOT_WEBHOOK_HOST, settings.BOT_WEBHOOK_PORT).start()
+    print(f"Бот слушает webhook на {settings.BOT_WEBHOOK_HOST}:{settings.BOT_WEBHOOK_PORT}{settings.BOT_WEBHOOK_PATH}")
+    try:
+        await asyncio.Event().wait()
     finally:
-        db.close()
+        await runner.cleanup()
 
 
 async def main():
     logging.basicConfig(level=logging.INFO)
-    await dp.start_polling(bot)
+    if settings.BOT_METRICS_PORT:
+        # /metrics для Prometheus: хэндлеры, LLM, БД — те же метрики, что и у бэкенда
+        start_http_server(settings.BOT_METRICS_PORT)
+    try:
+        if settings.BOT_MODE == "webhook":
+            await run_webhook()
+        else:
+            # getUpdates не работает, пока у бота висит webhook от прошлого запуска
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
+    finally:
+        # Закрываем пул keep-alive соединений к LLM и пул соединений к БД
+        await close_http_client()
+        await engine.dispose()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,10 @@
+# engine/dream_engine/__init__.py
+"""
+Движок толкования снов, общий для бэкенда (backend/app) и Telegram-бота (bot/bot.py):
+модели и сессия БД, сборка промпта, клиент LLM и Interpreter.interpret(user, text).
+"""
+from dream_engine.interpreter import InterpretationResult, Interpreter
+from dream_engine.services.admission import AdmissionRejected
+from dream_engine.services.llm_service import LLMBusyError, LLMError
+
+__all__ = ["Interpreter", "InterpretationResult", "AdmissionRejected", "LLMError", "LLMBusyError"]
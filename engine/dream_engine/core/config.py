@@ -0,0 +1,155 @@
+# engine/dream_engine/core/config.py
+from pydantic import BaseModel
+from pydantic_settings import BaseSettings
+
+
+class LLMProviderConfig(BaseModel):
+    """Один провайдер/модель для роутера LLM (см. llm_router)."""
+    name: str
+    url: str
+    model: str
+    api_key: str | None = None  # None — берем OPENROUTER_API_KEY
+
+
+class Settings(BaseSettings):
+    DATABASE_URL: str
+    OPENROUTER_API_KEY: str
+
+    # --- Пул соединений к БД (asyncpg) ---
+    # Каждый процесс держит до DB_POOL_SIZE + DB_MAX_OVERFLOW соединений,
+    # поэтому при N воркерах uvicorn в Postgres уходит до N * (size + overflow).
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0     # Сколько ждать свободное соединение из пула
+    DB_POOL_RECYCLE: int = 1800       # Пересоздавать соединения старше N секунд
+    DB_POOL_PRE_PING: bool = True     # Проверять соединение перед выдачей из пула
+
+    # --- Старт процесса и /readyz (services/lifecycle.py) ---
+    DB_AUTO_CREATE: bool = False        # create_all вместо проверки миграций (SQLite, бенчмарки)
+    DB_PREWARM_CONNECTIONS: int = 5     # Сколько соединений с БД открыть до приема трафика
+    LLM_PREWARM_CONNECTIONS: int = 2    # Сколько keep-alive соединений открыть к каждому провайдеру LLM
+    LLM_PREWARM_TIMEOUT: float = 5.0
+    READINESS_DB_TIMEOUT: float = 2.0   # /readyz: сколько ждать SELECT 1
+
+    # --- HTTP-клиент для LLM (общий пул keep-alive соединений) ---
+    LLM_API_URL: str = "https://openrouter.ai/api/v1/chat/completions"
+    LLM_MODEL: str = "z-ai/glm-4.5-air:free"
+    LLM_MAX_CONNECTIONS: int = 100            # Максимум одновременных соединений к хосту LLM
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 20   # Сколько соединений держим открытыми между запросами
+    LLM_KEEPALIVE_EXPIRY: float = 30.0        # Через сколько секунд простоя закрываем соединение
+    LLM_CONNECT_TIMEOUT: float = 5.0          # Таймаут на установку TCP+TLS соединения
+    LLM_READ_TIMEOUT: float = 60.0            # Таймаут ожидания ответа модели
+    LLM_POOL_TIMEOUT: float = 10.0            # Сколько ждать свободное соединение из пула
+
+    # --- Роутер LLM: несколько провайдеров/моделей, circuit breaker, хеджирование ---
+    # Провайдеры по порядку предпочтения, JSON в .env:
+    # LLM_PROVIDERS='[{"name": "glm", "url": "https://openrouter.ai/api/v1/chat/completions", "model": "z-ai/glm-4.5-air:free"}]'
+    # Если пусто — один провайдер LLM_API_URL/LLM_MODEL плюс запасные модели у него же.
+    LLM_PROVIDERS: list[LLMProviderConfig] = []
+    LLM_FALLBACK_MODELS: list[str] = []
+    LLM_BREAKER_WINDOW: int = 20              # По скольким последним вызовам считаем долю ошибок
+    LLM_BREAKER_MIN_CALLS: int = 5            # Раньше этого числа вызовов breaker не срабатывает
+    LLM_BREAKER_FAILURE_RATE: float = 0.5     # Доля ошибок (и медленных ответов), при которой провайдер выключается
+    LLM_BREAKER_SLOW_CALL_SECONDS: float = 30.0  # Ответ дольше этого считается ошибкой
+    LLM_BREAKER_COOLDOWN: float = 30.0        # Через сколько секунд пробуем выключенного провайдера снова
+    LLM_HEDGING_ENABLED: bool = False         # Дублировать медленный запрос следующему провайдеру
+    LLM_HEDGE_MAX: int = 1                    # Сколько дополнительных провайдеров можно подключить к одному запросу
+    LLM_HEDGE_MIN_DELAY: float = 2.0          # Границы задержки перед хеджем (сама задержка — p95 провайдера)
+    LLM_HEDGE_MAX_DELAY: float = 20.0
+
+    # --- Кэш толкований (в первую очередь для гостей) ---
+    INTERPRETATION_CACHE_ENABLED: bool = True
+    INTERPRETATION_CACHE_MAX_ENTRIES: int = 1000  # Размер LRU в памяти процесса
+    INTERPRETATION_CACHE_TTL: int = 86400         # Время жизни записи, секунды
+    INTERPRETATION_CACHE_SHARED: bool = False     # Включить общий уровень в Postgres
+
+    # --- Кэш пользователей и их последних снов в памяти процесса (services/user_cache.py) ---
+    USER_CACHE_ENABLED: bool = True
+    USER_CACHE_MAX_ENTRIES: int = 10000   # На каждый из трех словарей: по id, по telegram_id, последние сны
+    USER_CACHE_TTL: float = 30.0          # Дольше этого не видим записи другого процесса (бот <-> бэкенд)
+
+    # --- Контекст промпта: похожие прошлые сны вместо последних (services/retrieval.py) ---
+    RETRIEVAL_ENABLED: bool = True
+    RETRIEVAL_TOP_K: int = 3              # Сколько похожих снов отдать в промпт (бюджет — PROMPT_HISTORY_TOKENS)
+    RETRIEVAL_MIN_SCORE: float = 0.15     # Косинусная близость, ниже которой сон не считаем похожим
+    RETRIEVAL_MAX_CANDIDATES: int = 1000  # Среди скольких последних снов пользователя искать
+
+    # --- Сводка прошлых снов пользователя ("память") ---
+    DREAM_MEMORY_ENABLED: bool = True
+    DREAM_MEMORY_UPDATE_EVERY: int = 3    # Сколько новых снов копим, прежде чем обновить сводку
+    DREAM_MEMORY_MAX_CHARS: int = 1500    # Верхняя граница длины сводки в промпте
+    DREAM_MEMORY_MAX_BATCH: int = 20      # Сколько снов максимум вливаем в сводку за один вызов LLM
+
+    # --- Бюджет токенов промпта по секциям (оценка локальная, см. prompt_builder) ---
+    PROMPT_SYSTEM_TOKENS: int = 300      # Статичный системный промпт
+    PROMPT_MEMORY_TOKENS: int = 800      # Сводка прошлых снов
+    PROMPT_HISTORY_TOKENS: int = 1500    # Последние сны с толкованиями
+    PROMPT_DREAM_TOKENS: int = 1500      # Текущий сон
+
+    # --- Фоновые задачи на толкование (POST /chat/jobs) ---
+    JOB_QUEUE_BACKEND: str = "local"     # "local" — очередь в памяти процесса, "postgres" — общая, через SKIP LOCKED
+    JOB_WORKERS: int = 4                 # Сколько задач процесс толкует одновременно
+    JOB_POLL_INTERVAL: float = 1.0       # Как часто воркер Postgres-очереди проверяет новые задачи, секунды
+    JOB_STALE_AFTER: int = 300           # Задачу "running" дольше N секунд считаем брошенной и берем заново
+    JOB_MAX_ATTEMPTS: int = 3
+
+    # --- Контроль нагрузки (admission control) ---
+    LLM_MAX_CONCURRENCY: int = 32           # Одновременных вызовов LLM на процесс
+    LLM_QUEUE_MAX: int = 200                # Сколько вызовов может ждать слот; остальным сразу 429
+    LLM_QUEUE_TIMEOUT: float = 15.0         # Сколько максимум ждать слот, секунды
+    RATE_LIMIT_GUEST_PER_MINUTE: float = 3  # Гости (по IP)
+    RATE_LIMIT_GUEST_BURST: int = 3
+    RATE_LIMIT_USER_PER_MINUTE: float = 10  # Зарегистрированные пользователи
+    RATE_LIMIT_USER_BURST: int = 5
+    RATE_LIMIT_MAX_KEYS: int = 100000       # Сколько ключей (IP/пользователей) помним одновременно
+    TRUST_PROXY_HEADERS: bool = False       # Брать IP гостя из X-Forwarded-For (только за своим прокси!)
+
+    # --- Метрики Prometheus (см. core/metrics.py) ---
+    BOT_METRICS_PORT: int = 9101            # Порт /metrics процесса бота; 0 — не поднимать
+
+    # --- Режим работы бота ---
+    BOT_MODE: str = "polling"               # polling — getUpdates; webhook — встроенный aiohttp-сервер
+    BOT_WEBHOOK_URL: str = ""               # Публичный https-адрес; пусто — setWebhook не вызываем (локальная отладка)
+    BOT_WEBHOOK_PATH: str = "/telegram/webhook"
+    BOT_WEBHOOK_SECRET: str = ""            # X-Telegram-Bot-Api-Secret-Token; пусто — не проверяем
+    BOT_WEBHOOK_HOST: str = "0.0.0.0"
+    BOT_WEBHOOK_PORT: int = 8080
+    BOT_API_SERVER: str = ""                # Свой Bot API сервер (или мок из benchmarks); пусто — api.telegram.org
+    BOT_FSM_STORAGE: str = "memory"         # memory — состояние в процессе; postgres — общее для всех реплик
+    BOT_HANDLER_CONCURRENCY: int = 100      # Сколько апдейтов обрабатываем одновременно; остальные ждут
+
+    # --- Склейка сообщений бота (один сон несколькими сообщениями подряд) ---
+    BOT_DEBOUNCE_SECONDS: float = 2.0       # Тишина, после которой сон считается дописанным; 0 — не склеивать
+    BOT_DEBOUNCE_MAX_MESSAGES: int = 10     # Не ждать дальше, если набралось столько сообщений...
+    BOT_DEBOUNCE_MAX_CHARS: int = 4000      # ...или столько символов
+    BOT_DEBOUNCE_MAX_WAIT: float = 10.0     # Окно не дольше этого, даже если сообщения все идут
+
+    # --- Отправка сообщений ботом (bot/app/services/outbound.py) ---
+    BOT_SEND_PER_SECOND: float = 30         # Общий лимит Telegram на бота; при нескольких репликах делить между ними
+    BOT_SEND_CHAT_INTERVAL: float = 1.0     # Пауза между сообщениями одного чата
+    BOT_SEND_MAX_RETRIES: int = 5           # Повторов после 429 Too Many Requests, прежде чем сдаться
+    BOT_TYPING_INTERVAL: float = 4.0        # Как часто обновлять "печатает..." (Telegram гасит его через 5 с)
+
+    # --- Импорт дневника снов (POST /users/{id}/dreams/import) ---
+    IMPORT_CHUNK_SIZE: int = 500            # Записей на один INSERT и один commit
+    IMPORT_MAX_ENTRY_BYTES: int = 65536     # Максимальный размер одной записи в теле запроса
+    IMPORT_MAX_ERRORS: int = 100            # Сколько ошибок валидации перечислить в ответе (считаются все)
+
+    # --- История чата: ETag/304 и сжатие ответа (api/http_cache.py) ---
+    HTTP_COMPRESS_MIN_BYTES: int = 1024     # Ответы меньше этого отдаем как есть
+    HTTP_GZIP_LEVEL: int = 6                # 1..9
+    HTTP_BROTLI_QUALITY: int = 5            # 0..11; выше 5-6 для динамических ответов слишком медленно
+
+    # --- Оплата через Робокассу (api/v1/endpoints/payment.py) ---
+    ROBOKASSA_MERCHANT_LOGIN: str = ""
+    ROBOKASSA_PASSWORD_1: str = ""          # Подпись ссылки на оплату
+    ROBOKASSA_PASSWORD_2: str = ""          # Проверка подписи Result URL; пусто — уведомления отклоняются
+    ROBOKASSA_IS_TEST: bool = True          # IsTest=1: тестовый режим, реальные деньги не списываются
+
+    # --- Админские эндпоинты (профайлер) ---
+    ADMIN_TOKEN: str = ""                   # Заголовок X-Admin-Token; пусто — эндпоинты выключены
+
+    class Config:
+        env_file = ".env"
+
+settings = Settings()
@@ -0,0 +1,88 @@
+# engine/dream_engine/core/metrics.py
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    Gauge,
+    generate_latest,
+    multiprocess,
+)
+
+# Метрики Prometheus для горячих путей: HTTP, вызовы LLM, запросы к БД и пул соединений.
+# Бэкенд отдает их на /metrics, бот — на отдельном порту (BOT_METRICS_PORT).
+# Если uvicorn запущен с несколькими воркерами, задайте PROMETHEUS_MULTIPROC_DIR —
+# тогда /metrics соберет метрики всех процессов.
+
+# Вызовы LLM длятся секунды, запросы к БД и HTTP без LLM — миллисекунды
+LLM_BUCKETS = (0.25, 0.5, 1, 2, 3, 5, 7.5, 10, 15, 20, 30, 45, 60, 90)
+FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса (до конца тела ответа)",
+    ["method", "route", "status"], buckets=FAST_BUCKETS,
+)
+
+BOT_HANDLER_DURATION = Histogram(
+    "bot_handler_duration_seconds", "Время работы хэндлера бота",
+    ["handler", "outcome"], buckets=FAST_BUCKETS,
+)
+BOT_OUTBOUND_WAIT = Histogram(
+    "bot_outbound_wait_seconds", "Ожидание сообщения бота в очереди отправки (лимиты Telegram)",
+    buckets=FAST_BUCKETS,
+)
+BOT_OUTBOUND_RETRY_AFTER = Counter(
+    "bot_outbound_retry_after_total", "Ответы Telegram 429 Too Many Requests на отправку сообщений",
+)
+
+INTERPRET_STAGE_DURATION = Histogram(
+    "interpret_stage_duration_seconds", "Этапы толкования сна (dream_engine.Interpreter) по фронтендам",
+    ["frontend", "stage"], buckets=FAST_BUCKETS,
+)
+
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds", "Время до первого токена потокового ответа LLM",
+    ["provider"], buckets=LLM_BUCKETS,
+)
+LLM_REQUEST_DURATION = Histogram(
+    "llm_request_duration_seconds", "Полное время вызова LLM",
+    ["provider", "mode", "outcome"], buckets=LLM_BUCKETS,
+)
+LLM_TOKENS = Histogram(
+    "llm_tokens", "Токенов на вызов LLM (по usage провайдера, иначе локальная оценка)",
+    ["provider", "kind"], buckets=TOKEN_BUCKETS,
+)
+LLM_ERRORS = Counter(
+    "llm_errors_total", "Ошибки LLM по причинам",
+    ["cause"],
+)
+
+USER_CACHE_REQUESTS = Counter(
+    "user_cache_requests_total", "Обращения к кэшу пользователей и их последних снов (hit/miss)",
+    ["cache", "result"],
+)
+
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Время выполнения SQL-запроса",
+    ["operation"], buckets=FAST_BUCKETS,
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Сколько ждали соединение из пула (включая открытие нового)",
+    buckets=FAST_BUCKETS,
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections", "Соединений из пула сейчас выдано",
+    multiprocess_mode="livesum",
+)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Текст для /metrics и его Content-Type."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
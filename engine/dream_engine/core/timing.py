@@ -0,0 +1,51 @@
+# engine/dream_engine/core/timing.py
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Разбивка одного запроса по этапам: поиск пользователя, выборка прошлых снов,
+# сборка промпта, вызов LLM, очистка ответа, commit. Текущий запрос лежит в ContextVar,
+# поэтому span() можно звать из любого слоя (эндпоинт, сервис) без передачи объекта.
+# Вне HTTP-запроса (бот, фоновые задачи) span() ничего не делает.
+
+
+class RequestTiming:
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.started_at = time.perf_counter()
+        # Имя этапа -> (суммарное время, сколько раз); порядок — первого появления
+        self.spans: dict[str, list[float]] = {}
+
+    def add(self, name: str, duration: float) -> None:
+        span = self.spans.setdefault(name, [0.0, 0])
+        span[0] += duration
+        span[1] += 1
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def server_timing(self) -> str:
+        """Значение заголовка Server-Timing: 'user_lookup;dur=1.2, llm_upstream;dur=4300.5, total;dur=...'."""
+        parts = [f"{name};dur={duration * 1000:.1f}" for name, (duration, _) in self.spans.items()]
+        parts.append(f"total;dur={self.total() * 1000:.1f}")
+        return ", ".join(parts)
+
+    def as_dict(self) -> dict:
+        return {name: round(duration * 1000, 1) for name, (duration, _) in self.spans.items()}
+
+
+current_timing: ContextVar[RequestTiming | None] = ContextVar("current_timing", default=None)
+
+
+@contextmanager
+def span(name: str):
+    """Засекает этап текущего запроса. Можно оборачивать и await: with span("commit"): await db.commit()"""
+    timing = current_timing.get()
+    if timing is None:
+        yield
+        return
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - started_at)
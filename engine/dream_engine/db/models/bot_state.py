@@ -0,0 +1,14 @@
+# engine/dream_engine/db/models/bot_state.py
+from sqlalchemy import Column, String, Text, DateTime
+from sqlalchemy.sql import func
+from dream_engine.db.session import Base
+
+
+class BotFSMState(Base):
+    """Состояние диалога бота (FSM aiogram): общее для всех реплик бота."""
+    __tablename__ = "bot_fsm_states"
+
+    key = Column(String(255), primary_key=True)  # fsm:<bot_id>:<chat_id>:<user_id>:... (DefaultKeyBuilder)
+    state = Column(String(255), nullable=True)
+    data = Column(Text, nullable=True)  # JSON
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
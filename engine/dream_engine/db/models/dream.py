@@ -0,0 +1,43 @@
+# engine/dream_engine/db/models/dream.py
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index, DDL, LargeBinary, event
+from sqlalchemy.orm import deferred, relationship
+from sqlalchemy.sql import func
+from dream_engine.db.session import Base
+from dream_engine.services.dream_vectors import embedding_default
+
+
+class Dream(Base):
+    __tablename__ = "dreams"
+    __table_args__ = (
+        # История и контекст всегда выбираются как "сны пользователя по времени"
+        Index("ix_dreams_user_id_created_at", "user_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    request_text = Column(Text, nullable=False)
+    response_text = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Вектор текста сна для поиска похожих (services/retrieval.py). Считается один раз при INSERT;
+    # deferred — обычные выборки снов его не тянут
+    embedding = deferred(Column(LargeBinary, nullable=True, default=embedding_default))
+
+    user_id = Column(Integer, ForeignKey("users.id"))
+    # Обратная связь с моделью User
+    owner = relationship("User", back_populates="dreams")
+
+
+# Полнотекстовый поиск (services/search_service.py) есть только в Postgres: колонку
+# search_vector и GIN-индексы создает миграция 0006. В модель колонка не входит, чтобы
+# та же модель работала на SQLite; для базы, созданной create_all, — тот же DDL здесь.
+SEARCH_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS btree_gin",
+    """ALTER TABLE dreams ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', coalesce(request_text, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(response_text, '')), 'B')
+    ) STORED""",
+    "CREATE INDEX ix_dreams_user_id_search_vector ON dreams USING gin (user_id, search_vector)",
+    "CREATE INDEX ix_dreams_user_id_request_trgm ON dreams USING gin (user_id, request_text gin_trgm_ops)",
+)
+for statement in SEARCH_DDL:
+    event.listen(Dream.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
@@ -0,0 +1,13 @@
+# engine/dream_engine/db/models/interpretation_cache.py
+from sqlalchemy import Column, String, Text, DateTime
+from sqlalchemy.sql import func
+from dream_engine.db.session import Base
+
+
+class CachedInterpretation(Base):
+    """Общий (между процессами) уровень кэша толкований."""
+    __tablename__ = "interpretation_cache"
+
+    key = Column(String(64), primary_key=True)  # sha256 от нормализованного сна и контекста промпта
+    interpretation = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
@@ -0,0 +1,29 @@
+# engine/dream_engine/db/models/invoice.py
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from dream_engine.db.session import Base
+
+# Статусы счета
+INVOICE_PENDING = "pending"
+INVOICE_PAID = "paid"
+
+
+class Invoice(Base):
+    """
+    Счет на оплату через Робокассу. id — InvoiceID в Робокассе: его выдает последовательность БД
+    (SERIAL), поэтому номера не совпадают при любом числе одновременных запросов и воркеров.
+    """
+    __tablename__ = "invoices"
+    __table_args__ = (
+        # Повтор запроса с тем же Idempotency-Key возвращает уже созданный счет (NULL-ключи не конфликтуют)
+        UniqueConstraint("user_id", "idempotency_key", name="uq_invoices_user_id_idempotency_key"),
+    )
+
+    id = Column(Integer, primary_key=True)  # Робокасса принимает InvId до 2^31 - 1
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # Индекс — уникальный ключ выше
+    amount = Column(Numeric(12, 2), nullable=False)
+    description = Column(String(255), nullable=False)
+    status = Column(String(16), nullable=False, default=INVOICE_PENDING)
+    idempotency_key = Column(String(64), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    paid_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,31 @@
+# engine/dream_engine/db/models/job.py
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from dream_engine.db.session import Base
+
+# Статусы задачи на толкование
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class InterpretationJob(Base):
+    """Отложенное толкование сна: HTTP-запрос сразу получает id, ответ пишет воркер."""
+    __tablename__ = "interpretation_jobs"
+    __table_args__ = (
+        # Воркеры выбирают самые старые задачи в нужном статусе
+        Index("ix_interpretation_jobs_status_created_at", "status", "created_at"),
+    )
+
+    id = Column(String(32), primary_key=True)  # uuid4().hex
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    request_text = Column(Text, nullable=False)
+    status = Column(String(16), nullable=False, default=JOB_PENDING)
+    interpretation = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    dream_id = Column(Integer, ForeignKey("dreams.id"), nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
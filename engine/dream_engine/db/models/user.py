@@ -1,8 +1,8 @@
-# backend/app/db/models/user.py
-from sqlalchemy import Column, Integer, String, Date, DateTime
+# engine/dream_engine/db/models/user.py
+from sqlalchemy import Column, Integer, String, Date, DateTime, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-from app.db.session import Base
+from dream_engine.db.session import Base
 
 class User(Base):
     __tablename__ = "users"
@@ -15,4 +15,9 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     telegram_id = Column(Integer, unique=True, index=True, nullable=True)
 
+    # Сводка всех прошлых снов, обновляется инкрементально (см. services/memory_service.py)
+    dream_memory = Column(Text, nullable=True)
+    dream_memory_last_dream_id = Column(Integer, nullable=True)  # Последний сон, вошедший в сводку
+    dream_memory_updated_at = Column(DateTime(timezone=True), nullable=True)
+
     dreams = relationship("Dream", back_populates="owner")
\ No newline at end of file
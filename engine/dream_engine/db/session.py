@@ -0,0 +1,101 @@
+# engine/dream_engine/db/session.py
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from dream_engine.core.config import settings
+from dream_engine.core.metrics import DB_POOL_CHECKOUT_WAIT, DB_POOL_CHECKED_OUT, DB_QUERY_DURATION
+
+# Асинхронные драйверы для тех URL, что лежат в .env (там обычно postgresql+psycopg2)
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_database_url(url: str) -> str:
+    """Подменяет синхронный драйвер в DATABASE_URL на асинхронный."""
+    parsed = make_url(url)
+    drivername = ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Пул, который меряет, сколько ждали соединение: главный признак, что пула не хватает."""
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started_at)
+
+
+def _pool_options() -> dict:
+    # SQLite (локальные бенчмарки/отладка) живет без пула соединений
+    if make_url(settings.DATABASE_URL).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+engine = create_async_engine(get_async_database_url(settings.DATABASE_URL), **_pool_options())
+
+
+# --- МЕТРИКИ ЗАПРОСОВ И ПУЛА ---
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    started_at = conn.info["query_started_at"].pop()
+    # Тип запроса по первому слову: SELECT, INSERT, UPDATE... — без текста, чтобы не плодить метки
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    if operation not in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+        operation = "OTHER"
+    DB_QUERY_DURATION.labels(operation=operation).observe(time.perf_counter() - started_at)
+
+
+@event.listens_for(engine.sync_engine, "handle_error")
+def _query_failed(exception_context):
+    # Запрос упал — after_cursor_execute не придет, убираем его отметку времени
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started_at"):
+        connection.info["query_started_at"].pop()
+
+
+@event.listens_for(engine.sync_engine, "checkout")
+def _connection_checked_out(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_CHECKED_OUT.inc()
+
+
+@event.listens_for(engine.sync_engine, "checkin")
+def _connection_checked_in(dbapi_connection, connection_record):
+    DB_POOL_CHECKED_OUT.dec()
+
+
+# expire_on_commit=False: после commit объекты остаются читаемыми без нового похода в БД
+SessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# Проверьте, что эта строка есть. declarative_base() с круглыми скобками!
+Base = declarative_base()
+
+# --- САМАЯ ВАЖНАЯ ЧАСТЬ ---
+# Зависимость FastAPI: одна асинхронная сессия на запрос.
+async def get_db():
+    async with SessionLocal() as db:
+        yield db
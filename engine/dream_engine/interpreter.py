@@ -0,0 +1,120 @@
+# engine/dream_engine/interpreter.py
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dream_engine.core.metrics import INTERPRET_STAGE_DURATION
+from dream_engine.core.timing import span
+from dream_engine.db.session import SessionLocal
+from dream_engine.db.models.dream import Dream
+from dream_engine.db.models.user import User
+from dream_engine.services.admission import RateLimiter
+from dream_engine.services.cache_service import InterpretationCache, make_cache_key
+from dream_engine.services.llm_service import build_payload, coalesced_dream_interpretation
+from dream_engine.services.memory_service import schedule_dream_memory_refresh
+from dream_engine.services.retrieval import select_context_dreams
+from dream_engine.services.user_cache import user_cache
+
+# Толкование сна целиком — одна функция для всех фронтендов (API, бот, бенчмарки):
+# лимит запросов -> похожие прошлые сны -> кэш -> LLM -> сохранение сна и обновление памяти.
+# Фронтенд отличается только подключаемыми частями: кэшем, лимитером и хуком метрик.
+# Ошибки не переводятся в ответы: AdmissionRejected, LLMBusyError и LLMError
+# фронтенд показывает сам (HTTP 429/503 или сообщение в чате).
+
+# Этап -> имя в Server-Timing (как было в эндпоинтах до выноса). LLM отдельным
+# span'ом не отмечаем: llm_service сам пишет llm_queue и llm_upstream
+STAGE_SPANS = {"past_dreams": "past_dreams", "cache_get": "cache_get", "llm": None, "commit": "commit"}
+
+
+@dataclass
+class InterpretationResult:
+    text: str
+    dream_id: int | None = None  # None — сон не сохранялся (persist=False)
+    cached: bool = False
+
+
+class Interpreter:
+    """
+    frontend — метка в метриках ("api", "bot"), по ней этапы разных фронтендов видны отдельно.
+    cache    — InterpretationCache или None (без кэша).
+    limiter  — RateLimiter или None; ключ — rate_limit_key, по умолчанию "user:<id>".
+    on_stage — свой хук метрик: вызывается как on_stage(stage, seconds) после каждого этапа.
+    """
+
+    def __init__(self, frontend: str, cache: InterpretationCache | None = None, limiter: RateLimiter | None = None,
+                 on_stage: Callable[[str, float], None] | None = None):
+        self.frontend = frontend
+        self.cache = cache
+        self.limiter = limiter
+        self.on_stage = on_stage
+
+    @contextmanager
+    def _stage(self, name: str):
+        started_at = time.perf_counter()
+        span_name = STAGE_SPANS.get(name)
+        try:
+            if span_name is None:
+                yield
+            else:
+                with span(span_name):
+                    yield
+        finally:
+            elapsed = time.perf_counter() - started_at
+            INTERPRET_STAGE_DURATION.labels(frontend=self.frontend, stage=name).observe(elapsed)
+            if self.on_stage is not None:
+                self.on_stage(name, elapsed)
+
+    async def interpret(self, user: User, text: str, *, db: AsyncSession | None = None,
+                        rate_limit_key: str | None = None, persist: bool = True) -> InterpretationResult:
+        """
+        persist=False — гостевой режим: без истории и без записи в БД.
+        db — сессия вызывающего (например, из Depends(get_db)); без нее откроется своя.
+        """
+        if self.limiter is not None:
+            self.limiter.check(rate_limit_key or f"user:{user.id}")
+
+        if not persist:
+            return await self._interpret(None, user, text, persist=False)
+        if db is not None:
+            return await self._interpret(db, user, text, persist=True)
+        async with SessionLocal() as session:
+            return await self._interpret(session, user, text, persist=True)
+
+    async def _interpret(self, db: AsyncSession | None, user: User, text: str, persist: bool) -> InterpretationResult:
+        past_dreams = []
+        if persist:
+            with self._stage("past_dreams"):
+                # Самые похожие на новый сон прошлые сны (или последние, если похожих нет)
+                past_dreams = await select_context_dreams(db, user, text)
+                # Отдаем соединение обратно в пул, пока модель думает (объекты не протухнут: expire_on_commit=False)
+                await db.commit()
+
+        interpretation_text = None
+        cache_key = None
+        if self.cache is not None:
+            # Ключ — текст сна и весь остальной промпт: с другой историей ответ будет другим
+            cache_key = make_cache_key(text, build_payload("", user, past_dreams))
+            with self._stage("cache_get"):
+                interpretation_text = await self.cache.get(cache_key)
+        cached = interpretation_text is not None
+
+        if not cached:
+            with self._stage("llm"):
+                # Ровно один вызов на запрос; одновременные дубли ждут тот же ответ
+                interpretation_text = await coalesced_dream_interpretation(text, user, past_dreams)
+            if self.cache is not None:
+                await self.cache.set(cache_key, interpretation_text)
+
+        if not persist:
+            return InterpretationResult(interpretation_text, cached=cached)
+
+        dream = Dream(request_text=text, response_text=interpretation_text, user_id=user.id)
+        db.add(dream)
+        with self._stage("commit"):
+            await db.commit()
+        user_cache.invalidate_dreams(user.id)
+        schedule_dream_memory_refresh(user.id)
+        return InterpretationResult(interpretation_text, dream_id=dream.id, cached=cached)
@@ -0,0 +1,165 @@
+# engine/dream_engine/services/admission.py
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from dream_engine.core.config import settings
+from dream_engine.core.timing import span
+
+# Контроль нагрузки на LLM:
+#  1. Token bucket на пользователя / IP — один клиент не может долбить API в цикле.
+#  2. Общий лимит одновременных вызовов LLM с очередью по приоритету:
+#     платные и зарегистрированные пользователи проходят раньше гостей.
+#  3. Если ждать слишком долго — сразу отказываем (429 + Retry-After), а не висим 60 секунд.
+
+# Меньше число — выше приоритет
+PRIORITY_PAID = 0
+PRIORITY_REGISTERED = 1
+PRIORITY_GUEST = 2
+PRIORITY_BACKGROUND = 3  # Служебные вызовы: сводка прошлых снов и т.п.
+
+
+class AdmissionRejected(Exception):
+    """Запрос не допущен: превышен лимит или очередь к LLM переполнена."""
+
+    def __init__(self, retry_after: int, detail: str):
+        super().__init__(detail)
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+class TokenBucket:
+    """Классический token bucket: rate токенов в секунду, не больше capacity про запас."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def try_acquire(self) -> float:
+        """Забирает токен. Возвращает 0, если получилось, иначе сколько секунд ждать."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token bucket на каждый ключ (user:42, ip:1.2.3.4, tg:100500). Давно молчащие ключи вытесняются."""
+
+    def __init__(self, per_minute: float, burst: int, max_keys: int):
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+
+    def check(self, key: str) -> None:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst)
+            self._buckets[key] = bucket
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(key)
+
+        wait = bucket.try_acquire()
+        if wait:
+            raise AdmissionRejected(
+                retry_after=math.ceil(wait),
+                detail="Слишком много снов подряд. Пожалуйста, передохните немного и попробуйте снова.",
+            )
+
+
+class PrioritySlots:
+    """
+    Семафор на limit одновременных вызовов LLM с очередью по приоритету.
+    Освободившийся слот получает самый приоритетный (а среди равных — самый ранний) ожидающий.
+    """
+
+    def __init__(self, limit: int, max_waiters: int, wait_timeout: float):
+        self.limit = limit
+        self.max_waiters = max_waiters
+        self.wait_timeout = wait_timeout
+        self.in_use = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        # Скользящее среднее времени занятия слота — для честного Retry-After
+        self._avg_hold = 5.0
+        self.rejected = 0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self._avg_hold * (self.waiting + 1) / self.limit))
+
+    async def acquire(self, priority: int) -> None:
+        if self.in_use < self.limit and not self._waiters:
+            self.in_use += 1
+            return
+
+        if self.waiting >= self.max_waiters:
+            self.rejected += 1
+            raise AdmissionRejected(self._retry_after(), "Сейчас очень много желающих растолковать сон. Попробуйте чуть позже.")
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._counter), future)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.wait_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Слот уже передали нам в последний момент — возвращаем его следующему
+                self.release()
+            else:
+                future.cancel()
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.rejected += 1
+            raise AdmissionRejected(self._retry_after(), "Сейчас очень много желающих растолковать сон. Попробуйте чуть позже.")
+
+    def release(self) -> None:
+        # Передаем слот напрямую ожидающему, не уменьшая in_use
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_use -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: int):
+        with span("llm_queue"):
+            await self.acquire(priority)
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self._avg_hold = 0.9 * self._avg_hold + 0.1 * (time.monotonic() - started_at)
+            self.release()
+
+
+llm_slots = PrioritySlots(settings.LLM_MAX_CONCURRENCY, settings.LLM_QUEUE_MAX, settings.LLM_QUEUE_TIMEOUT)
+guest_rate_limiter = RateLimiter(settings.RATE_LIMIT_GUEST_PER_MINUTE, settings.RATE_LIMIT_GUEST_BURST,
+                                 settings.RATE_LIMIT_MAX_KEYS)
+user_rate_limiter = RateLimiter(settings.RATE_LIMIT_USER_PER_MINUTE, settings.RATE_LIMIT_USER_BURST,
+                                settings.RATE_LIMIT_MAX_KEYS)
+
+
+def user_priority(user) -> int:
+    """Приоритет вызова LLM для пользователя. Гость — это виртуальный User с id=0."""
+    if not user.id:
+        return PRIORITY_GUEST
+    # Когда оплата станет настоящей, здесь появится PRIORITY_PAID для оплативших
+    return PRIORITY_REGISTERED
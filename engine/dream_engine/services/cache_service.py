@@ -0,0 +1,157 @@
+# engine/dream_engine/services/cache_service.py
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from dream_engine.core.config import settings
+from dream_engine.db.session import SessionLocal
+from dream_engine.db.models.interpretation_cache import CachedInterpretation
+
+
+def normalize_dream_text(text: str) -> str:
+    """Приводит сон к каноничному виду: регистр и лишние пробелы не влияют на ключ кэша."""
+    return re.sub(r'\s+', ' ', text).strip().casefold()
+
+
+def make_cache_key(current_dream: str, prompt_context: dict) -> str:
+    """
+    Ключ = нормализованный текст сна + хэш всего остального промпта
+    (модель, системный промпт, история). Разный контекст — разные ключи.
+    """
+    context_hash = hashlib.sha256(
+        json.dumps(prompt_context, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+    return hashlib.sha256(f"{context_hash}:{normalize_dream_text(current_dream)}".encode("utf-8")).hexdigest()
+
+
+class InterpretationCache:
+    """Базовый интерфейс кэша толкований. Реализации считают попадания и промахи."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> str | None:
+        raise NotImplementedError
+
+    async def set(self, key: str, interpretation: str) -> None:
+        raise NotImplementedError
+
+    def _record(self, value: str | None) -> str | None:
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class LRUInterpretationCache(InterpretationCache):
+    """Кэш в памяти процесса: вытеснение по LRU и по времени жизни записи."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        super().__init__()
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    async def get(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return self._record(None)
+
+        expires_at, interpretation = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return self._record(None)
+
+        self._entries.move_to_end(key)
+        return self._record(interpretation)
+
+    async def set(self, key: str, interpretation: str) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, interpretation)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class PostgresInterpretationCache(InterpretationCache):
+    """Общий для всех воркеров кэш в таблице interpretation_cache."""
+
+    def __init__(self, ttl: float):
+        super().__init__()
+        self.ttl = ttl
+
+    async def get(self, key: str) -> str | None:
+        fresh_since = datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+        async with SessionLocal() as db:
+            interpretation = await db.scalar(
+                select(CachedInterpretation.interpretation).where(
+                    CachedInterpretation.key == key,
+                    CachedInterpretation.created_at >= fresh_since,
+                )
+            )
+        return self._record(interpretation)
+
+    async def set(self, key: str, interpretation: str) -> None:
+        async with SessionLocal() as db:
+            await db.merge(CachedInterpretation(key=key, interpretation=interpretation,
+                                                created_at=datetime.now(timezone.utc)))
+            try:
+                await db.commit()
+            except IntegrityError:
+                # Другой воркер успел записать тот же ключ — это нормально
+                await db.rollback()
+
+
+class TieredInterpretationCache(InterpretationCache):
+    """Сначала смотрим в память процесса, потом в общий уровень (и подогреваем память)."""
+
+    def __init__(self, local: InterpretationCache, shared: InterpretationCache):
+        super().__init__()
+        self.local = local
+        self.shared = shared
+
+    async def get(self, key: str) -> str | None:
+        interpretation = await self.local.get(key)
+        if interpretation is None:
+            interpretation = await self.shared.get(key)
+            if interpretation is not None:
+                await self.local.set(key, interpretation)
+        return self._record(interpretation)
+
+    async def set(self, key: str, interpretation: str) -> None:
+        await self.local.set(key, interpretation)
+        await self.shared.set(key, interpretation)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "local": self.local.stats(), "shared": self.shared.stats()}
+
+
+def build_interpretation_cache() -> InterpretationCache | None:
+    if not settings.INTERPRETATION_CACHE_ENABLED:
+        return None
+
+    local = LRUInterpretationCache(settings.INTERPRETATION_CACHE_MAX_ENTRIES, settings.INTERPRETATION_CACHE_TTL)
+    if settings.INTERPRETATION_CACHE_SHARED:
+        return TieredInterpretationCache(local, PostgresInterpretationCache(settings.INTERPRETATION_CACHE_TTL))
+    return local
+
+
+interpretation_cache = build_interpretation_cache()
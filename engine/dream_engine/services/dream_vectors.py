@@ -0,0 +1,96 @@
+# engine/dream_engine/services/dream_vectors.py
+import math
+import re
+import zlib
+
+import numpy as np
+
+# Компактный вектор сна без GPU и сети: "hashing trick" по словам и символьным
+# 3- и 4-граммам (устойчивы к русским окончаниям: "летала" ~ "летать"). Каждый
+# признак crc32-хэшем попадает в одну из VECTOR_DIM ячеек со знаком ±1, вес —
+# сублинейный TF (1 + log tf). В БД лежит сырой TF-вектор (float16, 1 КБ на сон),
+# вычисленный один раз при INSERT; IDF по снам пользователя применяется уже
+# к загруженной матрице (UserVectors), поэтому сохраненные векторы не пересчитываются.
+
+VECTOR_DIM = 512
+VECTOR_BYTES = VECTOR_DIM * 2  # float16
+NGRAM_SIZES = (3, 4)
+
+_WORD = re.compile(r"\w+")
+
+
+def _features(text: str) -> list[str]:
+    features = []
+    for word in _WORD.findall(text.lower().replace("ё", "е")):
+        if len(word) < 2 or word.isdigit():
+            continue
+        features.append(word)
+        padded = f" {word} "
+        for size in NGRAM_SIZES:
+            features.extend(padded[i:i + size] for i in range(len(padded) - size + 1))
+    return features
+
+
+def vectorize(text: str) -> np.ndarray:
+    counts: dict[int, float] = {}
+    for feature in _features(text):
+        digest = zlib.crc32(feature.encode("utf-8"))  # В отличие от hash(), одинаков во всех процессах
+        index = digest % VECTOR_DIM
+        sign = 1.0 if digest & 0x80000000 else -1.0
+        counts[index] = counts.get(index, 0.0) + sign
+    vector = np.zeros(VECTOR_DIM, dtype=np.float32)
+    for index, count in counts.items():
+        if count:
+            vector[index] = math.copysign(1 + math.log(abs(count)), count)
+    return vector
+
+
+def to_bytes(vector: np.ndarray) -> bytes:
+    return vector.astype(np.float16).tobytes()
+
+
+def from_bytes(data: bytes | None) -> np.ndarray | None:
+    """None — вектора нет или он другого размера (VECTOR_DIM поменяли): его надо посчитать заново."""
+    if data is None or len(data) != VECTOR_BYTES:
+        return None
+    return np.frombuffer(data, dtype=np.float16).astype(np.float32)
+
+
+def embedding_default(context) -> bytes:
+    """Значение колонки Dream.embedding по умолчанию: срабатывает на каждый INSERT, в том числе executemany."""
+    return to_bytes(vectorize(context.get_current_parameters()["request_text"]))
+
+
+class UserVectors:
+    """
+    Векторы снов одного пользователя одной матрицей. IDF и нормировка строк считаются
+    при загрузке, поэтому запрос — одно умножение матрицы на вектор.
+    """
+
+    def __init__(self, ids: list[int], vectors: list[np.ndarray]):
+        self.ids = np.array(ids, dtype=np.int64)
+        matrix = np.vstack(vectors) if vectors else np.zeros((0, VECTOR_DIM), dtype=np.float32)
+        # Сглаженный IDF по ячейкам: признаки, встречающиеся почти во всех снах, весят меньше
+        document_frequency = np.count_nonzero(matrix, axis=0)
+        self.idf = (np.log((1 + len(ids)) / (1 + document_frequency)) + 1).astype(np.float32)
+        weighted = matrix * self.idf
+        norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.matrix = weighted / norms
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def top_k(self, query: np.ndarray, k: int, min_score: float) -> list[tuple[int, float]]:
+        """(id сна, косинусная близость) для k самых похожих снов, от более похожих к менее."""
+        if not len(self.ids) or k <= 0:
+            return []
+        weighted = query * self.idf
+        norm = np.linalg.norm(weighted)
+        if norm == 0:
+            return []
+        scores = self.matrix @ (weighted / norm)
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(self.ids[i]), float(scores[i])) for i in best if scores[i] >= min_score]
@@ -0,0 +1,206 @@
+# engine/dream_engine/services/llm_router.py
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable
+
+from dream_engine.core.config import settings, LLMProviderConfig
+
+# Маршрутизация вызовов LLM по нескольким провайдерам/моделям:
+#  - провайдеры пробуются по порядку из настроек;
+#  - у каждого свой circuit breaker: много ошибок или медленных ответов — провайдер
+#    временно выключается и запросы сразу идут к следующему;
+#  - хеджирование: если первый провайдер не ответил за свою p95-задержку,
+#    параллельно запускаем следующий и берем первый успешный ответ.
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class NoProviderAvailable(Exception):
+    """Все провайдеры выключены своими circuit breaker'ами."""
+    pass
+
+
+class CircuitBreaker:
+    """Считает исходы последних window вызовов. Медленный вызов считается ошибкой."""
+
+    def __init__(self, window: int, min_calls: int, failure_rate: float, slow_call_seconds: float,
+                 cooldown: float):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._outcomes: deque[tuple[bool, float]] = deque(maxlen=window)
+
+    def allow(self) -> bool:
+        """Можно ли сейчас отправить запрос. В half-open пропускает ровно один пробный."""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.state = HALF_OPEN
+            self._trial_in_flight = False
+        if self.state == HALF_OPEN:
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+        return True
+
+    def record(self, ok: bool, latency: float) -> None:
+        ok = ok and latency <= self.slow_call_seconds
+        self._outcomes.append((ok, latency))
+
+        if self.state == HALF_OPEN:
+            self._trial_in_flight = False
+            if ok:
+                self.state = CLOSED
+                self._outcomes.clear()
+            else:
+                self._open()
+            return
+
+        if self.state == CLOSED and len(self._outcomes) >= self.min_calls:
+            failures = sum(1 for success, _ in self._outcomes if not success)
+            if failures / len(self._outcomes) >= self.failure_rate:
+                self._open()
+
+    def release_trial(self) -> None:
+        """Пробный запрос отменили (проиграл хедж) — разрешаем следующую пробу."""
+        if self.state == HALF_OPEN:
+            self._trial_in_flight = False
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+
+    def latency_percentile(self, q: float) -> float | None:
+        latencies = sorted(latency for success, latency in self._outcomes if success)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+
+class Provider:
+    def __init__(self, config: LLMProviderConfig):
+        self.config = config
+        self.name = config.name
+        self.breaker = CircuitBreaker(
+            window=settings.LLM_BREAKER_WINDOW,
+            min_calls=settings.LLM_BREAKER_MIN_CALLS,
+            failure_rate=settings.LLM_BREAKER_FAILURE_RATE,
+            slow_call_seconds=settings.LLM_BREAKER_SLOW_CALL_SECONDS,
+            cooldown=settings.LLM_BREAKER_COOLDOWN,
+        )
+
+    def hedge_delay(self) -> float:
+        p95 = self.breaker.latency_percentile(0.95)
+        if p95 is None:
+            return settings.LLM_HEDGE_MAX_DELAY
+        return min(max(p95, settings.LLM_HEDGE_MIN_DELAY), settings.LLM_HEDGE_MAX_DELAY)
+
+
+SendFn = Callable[[Provider, dict], Awaitable[str]]
+
+
+class LLMRouter:
+    """
+    send(provider, payload) делает один вызов и бросает одно из retry_on при неудаче
+    (в т.ч. если после очистки ответ оказался пустым) — тогда пробуем следующего.
+    """
+
+    def __init__(self, providers: list[Provider], send: SendFn, retry_on: tuple[type[Exception], ...],
+                 hedging: bool, max_hedges: int):
+        self.providers = providers
+        self.send = send
+        self.retry_on = retry_on
+        self.hedging = hedging
+        self.max_hedges = max_hedges
+
+    def pick(self) -> Provider:
+        """Первый доступный провайдер — для потоковых ответов, где хеджировать нельзя."""
+        for provider in self.providers:
+            if provider.breaker.allow():
+                return provider
+        raise NoProviderAvailable()
+
+    async def _call(self, provider: Provider, payload: dict) -> str:
+        started_at = time.monotonic()
+        try:
+            result = await self.send(provider, payload)
+        except asyncio.CancelledError:
+            provider.breaker.release_trial()
+            raise
+        except self.retry_on:
+            provider.breaker.record(False, time.monotonic() - started_at)
+            raise
+        provider.breaker.record(True, time.monotonic() - started_at)
+        return result
+
+    async def complete(self, payload: dict) -> str:
+        candidates = iter(self.providers)
+        running: dict[asyncio.Task, Provider] = {}
+        hedges_left = self.max_hedges if self.hedging else 0
+        last_error: Exception | None = None
+
+        def launch_next() -> bool:
+            for provider in candidates:
+                if provider.breaker.allow():
+                    running[asyncio.create_task(self._call(provider, payload))] = provider
+                    return True
+            return False
+
+        if not launch_next():
+            raise NoProviderAvailable()
+
+        try:
+            while running:
+                timeout = None
+                if hedges_left > 0:
+                    # Ждем "обычное" время ответа самого свежего из запущенных провайдеров
+                    timeout = list(running.values())[-1].hedge_delay()
+
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedges_left -= 1
+                    launch_next()
+                    continue
+
+                # Разбираем все завершившиеся задачи, а не только первую удачную: исход каждой
+                # уже записан в ее breaker (_call), а неполученные ошибки asyncio сыпал бы в лог
+                results, unexpected = [], None
+                for task in done:
+                    running.pop(task)
+                    try:
+                        results.append(task.result())
+                    except self.retry_on as e:
+                        last_error = e
+                    except Exception as e:
+                        unexpected = unexpected or e  # Не наша ошибка провайдера — отдаем наверх как есть
+                if results:
+                    return results[0]
+                if unexpected is not None:
+                    raise unexpected
+
+                if not running:
+                    # Провайдер отказал — переходим к следующему по списку
+                    launch_next()
+        finally:
+            for task in running:
+                task.cancel()
+
+        if last_error is not None:
+            raise last_error
+        raise NoProviderAvailable()
+
+
+def provider_configs() -> list[LLMProviderConfig]:
+    """Провайдеры из LLM_PROVIDERS, а если список пуст — основной URL/модель и запасные модели."""
+    if settings.LLM_PROVIDERS:
+        return list(settings.LLM_PROVIDERS)
+    models = [settings.LLM_MODEL, *settings.LLM_FALLBACK_MODELS]
+    return [LLMProviderConfig(name=model, url=settings.LLM_API_URL, model=model) for model in models]
@@ -0,0 +1,395 @@
+# engine/dream_engine/services/llm_service.py
+
+import asyncio
+import hashlib
+import json
+import time
+from typing import AsyncIterator
+
+import httpx
+import re  # <--- 1. ИМПОРТИРУЕМ МОДУЛЬ ДЛЯ РЕГУЛЯРНЫХ ВЫРАЖЕНИЙ
+from dream_engine.core.config import settings
+from dream_engine.core.metrics import LLM_ERRORS, LLM_REQUEST_DURATION, LLM_TIME_TO_FIRST_TOKEN, LLM_TOKENS
+from dream_engine.core.timing import span
+from dream_engine.db.models.user import User
+from dream_engine.db.models.dream import Dream
+from dream_engine.services.admission import llm_slots, user_priority, AdmissionRejected, PRIORITY_REGISTERED
+from dream_engine.services.llm_router import LLMRouter, Provider, NoProviderAvailable, provider_configs
+from dream_engine.services.prompt_builder import PromptBuilder, estimate_tokens
+from dream_engine.services.singleflight import SingleFlight
+
+class LLMError(Exception):
+    """Кастомная ошибка для проблем, связанных с LLM сервисом."""
+    pass
+
+
+class LLMBusyError(LLMError):
+    """LLM перегружена нашими же запросами: слот не достался. Клиенту — 429 и Retry-After."""
+
+    def __init__(self, retry_after: int, detail: str):
+        super().__init__(detail)
+        self.retry_after = retry_after
+
+
+def _llm_error(cause: str, message: str) -> LLMError:
+    """Создает LLMError, учитывая причину в метрике llm_errors_total."""
+    LLM_ERRORS.labels(cause=cause).inc()
+    return LLMError(message)
+
+
+def _observe_tokens(provider_name: str, payload: dict, usage: dict | None, completion_text: str) -> None:
+    # usage присылают не все провайдеры (и не в потоке) — тогда оцениваем локально
+    usage = usage or {}
+    prompt_tokens = usage.get("prompt_tokens") or estimate_tokens(
+        "".join(message["content"] for message in payload["messages"])
+    )
+    completion_tokens = usage.get("completion_tokens") or estimate_tokens(completion_text)
+    LLM_TOKENS.labels(provider=provider_name, kind="prompt").observe(prompt_tokens)
+    LLM_TOKENS.labels(provider=provider_name, kind="completion").observe(completion_tokens)
+
+
+# --- ОБЩИЙ АСИНХРОННЫЙ HTTP-КЛИЕНТ ---
+# Один клиент на процесс: соединения к OpenRouter переиспользуются (keep-alive),
+# поэтому TCP+TLS рукопожатие происходит не на каждый сон, а один раз на соединение.
+_http_client: httpx.AsyncClient | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Возвращает общий для процесса AsyncClient, создавая его при первом обращении."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                connect=settings.LLM_CONNECT_TIMEOUT,
+                read=settings.LLM_READ_TIMEOUT,
+                write=settings.LLM_CONNECT_TIMEOUT,
+                pool=settings.LLM_POOL_TIMEOUT,
+            ),
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Закрывает общий клиент. Вызывается при остановке приложения или бота."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+# --- 2. НОВАЯ ФУНКЦИЯ ОЧИСТКИ ОТВЕТА ---
+def _strip_service_tags(text: str) -> str:
+    """Удаляет технические теги и маркеры, не трогая пробелы по краям."""
+    # Шаг 1: Удаляем теги <s>, </s>, <OBSERVATION>, </OBSERVATION> (без учета регистра)
+    cleaned_text = re.sub(r'</?s>|<OBSERVATION>|</OBSERVATION>', '', text, flags=re.IGNORECASE)
+
+    # --- ШАГ 2 (НОВЫЙ): Удаляем маркеры типа [OUT], [IN], [INST] и т.д. ---
+    # Это регулярное выражение найдет любые слова в квадратных скобках и удалит их.
+    cleaned_text = re.sub(r'\[/?\w+\]', '', cleaned_text)
+
+    # Шаг 3: Удаляем любые другие XML-подобные теги, например <THOUGHT>...</THOUGHT>
+    return re.sub(r'<[^>]+>', '', cleaned_text)
+
+
+def clean_llm_response(text: str) -> str:
+    """Очищает ответ LLM от технических токенов и тегов."""
+    if not text:
+        return ""
+
+    # Шаг 4: Убираем лишние пробелы и переносы строк в начале и в конце
+    return _strip_service_tags(text).strip()
+
+
+class StreamingResponseCleaner:
+    """
+    Инкрементальная версия clean_llm_response для потокового ответа.
+    Тег может прийти разрезанным между чанками ("<TH" + "OUGHT>"), поэтому хвост,
+    похожий на начало тега, придерживается до следующего чанка.
+    Пробелы по краям ответа отбрасываются так же, как strip() в clean_llm_response.
+    """
+    # Если "тег" не закрылся за столько символов — это обычный текст, отдаем его как есть
+    MAX_PENDING_TAG = 256
+    _OPEN_SQUARE_TAIL = re.compile(r'\[/?\w*$')
+
+    def __init__(self):
+        self._pending = ""      # Сырой хвост, который еще может оказаться тегом
+        self._whitespace = ""   # Пробелы в конце, которые отдадим только если дальше будет текст
+        self._started = False
+        self._parts: list[str] = []
+
+    @property
+    def text(self) -> str:
+        """Весь очищенный текст, отданный на данный момент."""
+        return "".join(self._parts)
+
+    def feed(self, chunk: str) -> str:
+        """Принимает сырой чанк от модели и возвращает часть, которую уже можно показать."""
+        self._pending += chunk
+        cut = self._safe_cut(self._pending)
+        ready, self._pending = self._pending[:cut], self._pending[cut:]
+        return self._emit(ready)
+
+    def finish(self) -> str:
+        """Отдает остаток после окончания потока."""
+        ready, self._pending = self._pending, ""
+        return self._emit(ready, final=True)
+
+    def _safe_cut(self, text: str) -> int:
+        cut = len(text)
+
+        angle = text.rfind("<")
+        if angle != -1 and ">" not in text[angle:] and len(text) - angle <= self.MAX_PENDING_TAG:
+            cut = angle
+
+        square = self._OPEN_SQUARE_TAIL.search(text)
+        if square and len(text) - square.start() <= self.MAX_PENDING_TAG:
+            cut = min(cut, square.start())
+
+        return cut
+
+    def _emit(self, raw: str, final: bool = False) -> str:
+        cleaned = _strip_service_tags(raw)
+        if not self._started:
+            cleaned = cleaned.lstrip()
+            if not cleaned:
+                return ""
+            self._started = True
+
+        text = self._whitespace + cleaned
+        body = text.rstrip()
+        self._whitespace = "" if final else text[len(body):]
+        if body:
+            self._parts.append(body)
+        return body
+
+
+# --- КОНЕЦ НОВОЙ ФУНКЦИИ ---
+
+
+def _build_headers(provider: Provider) -> dict:
+    return {
+        "Authorization": f"Bearer {provider.config.api_key or settings.OPENROUTER_API_KEY}",
+        "Content-Type": "application/json",
+        "HTTP-Referer": "http://localhost:3000",
+        "X-Title": "AI Dream Interpreter"
+    }
+
+
+def build_payload(current_dream: str, user: User, past_dreams: list[Dream]) -> dict:
+    """Собирает тело запроса к chat/completions в рамках бюджета токенов (см. prompt_builder)."""
+    with span("prompt_build"):
+        messages = PromptBuilder().build_messages(current_dream, user, past_dreams)
+    return {
+        # Разные модели могут генерировать разный "мусор", поэтому ответ всегда чистим.
+        "model": settings.LLM_MODEL,
+        "messages": messages,
+        "temperature": 0.7,
+    }
+
+
+async def get_dream_interpretation(current_dream: str, user: User, past_dreams: list[Dream]) -> str:
+    return await request_completion(build_payload(current_dream, user, past_dreams), priority=user_priority(user))
+
+
+async def request_completion(payload: dict, priority: int = PRIORITY_REGISTERED) -> str:
+    """
+    Отправляет готовый payload в chat/completions и возвращает очищенный текст ответа.
+    Вызов ждет свободный слот LLM в очереди с приоритетом priority (см. admission).
+    """
+    try:
+        async with llm_slots.slot(priority):
+            return await llm_router.complete(payload)
+    except AdmissionRejected as e:
+        LLM_ERRORS.labels(cause="busy").inc()
+        raise LLMBusyError(e.retry_after, e.detail)
+    except NoProviderAvailable:
+        raise _llm_error("no_provider", "Сервер, отвечающий за толкование снов, сейчас перегружен или недоступен.")
+
+
+def _provider_payload(provider: Provider, payload: dict) -> dict:
+    return {**payload, "model": provider.config.model}
+
+
+async def _post_completion(provider: Provider, payload: dict) -> str:
+    started_at = time.perf_counter()
+    outcome = "error"
+    try:
+        with span("llm_upstream"):
+            response = await get_http_client().post(provider.config.url, headers=_build_headers(provider),
+                                                     json=_provider_payload(provider, payload))
+
+        if 400 <= response.status_code < 500:
+            raise _llm_error("http_4xx", f"Ошибка клиента от API: {response.status_code} - {response.text}")
+        elif 500 <= response.status_code < 600:
+            raise _llm_error("http_5xx", "Сервер, отвечающий за толкование снов, сейчас перегружен или недоступен.")
+
+        response.raise_for_status()
+
+        data = response.json()
+
+        # --- 3. УЛУЧШЕННОЕ ИЗВЛЕЧЕНИЕ И ОЧИСТКА ОТВЕТА ---
+        # Безопасно извлекаем текст ответа
+        raw_text = data.get("choices", [{}])[0].get("message", {}).get("content", "")
+
+        # Очищаем текст от мусора
+        with span("llm_clean"):
+            cleaned_text = clean_llm_response(raw_text)
+
+        # Проверяем, не пустой ли ответ ПОСЛЕ очистки
+        if not cleaned_text:
+            print("LLM вернула пустой или технический ответ.")
+            raise _llm_error("empty", "ИИ задумался и вернул пустой ответ. Пожалуйста, попробуйте отправить запрос еще раз.")
+
+        _observe_tokens(provider.name, payload, data.get("usage"), raw_text)
+        outcome = "ok"
+        return cleaned_text
+        # --- КОНЕЦ ИЗМЕНЕНИЙ ---
+
+    except asyncio.CancelledError:
+        # Проиграли хедж другому провайдеру
+        outcome = "cancelled"
+        raise
+    except httpx.TimeoutException:
+        raise _llm_error("timeout", "Модель слишком долго думала и не ответила вовремя. Пожалуйста, попробуйте еще раз.")
+    except (httpx.HTTPError, ValueError):
+        raise _llm_error("network", "Произошла ошибка сети при попытке связаться с ИИ.")
+    finally:
+        LLM_REQUEST_DURATION.labels(provider=provider.name, mode="complete", outcome=outcome) \
+            .observe(time.perf_counter() - started_at)
+
+
+# --- РОУТЕР ПРОВАЙДЕРОВ ---
+# Любая LLMError от провайдера (5xx, таймаут, пустой после очистки ответ) —
+# повод попробовать следующего по списку (см. llm_router).
+llm_router = LLMRouter(
+    providers=[Provider(config) for config in provider_configs()],
+    send=_post_completion,
+    retry_on=(LLMError,),
+    hedging=settings.LLM_HEDGING_ENABLED,
+    max_hedges=settings.LLM_HEDGE_MAX,
+)
+
+
+# --- СКЛЕИВАНИЕ ОДИНАКОВЫХ ЗАПРОСОВ ---
+# Двойной клик или повтор запроса фронтендом по таймауту присылают тот же сон
+# параллельно. Такие запросы делят один вызов LLM и получают один и тот же ответ.
+llm_singleflight = SingleFlight()
+
+
+def _request_fingerprint(user: User, payload: dict) -> str:
+    payload_hash = hashlib.sha256(
+        json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+    return f"{user.id}:{payload_hash}"
+
+
+async def coalesced_dream_interpretation(current_dream: str, user: User, past_dreams: list[Dream]) -> str:
+    """get_dream_interpretation, но одновременные одинаковые запросы (пользователь, сон, контекст) идут наверх один раз."""
+    # Промпт собираем один раз: ключ считается ровно по тому payload, который уйдет наверх
+    payload = build_payload(current_dream, user, past_dreams)
+    key = _request_fingerprint(user, payload)
+    return await llm_singleflight.do(key, lambda: request_completion(payload, priority=user_priority(user)))
+
+
+# --- ПОТОКОВОЕ ТОЛКОВАНИЕ (stream: true) ---
+def _parse_stream_line(line: str) -> str | None:
+    """Достает текст из одной SSE-строки OpenRouter. None — поток закончился."""
+    if not line.startswith("data:"):
+        # Пустые строки-разделители и комментарии вида ": OPENROUTER PROCESSING"
+        return ""
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        return None
+    try:
+        chunk = json.loads(data)
+    except ValueError:
+        return ""
+    if "error" in chunk:
+        raise _llm_error("stream_error", "Сервер, отвечающий за толкование снов, сейчас перегружен или недоступен.")
+    choices = chunk.get("choices") or [{}]
+    return choices[0].get("delta", {}).get("content") or ""
+
+
+async def stream_dream_interpretation(current_dream: str, user: User, past_dreams: list[Dream],
+                                      cleaner: StreamingResponseCleaner | None = None) -> AsyncIterator[str]:
+    """
+    Потоковый вариант get_dream_interpretation: отдает уже очищенные куски текста
+    по мере генерации. Полный очищенный ответ после окончания лежит в cleaner.text.
+    """
+    payload = build_payload(current_dream, user, past_dreams)
+    payload["stream"] = True
+    if cleaner is None:
+        cleaner = StreamingResponseCleaner()
+
+    # Поток уже мог уйти клиенту частично, поэтому здесь без хеджирования и перебора:
+    # берем первого доступного провайдера и сообщаем его breaker'у, чем все кончилось
+    try:
+        provider = llm_router.pick()
+    except NoProviderAvailable:
+        raise _llm_error("no_provider", "Сервер, отвечающий за толкование снов, сейчас перегружен или недоступен.")
+    started_at = time.monotonic()
+    first_token_at = None
+    outcome = "error"
+
+    try:
+        try:
+            async with llm_slots.slot(user_priority(user)), \
+                    get_http_client().stream("POST", provider.config.url, headers=_build_headers(provider),
+                                             json=_provider_payload(provider, payload)) as response:
+                if 400 <= response.status_code < 500:
+                    body = (await response.aread()).decode("utf-8", errors="replace")
+                    raise _llm_error("http_4xx", f"Ошибка клиента от API: {response.status_code} - {body}")
+                elif 500 <= response.status_code < 600:
+                    raise _llm_error("http_5xx", "Сервер, отвечающий за толкование снов, сейчас перегружен или недоступен.")
+
+                async for line in response.aiter_lines():
+                    raw_text = _parse_stream_line(line)
+                    if raw_text is None:
+                        break
+                    if raw_text and first_token_at is None:
+                        first_token_at = time.monotonic()
+                        LLM_TIME_TO_FIRST_TOKEN.labels(provider=provider.name).observe(first_token_at - started_at)
+                    piece = cleaner.feed(raw_text)
+                    if piece:
+                        yield piece
+
+        except AdmissionRejected as e:
+            # Провайдер тут ни при чем — не засчитываем ему ни успех, ни ошибку
+            provider.breaker.release_trial()
+            outcome = "busy"
+            LLM_ERRORS.labels(cause="busy").inc()
+            raise LLMBusyError(e.retry_after, e.detail)
+        except httpx.TimeoutException:
+            provider.breaker.record(False, time.monotonic() - started_at)
+            raise _llm_error("timeout", "Модель слишком долго думала и не ответила вовремя. Пожалуйста, попробуйте еще раз.")
+        except httpx.HTTPError:
+            provider.breaker.record(False, time.monotonic() - started_at)
+            raise _llm_error("network", "Произошла ошибка сети при попытке связаться с ИИ.")
+        except LLMError:
+            provider.breaker.record(False, time.monotonic() - started_at)
+            raise
+        except BaseException:
+            # Клиент отключился посреди потока — о провайдере это ничего не говорит
+            provider.breaker.release_trial()
+            outcome = "cancelled"
+            raise
+
+        piece = cleaner.finish()
+        if piece:
+            yield piece
+
+        provider.breaker.record(bool(cleaner.text), time.monotonic() - started_at)
+        if not cleaner.text:
+            print("LLM вернула пустой или технический ответ.")
+            raise _llm_error("empty", "ИИ задумался и вернул пустой ответ. Пожалуйста, попробуйте отправить запрос еще раз.")
+        _observe_tokens(provider.name, payload, None, cleaner.text)
+        outcome = "ok"
+    finally:
+        if outcome != "busy":
+            LLM_REQUEST_DURATION.labels(provider=provider.name, mode="stream", outcome=outcome) \
+                .observe(time.monotonic() - started_at)
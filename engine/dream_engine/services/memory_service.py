@@ -0,0 +1,130 @@
+# engine/dream_engine/services/memory_service.py
+import asyncio
+from datetime import datetime, timezone
+
+from sqlalchemy import select, update
+
+from dream_engine.core.config import settings
+from dream_engine.db.session import SessionLocal
+from dream_engine.db.models.user import User
+from dream_engine.db.models.dream import Dream
+from dream_engine.services.admission import PRIORITY_BACKGROUND
+from dream_engine.services.llm_service import request_completion
+from dream_engine.services.singleflight import SingleFlight
+from dream_engine.services.user_cache import user_cache
+
+# "Память" о снах пользователя: короткая сводка всей истории, которая уходит в промпт
+# вместо сырых старых переписок. Сводка обновляется в фоне, когда накопилось
+# DREAM_MEMORY_UPDATE_EVERY новых снов: старая сводка + новые сны -> новая сводка.
+
+MEMORY_SYSTEM_PROMPT = """
+            Ты ведешь краткий дневник снов пользователя для психолога-сонника.
+            Тебе дают текущую сводку и несколько новых снов с толкованиями.
+            Обнови сводку: повторяющиеся символы, сюжеты, эмоции и их развитие во времени.
+            Пиши по-русски, сжато, без приветствий и без советов. Не более {max_chars} символов.
+        """
+
+_memory_flights = SingleFlight()
+_background_tasks: set[asyncio.Task] = set()
+
+
+def select_unsummarized(user: User, past_dreams: list[Dream]) -> list[Dream]:
+    """Оставляет из последних снов только те, что еще не вошли в сводку пользователя."""
+    if user.dream_memory_last_dream_id is None:
+        return list(past_dreams)
+    return [dream for dream in past_dreams if dream.id > user.dream_memory_last_dream_id]
+
+
+def _build_memory_payload(current_memory: str | None, new_dreams: list[Dream]) -> dict:
+    dreams_text = "\n\n".join(
+        f"- Сон: '{dream.request_text}'\n- Толкование: '{dream.response_text}'" for dream in new_dreams
+    )
+    user_message = (
+        f"Текущая сводка:\n{current_memory or 'пока пусто'}\n\n"
+        f"Новые сны (от старых к новым):\n{dreams_text}"
+    )
+    return {
+        "model": settings.LLM_MODEL,
+        "messages": [
+            {"role": "system", "content": MEMORY_SYSTEM_PROMPT.format(max_chars=settings.DREAM_MEMORY_MAX_CHARS)},
+            {"role": "user", "content": user_message},
+        ],
+        "temperature": 0.3,
+    }
+
+
+async def refresh_dream_memory(user_id: int) -> bool:
+    """
+    Вливает в сводку пользователя сны, которые в нее еще не попали.
+    Ничего не делает, пока таких снов меньше DREAM_MEMORY_UPDATE_EVERY.
+    За один вызов берет не больше DREAM_MEMORY_MAX_BATCH снов.
+    Возвращает True, если сводка обновилась.
+    """
+    async with SessionLocal() as db:
+        user = await db.scalar(select(User).where(User.id == user_id))
+        if user is None:
+            return False
+
+        last_dream_id = user.dream_memory_last_dream_id
+        query = (
+            select(Dream).where(Dream.user_id == user_id)
+            .order_by(Dream.id.asc()).limit(settings.DREAM_MEMORY_MAX_BATCH)
+        )
+        if last_dream_id is not None:
+            query = query.where(Dream.id > last_dream_id)
+        new_dreams = (await db.scalars(query)).all()
+        current_memory = user.dream_memory
+        # Соединение не держим, пока LLM пишет сводку
+        await db.commit()
+
+    if len(new_dreams) < settings.DREAM_MEMORY_UPDATE_EVERY:
+        return False
+
+    new_memory = await request_completion(_build_memory_payload(current_memory, new_dreams),
+                                         priority=PRIORITY_BACKGROUND)
+    new_memory = new_memory[:settings.DREAM_MEMORY_MAX_CHARS]
+
+    async with SessionLocal() as db:
+        # Оптимистичная запись: если другой процесс уже обновил сводку, наш результат устарел
+        result = await db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .where(
+                User.dream_memory_last_dream_id.is_(None) if last_dream_id is None
+                else User.dream_memory_last_dream_id == last_dream_id
+            )
+            .values(
+                dream_memory=new_memory,
+                dream_memory_last_dream_id=new_dreams[-1].id,
+                dream_memory_updated_at=datetime.now(timezone.utc),
+            )
+        )
+        await db.commit()
+    if result.rowcount == 1:
+        # Сводка и граница dream_memory_last_dream_id входят в промпт — кэшированный пользователь устарел
+        user_cache.invalidate_user(user_id)
+    return result.rowcount == 1
+
+
+async def _refresh_until_caught_up(user_id: int) -> None:
+    # Длинную историю (импорт, первое включение памяти) сводим несколькими порциями
+    while await refresh_dream_memory(user_id):
+        pass
+
+
+async def _refresh_safely(user_id: int) -> None:
+    try:
+        await _memory_flights.do(str(user_id), lambda: _refresh_until_caught_up(user_id))
+    except Exception as e:
+        # Не страшно: сны останутся несведенными и попадут в следующее обновление
+        print(f"Не удалось обновить сводку снов пользователя {user_id}: {e}")
+
+
+def schedule_dream_memory_refresh(user_id: int) -> None:
+    """Запускает обновление сводки в фоне, не задерживая ответ пользователю."""
+    if not settings.DREAM_MEMORY_ENABLED:
+        return
+    task = asyncio.create_task(_refresh_safely(user_id))
+    # Держим ссылку на задачу, иначе сборщик мусора может прибить ее на середине
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
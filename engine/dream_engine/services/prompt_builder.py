@@ -0,0 +1,130 @@
+# engine/dream_engine/services/prompt_builder.py
+import math
+
+from dream_engine.core.config import settings
+from dream_engine.db.models.user import User
+from dream_engine.db.models.dream import Dream
+
+# Системный промпт одинаков байт-в-байт для всех пользователей и запросов:
+# провайдер может закэшировать этот префикс и не пересчитывать его каждый раз.
+# Всё персональное (имя, дата рождения, история) уходит в сообщение пользователя.
+STATIC_SYSTEM_PROMPT = (
+    "Ты — мудрый сонник и психолог.\n"
+    "Твоя задача — интерпретировать сны символически, глубоко, с эмпатией.\n"
+    "Не давай советов по жизни — только анализ символов, эмоций и подсознания.\n"
+    "Отвечай коротко (1–2 абзаца), по-русски, тёплым, уважительным тоном.\n"
+    "Учитывай историю прошлых сообщений для ответа."
+)
+
+ELLIPSIS = "…"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Грубая локальная оценка числа токенов без токенизатора модели:
+    ~4 байта UTF-8 на токен (кириллица — 2 байта на букву, т.е. ~2 буквы на токен).
+    Оценка с запасом, этого достаточно, чтобы держать промпт в бюджете.
+    """
+    return math.ceil(len(text.encode("utf-8")) / 4)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Обрезает текст до бюджета по границе слова, помечая обрезку многоточием."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+
+    max_bytes = max_tokens * 4 - len(ELLIPSIS.encode("utf-8"))
+    cut = text.encode("utf-8")[:max(max_bytes, 0)].decode("utf-8", errors="ignore")
+    # Не режем слово пополам, если пробел недалеко
+    space = cut.rfind(" ")
+    if space > len(cut) * 0.8:
+        cut = cut[:space]
+    return cut.rstrip() + ELLIPSIS
+
+
+class PromptBudget:
+    """Бюджет токенов по секциям промпта."""
+
+    def __init__(self, system: int, memory: int, history: int, dream: int):
+        self.system = system
+        self.memory = memory
+        self.history = history
+        self.dream = dream
+
+    @classmethod
+    def from_settings(cls) -> "PromptBudget":
+        return cls(
+            system=settings.PROMPT_SYSTEM_TOKENS,
+            memory=settings.PROMPT_MEMORY_TOKENS,
+            history=settings.PROMPT_HISTORY_TOKENS,
+            dream=settings.PROMPT_DREAM_TOKENS,
+        )
+
+
+class PromptBuilder:
+    """
+    Собирает сообщения для chat/completions в рамках бюджета токенов.
+    Результат детерминирован: одни и те же входные данные дают один и тот же промпт.
+    """
+
+    def __init__(self, budget: PromptBudget | None = None):
+        self.budget = budget or PromptBudget.from_settings()
+
+    def system_prompt(self) -> str:
+        return truncate_to_tokens(STATIC_SYSTEM_PROMPT, self.budget.system)
+
+    def history_section(self, past_dreams: list[Dream]) -> str:
+        """
+        Прошлые сны от старых к новым. past_dreams приходят от новых к старым:
+        набираем самые свежие, пока влезают в бюджет, а самые старые отбрасываем.
+        """
+        if not past_dreams or self.budget.history <= 0:
+            return ""
+
+        header = "Вот предыдущие сны этого пользователя и их толкования (от старых к новым):\n"
+        remaining = self.budget.history - estimate_tokens(header)
+        # Один длинный сон не должен съесть всю историю: делим бюджет поровну
+        per_dream = max(remaining // len(past_dreams), 0)
+
+        entries: list[str] = []
+        for dream in past_dreams:
+            half = per_dream // 2
+            entry = (
+                f"- Сон: '{truncate_to_tokens(dream.request_text, half)}'\n"
+                f"- Толкование: '{truncate_to_tokens(dream.response_text or '', half)}'\n\n"
+            )
+            cost = estimate_tokens(entry)
+            if cost > remaining:
+                break
+            entries.append(entry)
+            remaining -= cost
+
+        if not entries:
+            return ""
+        return header + "".join(reversed(entries))
+
+    def user_message(self, current_dream: str, user: User, past_dreams: list[Dream]) -> str:
+        context = ""
+        if user.first_name:
+            context += f"Пользователь — {user.first_name}, родился {user.dob}.\n\n"
+        # Сводка всей прошлой истории (см. memory_service) заменяет сырые старые переписки
+        if user.dream_memory:
+            memory = truncate_to_tokens(user.dream_memory, self.budget.memory)
+            context += f"Вот краткая сводка всех прошлых снов этого пользователя:\n{memory}\n\n"
+        history = self.history_section(past_dreams)
+        context += history
+
+        if user.dream_memory or history:
+            context += "А теперь, учитывая этот контекст, растолкуй новый сон."
+        else:
+            context += "Это первый сон, который пользователь тебе рассказывает. Постарайся произвести хорошее впечатление."
+
+        return f"{context}\n\nНовый сон: {truncate_to_tokens(current_dream, self.budget.dream)}"
+
+    def build_messages(self, current_dream: str, user: User, past_dreams: list[Dream]) -> list[dict]:
+        return [
+            {"role": "system", "content": self.system_prompt()},
+            {"role": "user", "content": self.user_message(current_dream, user, past_dreams)},
+        ]
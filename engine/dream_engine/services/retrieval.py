@@ -0,0 +1,65 @@
+# engine/dream_engine/services/retrieval.py
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dream_engine.core.config import settings
+from dream_engine.db.models.dream import Dream
+from dream_engine.db.models.user import User
+from dream_engine.services.dream_vectors import UserVectors, from_bytes, to_bytes, vectorize
+from dream_engine.services.memory_service import select_unsummarized
+from dream_engine.services.user_cache import user_cache
+
+# Какие прошлые сны показать модели: не просто 3 последних, а самые похожие на новый
+# сон (косинусная близость векторов из dream_vectors.py). Матрица векторов пользователя
+# загружается одним запросом и живет в user_cache до следующей записи Dream.
+# Сны, уже вошедшие в сводку, здесь не исключаются: сводка сжатая, а похожий сон
+# целиком — ровно то, что нужно модели. Если похожих нет — прежнее поведение.
+
+
+async def load_user_vectors(db: AsyncSession, user_id: int) -> UserVectors:
+    vectors = user_cache.vectors.get(user_id)
+    if vectors is not None:
+        return vectors
+
+    version = user_cache.vectors.version
+    rows = (await db.execute(
+        select(Dream.id, Dream.embedding).where(Dream.user_id == user_id)
+        .order_by(Dream.created_at.desc()).limit(settings.RETRIEVAL_MAX_CANDIDATES)
+    )).all()
+    ids, matrix, missing = [], [], []
+    for row in rows:
+        vector = from_bytes(row.embedding)
+        if vector is None:
+            missing.append(row.id)
+        else:
+            ids.append(row.id)
+            matrix.append(vector)
+
+    if missing:
+        # Сны, сохраненные до появления векторов: считаем один раз и записываем
+        backfill = []
+        for row in (await db.execute(select(Dream.id, Dream.request_text).where(Dream.id.in_(missing)))).all():
+            embedding = to_bytes(vectorize(row.request_text))
+            ids.append(row.id)
+            matrix.append(from_bytes(embedding))
+            backfill.append({"id": row.id, "embedding": embedding})
+        if backfill:  # Пусто, если сны успели удалить между запросами
+            await db.execute(update(Dream), backfill)
+            await db.commit()
+
+    vectors = UserVectors(ids, matrix)
+    user_cache.vectors.set(user_id, vectors, version)
+    return vectors
+
+
+async def select_context_dreams(db: AsyncSession, user: User, current_dream: str) -> list[Dream]:
+    """Прошлые сны для промпта, от новых к старым (как ждет PromptBuilder.history_section)."""
+    if settings.RETRIEVAL_ENABLED:
+        vectors = await load_user_vectors(db, user.id)
+        best = vectors.top_k(vectorize(current_dream), settings.RETRIEVAL_TOP_K, settings.RETRIEVAL_MIN_SCORE)
+        if best:
+            return list((await db.scalars(
+                select(Dream).where(Dream.id.in_([dream_id for dream_id, _ in best]))
+                .order_by(Dream.created_at.desc())
+            )).all())
+    return select_unsummarized(user, await user_cache.get_recent_dreams(db, user.id))
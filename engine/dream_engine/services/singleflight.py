@@ -0,0 +1,40 @@
+# engine/dream_engine/services/singleflight.py
+import asyncio
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Склеивает одновременные одинаковые вызовы: пока вызов с ключом key выполняется,
+    все остальные желающие с тем же ключом ждут его результата, а не идут наверх сами.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Task] = {}
+        self.leaders = 0    # Сколько раз реально вызывали fn
+        self.followers = 0  # Сколько вызовов получили чужой результат
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is not None:
+            self.followers += 1
+        else:
+            self.leaders += 1
+            # Вызов живет в отдельной задаче: если первый клиент отвалится,
+            # остальные все равно дождутся ответа
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Помечаем исключение как полученное, даже если все ожидающие ушли
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
@@ -0,0 +1,111 @@
+# engine/dream_engine/services/user_cache.py
+import time
+from collections import OrderedDict
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dream_engine.core.config import settings
+from dream_engine.core.metrics import USER_CACHE_REQUESTS
+from dream_engine.db.models.dream import Dream
+from dream_engine.db.models.user import User
+
+# Кэш горячего пути в памяти процесса: пользователь по id и по telegram_id, его
+# последние сны (контекст для промпта) и матрица векторов его снов (services/retrieval.py).
+# Без него каждое толкование начинается с двух походов в БД. Объекты — обычные
+# ORM-объекты, отвязанные от сессии (expire_on_commit=False), их только читают.
+# Сбрасывается явно: после записи Dream (invalidate_dreams) и после создания или
+# изменения пользователя, включая обновление сводки снов (invalidate_user).
+# Бот и воркеры бэкенда — разные процессы: чужие записи они увидят не позже USER_CACHE_TTL.
+
+RECENT_DREAMS = 3  # Сколько последних снов идет в контекст промпта
+
+
+class TTLCache:
+    """LRU с временем жизни записи и счетчиком сбросов (version) против гонок чтения с записью."""
+
+    def __init__(self, name: str, max_entries: int, ttl: float):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = 0
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            del self._entries[key]
+            entry = None
+        USER_CACHE_REQUESTS.labels(cache=self.name, result="miss" if entry is None else "hit").inc()
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key, value, version: int) -> None:
+        # Пока читали из БД, запись могли сбросить — тогда прочитанное уже устарело
+        if version != self.version or self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def pop(self, key) -> None:
+        self.version += 1
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class UserContextCache:
+    def __init__(self, max_entries: int, ttl: float):
+        self.users = TTLCache("user_by_id", max_entries, ttl)
+        self.telegram_ids = TTLCache("user_by_telegram_id", max_entries, ttl)  # telegram_id -> user_id
+        self.dreams = TTLCache("recent_dreams", max_entries, ttl)
+        self.vectors = TTLCache("dream_vectors", max_entries, ttl)  # user_id -> UserVectors
+
+    async def get_user(self, db: AsyncSession, user_id: int) -> User | None:
+        user = self.users.get(user_id)
+        if user is None:
+            version = self.users.version
+            user = await db.scalar(select(User).where(User.id == user_id))
+            if user is not None:
+                self.users.set(user.id, user, version)
+        return user
+
+    async def get_user_by_telegram_id(self, db: AsyncSession, telegram_id: int) -> User | None:
+        user_id = self.telegram_ids.get(telegram_id)
+        user = self.users.get(user_id) if user_id is not None else None
+        if user is None:
+            versions = self.users.version, self.telegram_ids.version
+            user = await db.scalar(select(User).where(User.telegram_id == telegram_id))
+            if user is not None:
+                self.users.set(user.id, user, versions[0])
+                self.telegram_ids.set(telegram_id, user.id, versions[1])
+        return user
+
+    async def get_recent_dreams(self, db: AsyncSession, user_id: int) -> list[Dream]:
+        """Последние RECENT_DREAMS снов, от новых к старым."""
+        dreams = self.dreams.get(user_id)
+        if dreams is None:
+            version = self.dreams.version
+            dreams = list((await db.scalars(
+                select(Dream).where(Dream.user_id == user_id).order_by(Dream.created_at.desc()).limit(RECENT_DREAMS)
+            )).all())
+            self.dreams.set(user_id, dreams, version)
+        return dreams
+
+    def invalidate_user(self, user_id: int, telegram_id: int | None = None) -> None:
+        self.users.pop(user_id)
+        if telegram_id is not None:
+            self.telegram_ids.pop(telegram_id)
+
+    def invalidate_dreams(self, user_id: int) -> None:
+        self.dreams.pop(user_id)
+        self.vectors.pop(user_id)
+
+
+user_cache = UserContextCache(settings.USER_CACHE_MAX_ENTRIES if settings.USER_CACHE_ENABLED else 0,
+                              settings.USER_CACHE_TTL)
@@ -0,0 +1,6 @@
+# engine/tests/conftest.py
+import os
+
+# Settings требует эти переменные; тестам движка ни БД, ни настоящий ключ не нужны
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
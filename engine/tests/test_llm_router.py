@@ -0,0 +1,201 @@
+# engine/tests/test_llm_router.py
+import asyncio
+import gc
+import json
+import time
+
+import httpx
+import pytest
+
+from dream_engine.core.config import LLMProviderConfig, settings
+from dream_engine.services import llm_service
+from dream_engine.services.llm_router import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, LLMRouter, Provider
+from dream_engine.services.llm_service import LLMError
+
+# Роутер гоняется через настоящий _post_completion, а провайдеры — заглушки на httpx.MockTransport:
+# каждая модель отвечает так, как ей велит тест (ответ, 503, пустой после очистки, задержка).
+
+PAYLOAD = {"model": "ignored", "messages": [{"role": "user", "content": "сон"}]}
+
+
+def completion(content: str) -> httpx.Response:
+    return httpx.Response(200, json={"choices": [{"message": {"role": "assistant", "content": content}}]})
+
+
+class StubProviders:
+    """behaviours: модель -> async (request) -> Response. Запоминает, когда какую модель вызвали."""
+
+    def __init__(self, behaviours: dict):
+        self.behaviours = behaviours
+        self.calls: list[tuple[str, float]] = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        model = json.loads(request.content)["model"]
+        self.calls.append((model, time.monotonic()))
+        return await self.behaviours[model](request)
+
+    def count(self, model: str) -> int:
+        return sum(1 for called, _ in self.calls if called == model)
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    def install(behaviours: dict) -> StubProviders:
+        providers = StubProviders(behaviours)
+        monkeypatch.setattr(llm_service, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(providers)))
+        return providers
+    return install
+
+
+def make_breaker(**overrides) -> CircuitBreaker:
+    options = dict(window=4, min_calls=2, failure_rate=0.5, slow_call_seconds=1.0, cooldown=30.0)
+    options.update(overrides)
+    return CircuitBreaker(**options)
+
+
+def make_router(*models: str, hedging: bool = False) -> LLMRouter:
+    providers = []
+    for model in models:
+        provider = Provider(LLMProviderConfig(name=model, url=f"http://{model}/v1/chat/completions", model=model))
+        provider.breaker = make_breaker()
+        providers.append(provider)
+    return LLMRouter(providers=providers, send=llm_service._post_completion, retry_on=(LLMError,),
+                     hedging=hedging, max_hedges=1)
+
+
+def answer(content: str, delay: float = 0.0):
+    async def respond(request):
+        await asyncio.sleep(delay)
+        return completion(content)
+    return respond
+
+
+async def overloaded(request):
+    return httpx.Response(503, json={"error": {"message": "overloaded"}})
+
+
+def test_breaker_closed_open_half_open_closed():
+    breaker = make_breaker()
+    assert breaker.state == CLOSED and breaker.allow()
+
+    breaker.record(False, 0.1)
+    assert breaker.state == CLOSED  # Меньше min_calls — не срабатывает
+    breaker.record(True, 5.0)       # Медленный ответ считается ошибкой
+    assert breaker.state == OPEN and not breaker.allow()
+
+    breaker.opened_at -= breaker.cooldown  # Остывание прошло
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()  # В half-open — ровно один пробный запрос
+
+    breaker.record(False, 0.1)  # Проба провалилась — снова open
+    assert breaker.state == OPEN
+
+    breaker.opened_at -= breaker.cooldown
+    assert breaker.allow()
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_breaker_releases_cancelled_trial():
+    breaker = make_breaker()
+    breaker.record(False, 0.1)
+    breaker.record(False, 0.1)
+    breaker.opened_at -= breaker.cooldown
+    assert breaker.allow() and not breaker.allow()
+    breaker.release_trial()  # Пробу отменили (проиграла хедж) — можно пробовать снова
+    assert breaker.allow()
+
+
+def test_failing_provider_is_switched_off(stub):
+    providers = stub({"primary": overloaded, "backup": answer("Толкование запасной модели")})
+    router = make_router("primary", "backup")
+
+    async def scenario():
+        return [await router.complete(PAYLOAD) for _ in range(4)]
+
+    assert asyncio.run(scenario()) == ["Толкование запасной модели"] * 4
+    # Две ошибки подряд (min_calls=2) открыли breaker: дальше запросы сразу идут к запасной
+    assert router.providers[0].breaker.state == OPEN
+    assert providers.count("primary") == 2 and providers.count("backup") == 4
+
+
+def test_falls_back_when_output_is_empty_after_cleaning(stub):
+    # Только служебные теги — после clean_llm_response ответ пустой
+    providers = stub({"primary": answer("<s></s>"), "backup": answer("Вода во сне — это чувства.")})
+    router = make_router("primary", "backup")
+
+    assert asyncio.run(router.complete(PAYLOAD)) == "Вода во сне — это чувства."
+    assert providers.count("primary") == 1 and providers.count("backup") == 1
+    assert [ok for ok, _ in router.providers[0].breaker._outcomes] == [False]
+
+
+def test_hedges_after_p95_delay(stub, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_DELAY", 0.05)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MAX_DELAY", 5.0)
+    providers = stub({"primary": answer("медленный ответ", delay=2.0), "backup": answer("быстрый ответ")})
+    router = make_router("primary", "backup", hedging=True)
+    for _ in range(10):
+        router.providers[0].breaker.record(True, 0.2)  # p95 основного — 0.2 с
+    assert router.providers[0].hedge_delay() == pytest.approx(0.2)
+
+    async def scenario():
+        started_at = time.monotonic()
+        return await router.complete(PAYLOAD), time.monotonic() - started_at
+
+    result, elapsed = asyncio.run(scenario())
+    assert result == "быстрый ответ"
+    assert elapsed < 1.0  # Не ждали медленного основного
+    (_, primary_at), (_, backup_at) = providers.calls
+    assert backup_at - primary_at >= 0.2  # Хедж ушел не раньше p95 основного
+    assert router.providers[0].breaker._trial_in_flight is False
+
+
+def test_no_hedge_when_disabled(stub):
+    providers = stub({"primary": answer("ответ основного", delay=0.1), "backup": answer("не должен понадобиться")})
+    router = make_router("primary", "backup", hedging=False)
+
+    assert asyncio.run(router.complete(PAYLOAD)) == "ответ основного"
+    assert providers.count("backup") == 0
+
+
+def test_consumes_every_finished_task(monkeypatch):
+    # Основной и хедж завершаются в одном и том же ожидании: основной с ошибкой, хедж с ответом.
+    # Ошибка основного должна попасть в его breaker, а не в лог "Task exception was never retrieved"
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_DELAY", 0.01)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MAX_DELAY", 0.01)
+    gate = asyncio.Event()
+    failing: set[asyncio.Task] = set()
+
+    async def send(provider, payload):
+        await gate.wait()
+        if provider.name == "primary":
+            failing.add(asyncio.current_task())
+            raise LLMError("primary failed")
+        return "ответ хеджа"
+
+    real_wait = asyncio.wait
+
+    async def wait_success_first(tasks, **kwargs):
+        # Порядок в множестве done случаен; удачную задачу ставим первой — худший случай.
+        # task.exception() здесь не зовем: он пометил бы ошибку полученной
+        done, pending = await real_wait(tasks, **kwargs)
+        return sorted(done, key=lambda task: task in failing), pending
+
+    monkeypatch.setattr(asyncio, "wait", wait_success_first)
+    router = make_router("primary", "backup", hedging=True)
+    router.send = send
+    unhandled = []
+
+    async def scenario():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unhandled.append(context))
+        asyncio.get_running_loop().call_later(0.1, gate.set)
+        result = await router.complete(PAYLOAD)
+        failing.clear()  # Без ссылок задача соберется, и asyncio сообщит о неполученной ошибке
+        await asyncio.sleep(0)
+        gc.collect()
+        return result
+
+    assert asyncio.run(scenario()) == "ответ хеджа"
+    assert [ok for ok, _ in router.providers[0].breaker._outcomes] == [False]
+    assert [ok for ok, _ in router.providers[1].breaker._outcomes] == [True]
+    assert unhandled == []
@@ -0,0 +1,85 @@
+# engine/tests/test_prompt_builder.py
+from datetime import date
+
+from dream_engine.db.models.dream import Dream
+from dream_engine.db.models.user import User
+from dream_engine.services.prompt_builder import (
+    ELLIPSIS,
+    PromptBudget,
+    PromptBuilder,
+    estimate_tokens,
+)
+
+# Префикс, который провайдер кэширует: любое изменение — осознанное, вместе с этим тестом
+EXPECTED_SYSTEM_PROMPT = (
+    "Ты — мудрый сонник и психолог.\n"
+    "Твоя задача — интерпретировать сны символически, глубоко, с эмпатией.\n"
+    "Не давай советов по жизни — только анализ символов, эмоций и подсознания.\n"
+    "Отвечай коротко (1–2 абзаца), по-русски, тёплым, уважительным тоном.\n"
+    "Учитывай историю прошлых сообщений для ответа."
+).encode("utf-8")
+
+HISTORY_HEADER = "Вот предыдущие сны этого пользователя и их толкования (от старых к новым):\n"
+
+
+def make_user(**kwargs) -> User:
+    return User(id=kwargs.pop("id", 1), first_name=kwargs.pop("first_name", "Анна"),
+                dob=date(1990, 5, 17), phone="+70000000000", **kwargs)
+
+
+def past_dreams() -> list[Dream]:
+    # Как отдает retrieval: от новых к старым
+    return [Dream(request_text=f"сон {n}", response_text=f"толкование {n}") for n in (3, 2, 1)]
+
+
+def test_system_prompt_is_byte_identical_for_everyone():
+    builder = PromptBuilder()
+    first = builder.build_messages("Мне снилось море", make_user(), [])
+    second = builder.build_messages("Совсем другой сон", make_user(id=2, first_name="Иван", dream_memory="сводка"),
+                                    past_dreams())
+
+    assert first[0] == {"role": "system", "content": EXPECTED_SYSTEM_PROMPT.decode("utf-8")}
+    assert second[0]["content"].encode("utf-8") == EXPECTED_SYSTEM_PROMPT
+    # Персональное — только в сообщении пользователя
+    assert "Иван" not in second[0]["content"] and "Иван" in second[1]["content"]
+
+
+def test_build_messages_is_deterministic():
+    builder = PromptBuilder(PromptBudget(system=300, memory=10, history=70, dream=20))
+    user = make_user(dream_memory="длинная сводка " * 20)
+    assert builder.build_messages("сон " * 50, user, past_dreams()) == \
+        builder.build_messages("сон " * 50, user, past_dreams())
+
+
+def test_history_keeps_newest_dreams_that_fit():
+    # 70 токенов: заголовок (34) и ровно две записи по 18 — самый старый сон отбрасывается
+    section = PromptBuilder(PromptBudget(system=300, memory=800, history=70, dream=1500)).history_section(past_dreams())
+    assert section == (
+        HISTORY_HEADER
+        + "- Сон: 'сон 2'\n- Толкование: 'толкование 2'\n\n"
+        + "- Сон: 'сон 3'\n- Толкование: 'толкование 3'\n\n"
+    )
+
+    roomy = PromptBuilder(PromptBudget(system=300, memory=800, history=100, dream=1500)).history_section(past_dreams())
+    assert roomy.index("сон 1") < roomy.index("сон 2") < roomy.index("сон 3")
+
+
+def test_history_splits_budget_between_dreams():
+    # 60 токенов на три сна: каждому по 8, длинное толкование обрезается, а не вытесняет остальные
+    section = PromptBuilder(PromptBudget(system=300, memory=800, history=60, dream=1500)).history_section(past_dreams())
+    assert section == HISTORY_HEADER + f"- Сон: 'сон 3'\n- Толкование: 'толков{ELLIPSIS}'\n\n"
+
+
+def test_sections_are_trimmed_to_their_budgets():
+    budget = PromptBudget(system=300, memory=10, history=0, dream=20)
+    message = PromptBuilder(budget).user_message("река " * 100, make_user(dream_memory="сводка " * 100), past_dreams())
+
+    memory = message.split("Вот краткая сводка всех прошлых снов этого пользователя:\n")[1].split("\n\n")[0]
+    dream = message.split("Новый сон: ")[1]
+    assert memory.endswith(ELLIPSIS) and estimate_tokens(memory) <= budget.memory
+    assert dream.endswith(ELLIPSIS) and estimate_tokens(dream) <= budget.dream
+    assert "Вот предыдущие сны" not in message  # Нулевой бюджет истории — секции нет
+
+
+def test_zero_system_budget_drops_system_prompt():
+    assert PromptBuilder(PromptBudget(system=0, memory=10, history=10, dream=10)).system_prompt() == ""
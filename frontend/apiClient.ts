@@ -83,6 +83,67 @@ export const interpretDream = async (text: string, userId: number): Promise<{ in
     return response.json();
 };
 
+// --- ПОТОКОВОЕ ТОЛКОВАНИЕ (SSE) ---
+// Читает ответ сервера по кусочкам и вызывает onDelta для каждого нового фрагмента текста.
+// Возвращает полный текст толкования после события "done".
+const streamInterpretation = async (
+    path: string,
+    body: object,
+    onDelta: (text: string) => void
+): Promise<{ interpretation: string }> => {
+    const response = await fetch(`${API_BASE_URL}${path}`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
+        body: JSON.stringify(body)
+    });
+    if (!response.ok || !response.body) {
+        const errorData = await response.json();
+        throw new ApiError(response, errorData);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // События SSE разделены пустой строкой
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let eventName = 'message';
+            let data = '';
+            for (const line of rawEvent.split('\n')) {
+                if (line.startsWith('event:')) eventName = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            }
+            const payload = data ? JSON.parse(data) : {};
+
+            if (eventName === 'delta') {
+                onDelta(payload.text);
+            } else if (eventName === 'done') {
+                return { interpretation: payload.interpretation };
+            } else if (eventName === 'error') {
+                throw new ApiError(response, payload);
+            }
+        }
+    }
+    throw new ApiError(response, { detail: 'Соединение прервалось до окончания ответа.' });
+};
+
+// Потоковый вариант для ГОСТЯ
+export const interpretGuestDreamStream = (text: string, onDelta: (text: string) => void) =>
+    streamInterpretation('/api/v1/chat/interpret_guest_stream', { text }, onDelta);
+
+// Потоковый вариант для ЗАРЕГИСТРИРОВАННОГО пользователя
+export const interpretDreamStream = (text: string, userId: number, onDelta: (text: string) => void) =>
+    streamInterpretation('/api/v1/chat/interpret_stream', { text, user_id: userId }, onDelta);
+
 // Функция для получения истории чата
 export const getChatHistory = async (userId: number): Promise<any[]> => {
     const response = await fetch(`${API_BASE_URL}/api/v1/users/${userId}/history`);
@@ -93,6 +154,24 @@ export const getChatHistory = async (userId: number): Promise<any[]> => {
     return response.json();
 };
 
+// Страница истории для бесконечной прокрутки: сообщения от старых к новым,
+// nextCursor передается в before, чтобы подгрузить более старые сны.
+export interface ChatHistoryPage {
+    messages: any[];
+    next_cursor: string | null;
+}
+
+export const getChatHistoryPage = async (userId: number, before?: string | null, limit = 20): Promise<ChatHistoryPage> => {
+    const params = new URLSearchParams({ limit: String(limit) });
+    if (before) params.set('before', before);
+    const response = await fetch(`${API_BASE_URL}/api/v1/users/${userId}/history/page?${params}`);
+    if (!response.ok) {
+        const errorData = await response.json();
+        throw new ApiError(response, errorData);
+    }
+    return response.json();
+};
+
 // Функция для создания счета на оплату
 export const createInvoice = async (userId: number): Promise<{ payment_url: string }> => {
     const response = await fetch(`${API_BASE_URL}/api/v1/payment/create_invoice`, {
@@ -1,7 +1,7 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { User, ChatMessage } from '../types';
 import { BotIcon, UserIcon, SendIcon, LogoutIcon, SpeakerIcon, MicrophoneIcon } from './icons';
-import { interpretDream, interpretGuestDream, getChatHistory, ApiError, createInvoice } from '../apiClient';
+import { interpretDreamStream, interpretGuestDreamStream, getChatHistoryPage, ApiError, createInvoice } from '../apiClient';
 
 interface ChatScreenProps {
   user: User | null;
@@ -36,6 +36,9 @@ const ChatScreen: React.FC<ChatScreenProps> = ({ user, isGuest, guestMessages, s
   const [isLoading, setIsLoading] = useState(false);
   const [isRecording, setIsRecording] = useState(false);
   const [currentlyPlayingIndex, setCurrentlyPlayingIndex] = useState<number | null>(null);
+  // Курсор на более старую часть истории (null — всё уже загружено)
+  const [historyCursor, setHistoryCursor] = useState<string | null>(null);
+  const [isLoadingOlder, setIsLoadingOlder] = useState(false);
 
   const [isGuestAttemptUsed, setIsGuestAttemptUsed] = useState(
     () => localStorage.getItem('guest_attempt_used') === 'true'
@@ -47,6 +50,9 @@ const ChatScreen: React.FC<ChatScreenProps> = ({ user, isGuest, guestMessages, s
   const isGuestBlocked = isGuest && isGuestAttemptUsed;
 
   const messagesEndRef = useRef<HTMLDivElement | null>(null);
+  const messagesContainerRef = useRef<HTMLElement | null>(null);
+  // При подгрузке старых сообщений сверху не прыгаем в конец чата
+  const skipAutoScrollRef = useRef(false);
   const recognitionRef = useRef<any>(null);
   const wittyIntervalRef = useRef<NodeJS.Timeout | null>(null);
 
@@ -69,9 +75,40 @@ const ChatScreen: React.FC<ChatScreenProps> = ({ user, isGuest, guestMessages, s
   };
 
   useEffect(() => {
+    if (skipAutoScrollRef.current) {
+      skipAutoScrollRef.current = false;
+      return;
+    }
     scrollToBottom();
   }, [messages]);
 
+  const loadOlderHistory = async () => {
+    if (isGuest || !user || !historyCursor || isLoadingOlder) return;
+    const container = messagesContainerRef.current;
+    const previousScrollHeight = container?.scrollHeight ?? 0;
+    setIsLoadingOlder(true);
+    try {
+      const page = await getChatHistoryPage(user.id, historyCursor);
+      skipAutoScrollRef.current = true;
+      setRegisteredMessages((prev) => [...page.messages, ...prev]);
+      setHistoryCursor(page.next_cursor);
+      // Сохраняем положение прокрутки: пользователь продолжает смотреть на то же сообщение
+      requestAnimationFrame(() => {
+        if (container) container.scrollTop += container.scrollHeight - previousScrollHeight;
+      });
+    } catch (error) {
+      console.error("Failed to load older history:", error);
+    } finally {
+      setIsLoadingOlder(false);
+    }
+  };
+
+  const handleMessagesScroll = () => {
+    if (messagesContainerRef.current && messagesContainerRef.current.scrollTop < 80) {
+      loadOlderHistory();
+    }
+  };
+
   useEffect(() => {
     if (isGuest) {
       setIsGuestAttemptUsed(localStorage.getItem('guest_attempt_used') === 'true');
@@ -83,9 +120,10 @@ const ChatScreen: React.FC<ChatScreenProps> = ({ user, isGuest, guestMessages, s
       const loadHistory = async () => {
         setIsLoading(true);
         try {
-          const history = await getChatHistory(user.id);
-          if (history.length > 0) {
-            setRegisteredMessages(history);
+          const page = await getChatHistoryPage(user.id);
+          setHistoryCursor(page.next_cursor);
+          if (page.messages.length > 0) {
+            setRegisteredMessages(page.messages);
           } else {
             setRegisteredMessages([
               { role: 'bot', text: `С возвращением, ${user.firstName}! Расскажите, что вам приснилось.` }
@@ -173,16 +211,29 @@ const ChatScreen: React.FC<ChatScreenProps> = ({ user, isGuest, guestMessages, s
         });
     }, 8000);
 
+    // Как только пришел первый кусок толкования — убираем "остроумные" заглушки
+    // и дописываем текст в последнее сообщение бота по мере генерации.
+    let streamedText = '';
+    const handleDelta = (piece: string) => {
+      if (wittyIntervalRef.current) {
+        clearInterval(wittyIntervalRef.current);
+        wittyIntervalRef.current = null;
+      }
+      streamedText += piece;
+      const text = streamedText;
+      setMessages((prev) => [...prev.slice(0, -1), { role: 'bot', text }]);
+    };
+
     try {
       let response;
       if (isGuest) {
-        response = await interpretGuestDream(dreamText);
+        response = await interpretGuestDreamStream(dreamText, handleDelta);
         localStorage.setItem('guest_attempt_used', 'true');
         setIsGuestAttemptUsed(true);
       } else {
         const userId = localStorage.getItem('dream_user_id');
         if (!userId) throw new Error("User ID not found for registered user");
-        response = await interpretDream(dreamText, parseInt(userId));
+        response = await interpretDreamStream(dreamText, parseInt(userId), handleDelta);
       }
 
       const botMessage: ChatMessage = { role: 'bot', text: response.interpretation };
@@ -242,7 +293,12 @@ const ChatScreen: React.FC<ChatScreenProps> = ({ user, isGuest, guestMessages, s
         </div>
       </header>
 
-      <main className="flex-1 overflow-y-auto p-4 md:p-6 space-y-6">
+      <main ref={messagesContainerRef} onScroll={handleMessagesScroll} className="flex-1 overflow-y-auto p-4 md:p-6 space-y-6">
+        {isLoadingOlder && (
+          <div className="flex justify-center">
+            <TypingIndicator />
+          </div>
+        )}
         {messages.map((msg, index) => {
           if (msg.text === 'invite_to_register') {
             return (